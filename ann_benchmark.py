@@ -0,0 +1,110 @@
+"""
+Recall@k and latency benchmark of the IVF index against exact search.
+
+Builds a synthetic clustered corpus in a temporary database and vector store
+(or uses the live course store with --use-store), then compares corpus-wide
+searches at several nprobe settings with exact search over every row.
+
+Usage:
+    python ann_benchmark.py [--rows N] [--dim D] [--queries Q] [--top-k K] [--nprobe 1,4,8,16]
+    python ann_benchmark.py --use-store [--course COURSE_ID]
+"""
+
+import argparse
+import os
+import shutil
+import tempfile
+import time
+import numpy as np
+import db
+import vector_store
+from ann_index import default_list_count
+
+
+def build_synthetic_store(rows, dim, clusters, seed):
+    """Fill the (temporary) store with clustered unit vectors, 500 chunks per fake lecture."""
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(clusters, dim))
+    labels = rng.integers(0, clusters, size=rows)
+    vectors = centers[labels] + 0.5 * rng.normal(size=(rows, dim))
+    for lecture_id, start in enumerate(range(0, rows, 500)):
+        block = vectors[start:start + 500]
+        chunks = [{"text": f"chunk {start + i}", "page": 1} for i in range(len(block))]
+        vector_store.add(lecture_id, chunks, block, "synthetic")
+    return centers
+
+
+def sample_queries(course_id, n_queries, seed):
+    """Use perturbed copies of stored rows as queries."""
+    rng = np.random.default_rng(seed)
+    store = db.get_vector_store(course_id)
+    dim = store[0]
+    rows = np.asarray(db.get_live_vector_rows(course_id), dtype=np.int64)
+    matrix = vector_store._open_matrix(course_id, store, int(rows[-1]) + 1)
+    picked = rng.choice(rows, n_queries, replace=len(rows) < n_queries)
+    return np.asarray(matrix[picked]) + 0.05 * rng.normal(size=(n_queries, dim)).astype(np.float32)
+
+
+def run_searches(queries, top_k, nprobe, course_id):
+    """Return the result rows of every query and the mean latency in milliseconds."""
+    results = []
+    start = time.perf_counter()
+    for query in queries:
+        results.append({match["row"] for match in vector_store.search(query, top_k, nprobe=nprobe, course_id=course_id)})
+    return results, (time.perf_counter() - start) * 1000 / len(queries)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark ANN recall@k against exact search')
+    parser.add_argument('--rows', type=int, default=20000, help='Synthetic corpus size')
+    parser.add_argument('--dim', type=int, default=256, help='Synthetic embedding dimension')
+    parser.add_argument('--clusters', type=int, default=200, help='Synthetic topic clusters')
+    parser.add_argument('--queries', type=int, default=200, help='Number of queries')
+    parser.add_argument('--top-k', type=int, default=10, help='k for recall@k')
+    parser.add_argument('--nprobe', default='1,2,4,8,16,32', help='Comma-separated nprobe values')
+    parser.add_argument('--use-store', action='store_true', help='Benchmark the live course store')
+    parser.add_argument('--course', default=vector_store.COURSE_ID, help='Course to benchmark with --use-store')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    temp_dir = None
+    course_id = args.course
+    if not args.use_store:
+        temp_dir = tempfile.mkdtemp(prefix="ann_benchmark_")
+        db.DB_PATH = os.path.join(temp_dir, "benchmark.db")
+        vector_store.VECTOR_STORE_DIR = temp_dir
+        db.init_db()
+        print(f"Building synthetic store: {args.rows} rows x {args.dim} dims...")
+        build_synthetic_store(args.rows, args.dim, args.clusters, args.seed)
+
+    try:
+        live_rows = db.count_live_vector_rows(course_id)
+        if not live_rows:
+            print(f"Course '{course_id}' has no vectors.")
+            return 1
+        if not db.get_vector_store(course_id)[2]:
+            print("Training IVF index...")
+            vector_store.train_index(course_id, seed=args.seed)
+        n_lists = len(vector_store._load_centroids(course_id, db.get_vector_store(course_id)))
+
+        queries = sample_queries(course_id, args.queries, args.seed)
+        exact, exact_ms = run_searches(queries, args.top_k, n_lists, course_id)
+
+        print("=" * 60)
+        print(f"Rows: {live_rows}  Lists: {n_lists} (default {default_list_count(live_rows)})  "
+              f"Queries: {len(queries)}  k: {args.top_k}")
+        print("=" * 60)
+        print(f"{'nprobe':>8} {'recall@k':>10} {'ms/query':>10} {'speedup':>9}")
+        print(f"{'exact':>8} {1.0:>10.3f} {exact_ms:>10.2f} {1.0:>8.1f}x")
+        for nprobe in [int(value) for value in args.nprobe.split(",")]:
+            approx, approx_ms = run_searches(queries, args.top_k, nprobe, course_id)
+            recall = np.mean([len(a & e) / max(1, len(e)) for a, e in zip(approx, exact)])
+            print(f"{nprobe:>8} {recall:>10.3f} {approx_ms:>10.2f} {exact_ms / approx_ms:>8.1f}x")
+    finally:
+        if temp_dir:
+            shutil.rmtree(temp_dir, ignore_errors=True)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
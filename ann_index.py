@@ -0,0 +1,77 @@
+"""
+Inverted-file (IVF) approximate nearest-neighbour search in NumPy.
+
+Unit-length vectors are partitioned into lists by spherical k-means. A query
+is scored only against the rows of the `nprobe` lists whose centroids are
+closest to it, which trades a little recall for a large cut in work; `nprobe`
+is the recall/latency knob (probing every list is exact search).
+"""
+import os
+import numpy as np
+
+ANN_MIN_ROWS = int(os.getenv("ANN_MIN_ROWS", "4096"))  # Below this, exact search is used
+ANN_NPROBE = int(os.getenv("ANN_NPROBE", "8"))  # Lists probed per query
+KMEANS_ITERATIONS = 10
+KMEANS_SAMPLE_SIZE = 100000  # Rows used to fit the centroids
+ASSIGN_BLOCK_SIZE = 8192
+
+
+def default_list_count(n_rows):
+    """Number of IVF lists for a corpus: about 4 * sqrt(n), at least 1."""
+    return max(1, min(n_rows, int(4 * np.sqrt(n_rows))))
+
+
+def _normalize(vectors):
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.where(norms == 0, 1, norms)
+
+
+def assign(centroids, vectors):
+    """Return the index of the nearest centroid (by inner product) for each vector."""
+    vectors = np.asarray(vectors, dtype=np.float32)
+    if vectors.ndim == 1:
+        vectors = vectors[np.newaxis, :]
+    lists = np.empty(len(vectors), dtype=np.int64)
+    for start in range(0, len(vectors), ASSIGN_BLOCK_SIZE):
+        block = vectors[start:start + ASSIGN_BLOCK_SIZE]
+        lists[start:start + len(block)] = np.argmax(block @ centroids.T, axis=1)
+    return lists
+
+
+def kmeans(vectors, n_lists, iterations=KMEANS_ITERATIONS, seed=0):
+    """
+    Spherical k-means over unit-length vectors.
+
+    Args:
+        vectors (np.ndarray): Training sample of unit-length rows.
+        n_lists (int): Number of centroids.
+        iterations (int): Number of Lloyd iterations.
+        seed (int): Seed for initialisation.
+
+    Returns:
+        np.ndarray: float32 matrix of unit-length centroids, shape (n_lists, dim).
+    """
+    rng = np.random.default_rng(seed)
+    sample = np.asarray(vectors, dtype=np.float32)
+    n_lists = min(n_lists, len(sample))
+    centroids = sample[rng.choice(len(sample), n_lists, replace=False)].copy()
+
+    for _ in range(iterations):
+        labels = assign(centroids, sample)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, labels, sample)
+        counts = np.bincount(labels, minlength=n_lists)
+        empty = counts == 0
+        if empty.any():
+            # Re-seed empty lists with random points so every list stays in use
+            sums[empty] = sample[rng.choice(len(sample), int(empty.sum()), replace=False)]
+        centroids = _normalize(sums).astype(np.float32)
+    return centroids
+
+
+def probe(centroids, query, nprobe=ANN_NPROBE):
+    """Return the indices of the `nprobe` lists closest to a unit-length query."""
+    scores = centroids @ np.asarray(query, dtype=np.float32)
+    if nprobe >= len(centroids):
+        return np.arange(len(centroids))
+    return np.argpartition(-scores, nprobe)[:nprobe]
@@ -7,14 +7,16 @@ from components.quizzes import quizzes
 from components.progress_tracking import progress_tracking
 from components.assignment import conceptual_assignments
 from components.feedback import feedback
-from db import init_database
+from components.usage_report import usage_report
+from lecture_jobs import resume_incomplete_jobs
+import llm_usage
 
 
 
 # Initialize session state
 init_session_state()
-# Initialize the quiz results table on app startup
-init_database()
+# Restart lecture precomputation jobs interrupted by a server restart
+resume_incomplete_jobs()
 
 # Set page configuration
 st.set_page_config(page_title="APUOPE-RE", layout="wide")
@@ -52,21 +54,26 @@ page = st.sidebar.radio("Go to", [
     "Studying lectures",
     "Quiz",
     "Assignment",
-    "Feedback"
+    "Feedback",
+    "LLM Usage"
 ])
 
-# Render the selected page
-if page == "Dashboard":
-    dashboard()
-    progress_tracking()
-elif page == "Materials":
-    role_protect("teacher")  # Protect access to uploading/deleting content
-    lecture_summaries()
-elif page == "Studying lectures":
-    conceptual_examples()
-elif page == "Quiz":
-    quizzes()
-elif page == "Assignment":
-    conceptual_assignments()
-elif page == "Feedback":
-    feedback()
+# Render the selected page, attributing its API usage to the page and user
+with llm_usage.tagged(page=page, user_id=st.session_state["user"]["id"]):
+    if page == "Dashboard":
+        dashboard()
+        progress_tracking()
+    elif page == "Materials":
+        role_protect("teacher")  # Protect access to uploading/deleting content
+        lecture_summaries()
+    elif page == "Studying lectures":
+        conceptual_examples()
+    elif page == "Quiz":
+        quizzes()
+    elif page == "Assignment":
+        conceptual_assignments()
+    elif page == "Feedback":
+        feedback()
+    elif page == "LLM Usage":
+        role_protect("teacher")
+        usage_report()
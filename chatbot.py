@@ -1,7 +1,11 @@
-import openai
+import llm_client
+import llm_usage
+import model_router
 import streamlit as st
 import PyPDF2
 import relevance_check
+import rag_engine
+import hashlib
 import os
 from dotenv import load_dotenv
 
@@ -9,9 +13,6 @@ from dotenv import load_dotenv
 if os.getenv("RENDER") is None:  # Render sets RENDER environment variable
     load_dotenv()
 
-# Set OpenAI API key
-openai.api_key = os.getenv("OPENAI_API_KEY")
-
 # Initialize session state variables if they don’t already exist
 if "response_text" not in st.session_state:
     st.session_state.response_text = ""
@@ -45,7 +46,8 @@ with col1:
         try:
             # Read PDF
             pdf_reader = PyPDF2.PdfReader(uploaded_file)
-            pdf_content = "\n".join([page.extract_text() for page in pdf_reader.pages])
+            pdf_pages = [page.extract_text() for page in pdf_reader.pages]
+            pdf_content = "\n".join(pdf_pages)
             st.success("PDF content extracted successfully.")
         except Exception as e:
             st.error("Failed to read PDF content. Please check the file format.")
@@ -55,17 +57,23 @@ with col1:
 
 # Generate a response only when there’s a user input, PDF content, and no response generated
 if user_input and pdf_content and not st.session_state.response_generated:
-    full_context = f"PDF content:\n{pdf_content}\n\nUser's question: {user_input}"
+    # Send only the chunks of the PDF that are relevant to the question. The upload
+    # is scored in memory so it never joins the course's vector store.
+    document_key = "upload-" + hashlib.md5(pdf_content.encode("utf-8")).hexdigest()
+    with llm_usage.tagged(page="Chatbot", lecture_id=document_key):
+        relevant_content = rag_engine.build_document_context(pdf_pages, user_input)
+    full_context = f"PDF content:\n{relevant_content or pdf_content}\n\nUser's question: {user_input}"
 
     try:
         # Call OpenAI API with the gpt-4o-mini model
-        response = openai.ChatCompletion.create(
-            model="gpt-4o-mini",
-            messages=[
-                {"role": "system", "content": "You are a helpful assistant who can answer questions based on provided PDF content."},
-                {"role": "user", "content": full_context}
-            ]
-        )
+        with llm_usage.tagged(caller="chatbot_response", page="Chatbot", lecture_id=document_key):
+            response = llm_client.chat_completion(
+                model=model_router.route("chatbot", llm_client.estimate_tokens(full_context)).model,
+                messages=[
+                    {"role": "system", "content": "You are a helpful assistant who can answer questions based on provided PDF content."},
+                    {"role": "user", "content": full_context}
+                ]
+            )
         chatbot_response = response['choices'][0]['message']['content']
 
         # Store the response and set the chatbox to show
@@ -98,15 +106,20 @@ if st.button("Calculate Relevance Scores"):
 # Display relevance scores if the button has been clicked
 if st.session_state.relevance_shown:
     with st.spinner("Calculating relevance scores..."):
-        semantic_similarity = relevance_check.calculate_semantic_similarity(pdf_content, st.session_state.response_text)
-        keyword_overlap = relevance_check.calculate_keyword_overlap(pdf_content, st.session_state.response_text)
-        feedback_score, feedback_details = relevance_check.calculate_feedback_score(pdf_content, st.session_state.response_text)
+        with llm_usage.tagged(page="Chatbot"):
+            scores = relevance_check.check_relevance(pdf_content, st.session_state.response_text)
+    keyword_overlap = f"{scores['keyword_overlap'] * 100:.2f}%" if scores["keyword_overlap"] is not None else None
 
     st.write("### Relevance Scores:")
-    st.write(f"- **Semantic Similarity:** {semantic_similarity}")
-    st.write(f"- **Keyword Overlap:** {keyword_overlap * 100:.2f}%")
-    st.write(f"- **LLM Feedback Score:** {feedback_score}")
-    st.write(f"- **LLM Feedback Details:** {feedback_details}")
+    st.write(f"- **Semantic Similarity:** {scores['semantic_similarity']}")
+    if scores["semantic_scores"]:
+        st.write(f"- **Best Matching Passage ({scores['semantic_scores']['max']}):** "
+                 f"{scores['semantic_scores']['matches'][0]['text']}...")
+    st.write(f"- **Keyword Overlap:** {keyword_overlap}")
+    st.write(f"- **LLM Feedback Score:** {scores['feedback_score']}")
+    st.write(f"- **LLM Feedback Details:** {scores['feedback_details']}")
+    for metric, error in scores["errors"].items():
+        st.warning(f"{metric}: {error}")
 
 # Reset response state if new input is given
 if user_input and not st.session_state.response_generated:
@@ -2,16 +2,17 @@ import os
 import streamlit as st
 import pandas as pd
 from datetime import datetime
-import openai  # Library to interact with OpenAI GPT models
 from db import (get_lectures, save_generated_assignment, submit_student_assignment, 
-                get_all_assignments, get_student_assignments)
+                get_assignments, search_assignments, get_student_assignments)
+from components.pagination import paginate
 from pdf_extractor import extract_text_from_pdf  # For extracting text
+from llm_cache import cached_chat_completion  # Serves repeated prompts without new API calls
+import llm_usage  # Tags API usage with the function that caused it
+import llm_client  # Token estimates for model routing
+import model_router  # Picks the model for each request by task and prompt size
 from reportlab.pdfgen import canvas  # For generating PDFs
 import time  # For typing effect
 
-# Set the OpenAI API key
-openai.api_key = os.getenv("OPENAI_API_KEY", "API KEY")
-
 # Directory for storing submitted and generated assignments
 SUBMISSION_DIR = "submitted_assignments"
 GENERATED_DIR = "generated_assignments"
@@ -19,22 +20,24 @@ os.makedirs(SUBMISSION_DIR, exist_ok=True)
 os.makedirs(GENERATED_DIR, exist_ok=True)
 
 
-def generate_conceptual_assignment(pdf_title):
-    """Generate a real-life scenario-based conceptual assignment using GPT-4o."""
+@llm_usage.track("generate_conceptual_assignment")
+def generate_conceptual_assignment(pdf_title, use_cache=True):
+    """Generate a real-life scenario-based conceptual assignment (served from the cache when possible)."""
+    messages = [
+        {"role": "system", "content": (
+            "You are an assistant that generates real-world, scenario-based conceptual assignments "
+            "for students. Each assignment must be clear, practical, and tied to real-life situations. "
+            "Ensure it aligns with the given lecture title."
+        )},
+        {"role": "user", "content": f"Create a real-life scenario-based conceptual assignment based on the lecture titled: '{pdf_title}'"}
+    ]
     try:
-        response = openai.ChatCompletion.create(
-            model="gpt-4o",
-            messages=[
-                {"role": "system", "content": (
-                    "You are an assistant that generates real-world, scenario-based conceptual assignments "
-                    "for students. Each assignment must be clear, practical, and tied to real-life situations. "
-                    "Ensure it aligns with the given lecture title."
-                )},
-                {"role": "user", "content": f"Create a real-life scenario-based conceptual assignment based on the lecture titled: '{pdf_title}'"}
-            ],
-            max_tokens=600
+        return cached_chat_completion(
+            model=model_router.route("assignment", llm_client.estimate_tokens(messages[0]["content"] + messages[1]["content"])).model,
+            messages=messages,
+            max_tokens=600,
+            use_cache=use_cache
         )
-        return response["choices"][0]["message"]["content"]
     except Exception as e:
         st.error(f"Error: {e}")
         return None
@@ -172,61 +175,77 @@ def conceptual_assignments():
     elif user["role"] == "teacher":
         st.markdown("<h3 style='color: #362f2f; font-weight: bold;'>View All Assignments</h3>", unsafe_allow_html=True)
 
+        # Ranked full-text search over assignment titles and generated text
+        search_query = st.text_input("Search assignments:", placeholder="e.g. shortest path")
+        if search_query.strip():
+            matches = search_assignments(search_query)
+            if matches:
+                for assignment_id, student_name, title, snippet in matches:
+                    st.markdown(f"**#{assignment_id} {title}** ({student_name or 'generated'})  \n{snippet}")
+            else:
+                st.info("No assignments match your search.")
+            st.write("---")
+
         # Filter Section
         st.markdown("<h3 style='color: #362f2f; font-weight: bold;'>Filter by Student ID or Email</h3>", unsafe_allow_html=True)
         col1, col2 = st.columns(2)
         with col1:
-            student_id_filter = st.text_input("Enter Student ID (optional):")
+            student_id_filter = st.text_input("Enter Student ID (optional):").strip()
         with col2:
-            email_filter = st.text_input("Enter Email ID (optional):")
+            email_filter = st.text_input("Enter Email ID (optional):").strip()
 
-        # Fetch all assignments
-        assignments = get_all_assignments()
-
-        # Apply filters
         if student_id_filter or email_filter:
-            if student_id_filter:
-                assignments = [a for a in assignments if str(a[0]) == student_id_filter]
-            if email_filter:
-                assignments = [a for a in assignments if a[1] and email_filter.lower() in a[1].lower()]
-
             st.markdown(f"### Showing Filtered Results for Student ID: `{student_id_filter}` or Email: `{email_filter}`")
         else:
             st.markdown("<h3 style='color: #362f2f; font-weight: bold;'>Showing All Assignments</h3>", unsafe_allow_html=True)
 
+        # Filtering and paging happen in SQL; only the current page is loaded
+        assignments = paginate(
+            "assignment_pages",
+            (student_id_filter, email_filter),
+            lambda after: get_assignments(student_id=student_id_filter, email=email_filter, after=after),
+        )
+
         # Display Assignments
         if not assignments:
             st.info("No assignments found.")
         else:
-            for idx, assignment in enumerate(assignments):
-                st.write(f"### **Assignment Block**")
-                st.write(f"**Student ID**: {assignment[0]}")
-                st.write(f"**Email ID**: {assignment[1]}")
-                st.write(f"**Assignment Title**: {assignment[2]}")
-
-                # Display Generated Assignment
-                if assignment[3]:
-                    doc_file_path = save_assignment_to_doc(assignment[3], assignment[2])
-                    st.write("**Generated Assignment:**")
-                    st.download_button(
-                        label="Download Generated Assignment",
-                        data=open(doc_file_path, "rb"),
-                        file_name=os.path.basename(doc_file_path),
-                        key=f"assignment_generated_{idx}"
-                    )
-
-                # Display Submitted Assignment
-                if assignment[4]:
-                    st.write("**Submitted Assignment:**")
-                    st.download_button(
-                        label="Download Submitted Assignment",
-                        data=open(assignment[4], "rb"),
-                        file_name=os.path.basename(assignment[4]),
-                        key=f"assignment_submitted_{idx}"
-                    )
-                else:
-                    st.warning("No assignment submitted for this lecture.")
-                st.write("---")
+            table = pd.DataFrame(
+                [(a[0], a[1], a[2], a[3], bool(a[4]), bool(a[5])) for a in assignments],
+                columns=["ID", "Student ID", "Email ID", "Assignment Title", "Generated", "Submitted"],
+            )
+            st.dataframe(table, hide_index=True, use_container_width=True)
+
+            # Downloads are prepared for the selected assignment only, not for every row of the page
+            by_id = {a[0]: a for a in assignments}
+            selected_id = st.selectbox(
+                "Select an assignment to download:", list(by_id),
+                format_func=lambda i: f"#{i} - {by_id[i][3]} ({by_id[i][2] or 'generated'})",
+            )
+            _, _, _, title, generated_assignment, submitted_file_path = by_id[selected_id]
+
+            # Display Generated Assignment
+            if generated_assignment:
+                doc_file_path = save_assignment_to_doc(generated_assignment, title)
+                st.write("**Generated Assignment:**")
+                st.download_button(
+                    label="Download Generated Assignment",
+                    data=open(doc_file_path, "rb"),
+                    file_name=os.path.basename(doc_file_path),
+                    key=f"assignment_generated_{selected_id}"
+                )
+
+            # Display Submitted Assignment
+            if submitted_file_path:
+                st.write("**Submitted Assignment:**")
+                st.download_button(
+                    label="Download Submitted Assignment",
+                    data=open(submitted_file_path, "rb"),
+                    file_name=os.path.basename(submitted_file_path),
+                    key=f"assignment_submitted_{selected_id}"
+                )
+            else:
+                st.warning("No assignment submitted for this lecture.")
 
 if __name__ == "__main__":
     conceptual_assignments()
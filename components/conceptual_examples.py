@@ -1,48 +1,71 @@
-import os
 import streamlit as st
-from db import get_lectures  # Import the function to retrieve lecture PDFs from the database
+from db import get_lectures, get_lecture_artifact  # Lecture PDFs and their precomputed summaries
 from pdf_extractor import extract_text_from_pdf  # Custom function to extract text
-from relevance_check import calculate_semantic_similarity, calculate_keyword_overlap, calculate_feedback_score
+from relevance_check import check_relevance  # Runs the relevance metrics in parallel
+from rag_engine import build_context  # Retrieves the lecture chunks relevant to a request
+from llm_cache import cached_chat_completion_stream  # Streams responses, serving repeated prompts from the cache
 import pandas as pd
-import openai  # Library to interact with GPT-4o mini API
-import time  # For simulating typing effect
+import llm_client  # Shared OpenAI client (API key, rate limits, retries)
+import llm_usage  # Tags API usage with the function and lecture that caused it
+from content_prompts import SUMMARY_QUERY, CONTENTS_QUERY, content_request, summary_prompt, contents_prompt
+import time  # For throttling streamed renders
 from dotenv import load_dotenv
 
 # Load environment variables from .env file
 load_dotenv()
 
-# Set up OpenAI API key
-api_key = os.getenv("OPENAI_API_KEY")
-if not api_key:
-    raise ValueError("OPENAI_API_KEY not set! Please configure it in your .env file or environment variables.")
-openai.api_key = api_key
+# Check the OpenAI API key
+llm_client.require_api_key()
 
+# Retrieval query used to pick the lecture chunks sent with the conceptual example prompt
+CONCEPTUAL_EXAMPLE_QUERY = "Core concepts, definitions and techniques that can be illustrated with a real-world example"
 
-def generate_content(prompt):
-    """Generate content based on a user prompt using GPT-4o."""
+# Minimum seconds between re-renders of a streamed response
+RENDER_INTERVAL = 0.05
+
+
+@llm_usage.track("generate_content")
+def generate_content_stream(prompt, use_cache=True, task="custom"):
+    """Yield the routed model's response to a prompt as it is generated (identical prompts are served from the cache)."""
     try:
-        response = openai.ChatCompletion.create(
-            model="gpt-4o",
-            messages=[
-                {"role": "system", "content": "You are an assistant that generates conceptual examples, summaries, and key contents based on PDF content."},
-                {"role": "user", "content": prompt}
-            ],
-            max_tokens=500
-        )
-        return response["choices"][0]["message"]["content"]
+        yield from cached_chat_completion_stream(**content_request(prompt, task), use_cache=use_cache)
     except Exception as e:
-        return f"Error generating content: {e}"
+        yield f"Error generating content: {e}"
+
+
+def generate_content(prompt, use_cache=True, task="custom"):
+    """Generate content based on a user prompt, with the model routed by task and prompt size."""
+    return "".join(generate_content_stream(prompt, use_cache, task))
 
 
-def typing_effect(text):
-    """Simulate a typing effect."""
+def render_stream(chunks):
+    """Render streamed text as it arrives, redrawing at most every RENDER_INTERVAL seconds, and return the full text."""
     placeholder = st.empty()
-    typed_text = ""
-    for char in text:
-        typed_text += char
-        placeholder.markdown(typed_text + "▌")
-        time.sleep(0.01)
-    placeholder.markdown(typed_text)
+    text = ""
+    last_render = 0.0
+    for chunk in chunks:
+        text += chunk
+        now = time.monotonic()
+        if now - last_render >= RENDER_INTERVAL:
+            placeholder.markdown(text + "▌")
+            last_render = now
+    placeholder.markdown(text)
+    return text
+
+
+def summarize_relevance(course_material, generated_content):
+    """Run the relevance metrics concurrently and format them for display."""
+    scores = check_relevance(course_material, generated_content)
+    semantic_score = scores["semantic_similarity"]
+    semantic_scores = scores["semantic_scores"]
+    keyword_overlap = scores["keyword_overlap"]
+    return {
+        "Semantic Similarity": f"{semantic_score:.2f}" if semantic_score is not None else "N/A",
+        "Best Matching Passage": (f"{semantic_scores['max']:.2f}: {semantic_scores['matches'][0]['text']}..."
+                                  if semantic_scores else "N/A"),
+        "Keyword Overlap": f"{keyword_overlap:.2%}" if keyword_overlap is not None else "N/A",
+        "LLM Feedback Score": scores["feedback_score"] if scores["feedback_score"] else "N/A"
+    }
 
 
 def conceptual_examples():
@@ -59,9 +82,18 @@ def conceptual_examples():
     lecture_titles = lecture_data["Title"].tolist()
     selected_lecture_title = st.selectbox("Select a lecture:", lecture_titles)
 
-    # Extract file path
-    selected_lecture_path = lecture_data.loc[lecture_data["Title"] == selected_lecture_title, "File Path"].values[0]
+    # Extract lecture ID and file path
+    selected_lecture = lecture_data.loc[lecture_data["Title"] == selected_lecture_title].iloc[0]
+    selected_lecture_id = int(selected_lecture["ID"])
+    selected_lecture_path = selected_lecture["File Path"]
 
+    # Attribute API usage on this page to the selected lecture
+    with llm_usage.tagged(lecture_id=selected_lecture_id):
+        study_lecture(selected_lecture_id, selected_lecture_title, selected_lecture_path)
+
+
+def study_lecture(selected_lecture_id, selected_lecture_title, selected_lecture_path):
+    """Study tools (examples, summary, contents, custom prompts) for the selected lecture."""
     # Extract PDF content
     extracted_text = extract_text_from_pdf(selected_lecture_path)
     if not extracted_text:
@@ -78,40 +110,41 @@ def conceptual_examples():
     col1, col2, col3 = st.columns(3)
     with col1:
         if st.button("Generate Conceptual Example"):
-            prompt = f"Generate a conceptual example based on the following content:\n\n{extracted_text}"
-            st.session_state.generated_content = generate_content(prompt)
+            context = build_context(selected_lecture_id, CONCEPTUAL_EXAMPLE_QUERY) or extracted_text
+            prompt = f"Generate a conceptual example based on the following content:\n\n{context}"
             st.session_state.relevance_summary = None
-            typing_effect(st.session_state.generated_content)
+            st.session_state.generated_content = render_stream(generate_content_stream(prompt, task="conceptual_example"))
 
     with col2:
         if st.button("Generate Summary"):
-            prompt = f"Generate a concise summary of the following content:\n\n{extracted_text}"
-            st.session_state.generated_content = generate_content(prompt)
             st.session_state.relevance_summary = None
-            typing_effect(st.session_state.generated_content)
+            # Use the summary precomputed on upload; generate it live if the job has not finished yet
+            summary = get_lecture_artifact(selected_lecture_id, "summary")
+            if summary:
+                st.markdown(summary)
+                st.session_state.generated_content = summary
+            else:
+                context = build_context(selected_lecture_id, SUMMARY_QUERY) or extracted_text
+                st.session_state.generated_content = render_stream(generate_content_stream(summary_prompt(context), task="summary"))
 
     with col3:
         if st.button("Find Contents"):
-            prompt = f"List the key contents or sections in the following content:\n\n{extracted_text}"
-            st.session_state.generated_content = generate_content(prompt)
             st.session_state.relevance_summary = None
-            typing_effect(st.session_state.generated_content)
+            contents = get_lecture_artifact(selected_lecture_id, "contents")
+            if contents:
+                st.markdown(contents)
+                st.session_state.generated_content = contents
+            else:
+                context = build_context(selected_lecture_id, CONTENTS_QUERY) or extracted_text
+                st.session_state.generated_content = render_stream(generate_content_stream(contents_prompt(context), task="contents"))
 
     # Relevance Check Button
     if st.session_state.generated_content:
         st.markdown("### Check the Relevance of Generated Content")
         if st.button("Check Relevance"):
-            # Calculate relevance
-            semantic_score = calculate_semantic_similarity(extracted_text, st.session_state.generated_content)
-            keyword_overlap = calculate_keyword_overlap(extracted_text, st.session_state.generated_content)
-            feedback_score, _ = calculate_feedback_score(extracted_text, st.session_state.generated_content)
-
-            # Save to session state to avoid reset
-            st.session_state.relevance_summary = {
-                "Semantic Similarity": f"{semantic_score:.2f}",
-                "Keyword Overlap": f"{keyword_overlap:.2%}",
-                "LLM Feedback Score": feedback_score if feedback_score else "N/A"
-            }
+            # Calculate relevance and save to session state to avoid reset
+            with st.spinner("Checking relevance..."):
+                st.session_state.relevance_summary = summarize_relevance(extracted_text, st.session_state.generated_content)
 
         # Display relevance summary
         if st.session_state.relevance_summary:
@@ -124,25 +157,18 @@ def conceptual_examples():
     user_prompt = st.text_area("Enter your prompt here (related to the selected lecture):")
     if st.button("Generate Custom Response"):
         if user_prompt.strip():
-            full_prompt = f"Based on the following content from the lecture titled '{selected_lecture_title}':\n\n{extracted_text}\n\n{user_prompt}"
-            st.session_state.generated_content = generate_content(full_prompt)
+            context = build_context(selected_lecture_id, user_prompt) or extracted_text
+            full_prompt = f"Based on the following content from the lecture titled '{selected_lecture_title}':\n\n{context}\n\n{user_prompt}"
             st.session_state.relevance_summary = None
-            typing_effect(st.session_state.generated_content)
+            st.session_state.generated_content = render_stream(generate_content_stream(full_prompt))
         else:
             st.warning("Please enter a custom prompt to generate a response.")
 
     # Relevance Check for Custom Response
     if st.session_state.generated_content and st.button("Check Custom Response Relevance"):
-        semantic_score = calculate_semantic_similarity(extracted_text, st.session_state.generated_content)
-        keyword_overlap = calculate_keyword_overlap(extracted_text, st.session_state.generated_content)
-        feedback_score, _ = calculate_feedback_score(extracted_text, st.session_state.generated_content)
-
         # Save to session state
-        st.session_state.relevance_summary = {
-            "Semantic Similarity": f"{semantic_score:.2f}",
-            "Keyword Overlap": f"{keyword_overlap:.2%}",
-            "LLM Feedback Score": feedback_score if feedback_score else "N/A"
-        }
+        with st.spinner("Checking relevance..."):
+            st.session_state.relevance_summary = summarize_relevance(extracted_text, st.session_state.generated_content)
 
     if st.session_state.relevance_summary:
         st.success("Relevance Check Summary:")
@@ -1,10 +1,7 @@
 import streamlit as st
-from db import init_feedback_table, submit_feedback, get_all_feedback
+from db import submit_feedback, get_all_feedback, search_feedback
 from auth import has_role
 
-# Ensure the feedback table is initialized
-init_feedback_table()
-
 
 def feedback():
     st.markdown("<h1 style='color: #4CAF50;'>Feedback</h1>", unsafe_allow_html=True)
@@ -23,6 +20,23 @@ def feedback():
 
     elif has_role("teacher"):
         st.markdown("<h3 style='color: #362f2f; font-weight: bold;'>View Feedback</h3>", unsafe_allow_html=True)
+        search_query = st.text_input("Search feedback:", placeholder="e.g. quiz difficulty")
+
+        if search_query.strip():
+            # Ranked full-text search; only the best matches are rendered
+            matches = search_feedback(search_query)
+            if matches:
+                st.caption(f"{len(matches)} matching entries, best first")
+                for _, snippet, submitted_at in matches:
+                    st.markdown(f"""
+                    **Submitted At:** {submitted_at}  
+                    **Feedback:** {snippet}
+                    """)
+                    st.markdown("---")
+            else:
+                st.info("No feedback matches your search.")
+            return
+
         feedback_data = get_all_feedback()
 
         if feedback_data:
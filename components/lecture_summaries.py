@@ -1,7 +1,9 @@
 import streamlit as st
 import pandas as pd
-from db import init_db, save_to_db, get_lectures, delete_from_db
+from db import save_to_db, get_lectures, delete_from_db, delete_extraction, get_lecture_job
 from auth import has_role
+import rag_engine
+import lecture_jobs
 from datetime import datetime
 import os
 
@@ -11,9 +13,6 @@ os.makedirs(UPLOAD_DIR, exist_ok=True)
 
 
 def lecture_summaries():
-    # Initialize the database (create tables if they don't exist)
-    init_db()
-
     # Lecture Summaries Header
     st.markdown("<h1 style='color: #4CAF50;'>Lecture Materials</h1>", unsafe_allow_html=True)
 
@@ -22,16 +21,23 @@ def lecture_summaries():
         st.markdown("<h3 style='color: #362f2f; font-weight: bold;'>Upload Lectures</h3>", unsafe_allow_html=True)
         uploaded_file = st.file_uploader("Upload Lecture PDF", type="pdf")
         if uploaded_file is not None:
-            # Save file to the local directory
-            file_path = os.path.join(UPLOAD_DIR, uploaded_file.name.replace(" ", "_"))
-            with open(file_path, "wb") as f:
-                f.write(uploaded_file.getbuffer())
+            # The file stays in the uploader while Streamlit reruns this script on every
+            # interaction; save and queue each upload only once
+            if st.session_state.get("handled_upload_id") != uploaded_file.file_id:
+                # Save file to the local directory
+                file_path = os.path.join(UPLOAD_DIR, uploaded_file.name.replace(" ", "_"))
+                with open(file_path, "wb") as f:
+                    f.write(uploaded_file.getbuffer())
+
+                # Save lecture information to the database
+                lecture_id = save_to_db(uploaded_file.name, file_path)
 
-            # Save lecture information to the database
-            save_to_db(uploaded_file.name, file_path)
+                # Index the lecture and pre-generate its summary, contents and quizzes in the background
+                lecture_jobs.submit_lecture_job(lecture_id)
+                st.session_state.handled_upload_id = uploaded_file.file_id
 
             # Display success message
-            st.markdown('<div class="upload-success">Uploaded successfully!</div>', unsafe_allow_html=True)
+            st.markdown('<div class="upload-success">Uploaded successfully! Study material is being prepared in the background.</div>', unsafe_allow_html=True)
 
     # Display uploaded lectures from the database
     st.markdown("<h3 style='color: #362f2f; font-weight: bold;'>Uploaded Lecture Summaries</h3>", unsafe_allow_html=True)
@@ -48,6 +54,8 @@ def lecture_summaries():
                         <small>Uploaded on: {row["Upload Date"]}</small>
                     </div>
                 """, unsafe_allow_html=True)
+                if has_role("teacher"):
+                    st.caption(job_status(row["ID"]))
             with col2:
                 # Disable delete button for students
                 if has_role("teacher"):
@@ -59,10 +67,27 @@ def lecture_summaries():
         st.write("No lectures uploaded yet.")
 
 
+def job_status(lecture_id):
+    """Describe the progress of a lecture's precomputation job."""
+    job = get_lecture_job(lecture_id)
+    if job is None:
+        return "Study material: generated on demand"
+    status, stage, error, _ = job
+    if status == "done":
+        return "Study material: ready"
+    if status == "failed":
+        return f"Study material: failed at {stage} ({error}); students get live generation"
+    if status == "running":
+        return f"Study material: preparing ({stage or 'starting'})..."
+    return "Study material: queued"
+
+
 # Delete uploaded lectures
 def delete_file(lecture_id, file_path):
     """Delete a file and its database entry."""
     if os.path.exists(file_path):
         os.remove(file_path)
+    delete_extraction(file_path)
+    rag_engine.remove_lecture(lecture_id)
     delete_from_db(lecture_id)
     st.success("Lecture deleted successfully!")
@@ -0,0 +1,38 @@
+import streamlit as st
+
+
+def paginate(key, filters, fetch_page):
+    """
+    Fetch the current page of a keyset-paginated query and show Previous/Next buttons.
+
+    The cursors of the pages visited so far are kept in session state, so going
+    back re-runs the query for that page instead of keeping every row in memory.
+
+    Args:
+        key (str): Session state key of this pager; also prefixes the button keys.
+        filters (tuple): Current filter values. Changing them goes back to the first page.
+        fetch_page (callable): Called with the cursor of a page (None for the first one);
+            returns (rows, cursor of the next page or None).
+
+    Returns:
+        list: The rows of the current page.
+    """
+    state = st.session_state.get(key)
+    if state is None or state["filters"] != filters:
+        state = st.session_state[key] = {"filters": filters, "cursors": [None]}
+
+    rows, next_cursor = fetch_page(state["cursors"][-1])
+    page = len(state["cursors"])
+
+    col1, col2, col3 = st.columns([1, 1, 4])
+    with col1:
+        if st.button("Previous", key=f"{key}_previous", disabled=page == 1):
+            state["cursors"].pop()
+            st.rerun()
+    with col2:
+        if st.button("Next", key=f"{key}_next", disabled=next_cursor is None):
+            state["cursors"].append(next_cursor)
+            st.rerun()
+    with col3:
+        st.caption(f"Page {page}")
+    return rows
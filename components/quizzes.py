@@ -1,11 +1,24 @@
-import os
 import streamlit as st
+import pandas as pd
 from pdf_extractor import extract_text_from_pdf
-from quiz_handler import generate_quiz, evaluate_quiz
-from db import save_quiz_result, get_student_quiz_results, get_all_quiz_results
+from quiz_handler import generate_quiz_stream, evaluate_quiz
+from rag_engine import build_context
+from quiz_bank import QUIZ_DIFFICULTIES, QUIZ_QUERY, QUIZ_TOP_K, sample_quiz, add_questions
+from db import get_lectures, save_quiz_result, get_student_quiz_results, get_quiz_results
+from components.pagination import paginate
 from auth import has_role
-
-UPLOAD_DIR = "uploaded_pdfs"
+import llm_usage
+
+def render_question(idx, question):
+    """Show one quiz question with its answer widget and return the widget's value."""
+    st.markdown(f"**Q{idx + 1}: {question['question']}**")
+    if question["type"] == "mcq_single":
+        return st.radio("Choose:", question["options"], key=f"q{idx}")
+    elif question["type"] == "true_false":
+        return st.radio("True/False:", question["options"], key=f"q{idx}")
+    elif question["type"] == "mcq_multiple":
+        return st.multiselect("Select all:", question["options"], key=f"q{idx}")
+    return None
 
 def quizzes():
     st.markdown("<h1 style='color: #4CAF50;'>Take a Quiz</h1>", unsafe_allow_html=True)
@@ -21,33 +34,39 @@ def quizzes():
 
     # Student View: Quiz Generation and History
     if role == "student":
-        # Ensure there are uploaded PDFs
-        pdf_files = [f for f in os.listdir(UPLOAD_DIR) if f.endswith(".pdf")]
-        if not pdf_files:
+        # Ensure there are uploaded lectures
+        lectures = {title: (lecture_id, file_path) for lecture_id, title, _, file_path in get_lectures()}
+        if not lectures:
             st.warning("No lecture materials available. Please upload course materials first.")
             return
 
         # Lecture Selection
         st.markdown("<h3 style='color: #362f2f; font-weight: bold;'>Select a Lecture to Generate a Quiz</h3>", unsafe_allow_html=True)
-        selected_lecture = st.selectbox("Choose a Lecture:", pdf_files)
+        selected_lecture = st.selectbox("Choose a Lecture:", list(lectures))
 
         # Difficulty Level Selection
         st.markdown("<h3 style='color: #362f2f; font-weight: bold;'>Choose Difficulty Level</h3>", unsafe_allow_html=True)
-        difficulty = st.radio("Difficulty Level:", ["easy", "medium", "hard"])
+        difficulty = st.radio("Difficulty Level:", QUIZ_DIFFICULTIES)
 
         # Generate Quiz
+        quiz_stream = None
         if st.button("Generate Quiz"):
-            # Extract PDF content
-            pdf_path = os.path.join(UPLOAD_DIR, selected_lecture)
-            pdf_content = extract_text_from_pdf(pdf_path)
-
-            if not pdf_content:
-                st.error("Failed to extract content from the selected PDF.")
-                return
-
-            # Generate Quiz Questions and Answers
-            st.info("Generating quiz based on course material... Please wait!")
-            quiz_questions, correct_answers = generate_quiz(pdf_content, difficulty)
+            lecture_id, pdf_path = lectures[selected_lecture]
+
+            # Sample the quiz from the pre-generated bank; generate it live only if the bank is still empty
+            quiz_questions, correct_answers = sample_quiz(lecture_id, difficulty)
+            if not quiz_questions:
+                # Extract PDF content
+                pdf_content = extract_text_from_pdf(pdf_path)
+
+                if not pdf_content:
+                    st.error("Failed to extract content from the selected PDF.")
+                    return
+
+                # Generate the questions live; the quiz form below renders each one as it arrives
+                with llm_usage.tagged(lecture_id=lecture_id):
+                    context = build_context(lecture_id, QUIZ_QUERY, top_k=QUIZ_TOP_K) or pdf_content
+                quiz_stream = (lecture_id, generate_quiz_stream(context, difficulty))
             st.session_state.quiz_questions = quiz_questions
             st.session_state.correct_answers = correct_answers
             st.session_state.selected_lecture = selected_lecture
@@ -59,13 +78,23 @@ def quizzes():
             st.markdown("<h3 style='color: #362f2f; font-weight: bold;'>Quiz Form</h3>", unsafe_allow_html=True)
             submitted_answers = {}
             for idx, question in enumerate(st.session_state.quiz_questions):
-                st.markdown(f"**Q{idx + 1}: {question['question']}**")
-                if question["type"] == "mcq_single":
-                    submitted_answers[idx] = st.radio("Choose:", question["options"], key=f"q{idx}")
-                elif question["type"] == "true_false":
-                    submitted_answers[idx] = st.radio("True/False:", question["options"], key=f"q{idx}")
-                elif question["type"] == "mcq_multiple":
-                    submitted_answers[idx] = st.multiselect("Select all:", question["options"], key=f"q{idx}")
+                submitted_answers[idx] = render_question(idx, question)
+
+            if quiz_stream is not None:
+                lecture_id, questions = quiz_stream
+                status = st.empty()
+                status.info("Generating quiz based on course material... Questions appear as they are written.")
+                with llm_usage.tagged(lecture_id=lecture_id):
+                    for question in questions:
+                        idx = len(st.session_state.quiz_questions)
+                        st.session_state.quiz_questions.append(question)
+                        st.session_state.correct_answers[idx] = question["answer"]
+                        submitted_answers[idx] = render_question(idx, question)
+                status.empty()
+                if not st.session_state.quiz_questions:
+                    st.error("Failed to generate a quiz. Please try again.")
+                    return
+                add_questions(lecture_id, st.session_state.difficulty, st.session_state.quiz_questions)
 
             if st.button("Submit Quiz"):
                 # Evaluate quiz
@@ -102,28 +131,31 @@ def quizzes():
         st.markdown("<h3 style='color: #362f2f; font-weight: bold;'>All Students' Quiz Results</h3>", unsafe_allow_html=True)
         
         # Filter Section
-        st.markdown("<h3 style='color: #362f2f; font-weight: bold;'>Filter by Student ID</h3>", unsafe_allow_html=True)
-        student_id_filter = st.text_input("Enter Student ID (optional):")
-
-        # Fetch all quiz results
-        all_results = get_all_quiz_results()
-
-        # Apply filter
-        if student_id_filter:
-            all_results = [r for r in all_results if str(r[0]) == student_id_filter]
-            st.markdown("<h3 style='color: #362f2f; font-weight: bold;'>Showing Filtered Results for Student ID:</h3>", unsafe_allow_html=True)
+        st.markdown("<h3 style='color: #362f2f; font-weight: bold;'>Filter by Student ID or Lecture</h3>", unsafe_allow_html=True)
+        col1, col2 = st.columns(2)
+        with col1:
+            student_id_filter = st.text_input("Enter Student ID (optional):").strip()
+        with col2:
+            lecture_titles = sorted({title for _, title, _, _ in get_lectures()})
+            lecture_filter = st.selectbox("Lecture:", ["All lectures"] + lecture_titles)
+        lecture_filter = None if lecture_filter == "All lectures" else lecture_filter
+
+        if student_id_filter or lecture_filter:
+            st.markdown("<h3 style='color: #362f2f; font-weight: bold;'>Showing Filtered Results</h3>", unsafe_allow_html=True)
         else:
             st.markdown("<h3 style='color: #362f2f; font-weight: bold;'>Showing All Quiz Results</h3>", unsafe_allow_html=True)
-            
+
+        # Filtering and paging happen in SQL; only the current page is loaded
+        results = paginate(
+            "quiz_results_pages",
+            (student_id_filter, lecture_filter),
+            lambda after: get_quiz_results(student_id=student_id_filter or None, lecture=lecture_filter, after=after),
+        )
 
         # Display Quiz Results
-        if not all_results:
+        if not results:
             st.info("No quiz results are available yet.")
         else:
-            for result in all_results:
-                st.write(f"**Student ID**: {result[0]}")
-                st.write(f"**Lecture**: {result[1]}")
-                st.write(f"**Difficulty**: {result[2]}")
-                st.write(f"**Score**: {result[3]}/{result[4]}")
-                st.write(f"**Date**: {result[5]}")
-                st.write("---")
+            table = pd.DataFrame(results, columns=["Student ID", "Lecture", "Difficulty", "Score", "Total Questions",
+                                                   "Date"])
+            st.dataframe(table, hide_index=True, use_container_width=True)
@@ -0,0 +1,46 @@
+import streamlit as st
+import pandas as pd
+from db import USAGE_VIEWS, get_llm_usage_report
+from auth import has_role
+
+# Report sections: heading -> rolled-up usage view
+REPORT_SECTIONS = {
+    "By Day": "llm_usage_by_day",
+    "By Function": "llm_usage_by_caller",
+    "By Page": "llm_usage_by_page",
+    "By Lecture": "llm_usage_by_lecture",
+    "By User": "llm_usage_by_user",
+    "By Model": "llm_usage_by_model",
+}
+
+
+def usage_report():
+    st.markdown("<h1 style='color: #4CAF50;'>LLM Usage</h1>", unsafe_allow_html=True)
+
+    if not has_role("teacher"):
+        st.warning("You do not have permission to view the usage report.")
+        return
+
+    columns, rows = get_llm_usage_report("llm_usage_by_model")
+    if not rows:
+        st.info("No LLM calls have been recorded yet.")
+        return
+
+    # Overall totals
+    totals = pd.DataFrame(rows, columns=columns)
+    calls = int(totals["calls"].sum())
+    cache_hits = int(totals["cache_hits"].sum())
+    col1, col2, col3, col4 = st.columns(4)
+    col1.metric("Calls", f"{calls:,}")
+    col2.metric("Cache Hit Rate", f"{cache_hits / calls:.1%}")
+    col3.metric("Tokens", f"{int(totals['prompt_tokens'].sum() + totals['completion_tokens'].sum()):,}")
+    col4.metric("Estimated Cost", f"${totals['cost_usd'].sum():.2f}")
+
+    # Rolled-up breakdowns, most expensive first
+    for heading, view in REPORT_SECTIONS.items():
+        st.markdown(f"<h3 style='color: #362f2f; font-weight: bold;'>{heading}</h3>", unsafe_allow_html=True)
+        columns, rows = get_llm_usage_report(view)
+        report = pd.DataFrame(rows, columns=columns)
+        report[USAGE_VIEWS[view][0]] = report[USAGE_VIEWS[view][0]].fillna("(untagged)")
+        report["cache_hit_rate"] = report["cache_hits"] / report["calls"]
+        st.dataframe(report, hide_index=True, use_container_width=True)
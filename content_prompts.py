@@ -0,0 +1,33 @@
+"""
+Prompts and request parameters for the generated study material.
+
+Shared by the Conceptual Examples page and the background lecture jobs, so a
+summary precomputed by a job and one requested live hit the same cache entry.
+This module has no UI dependencies.
+"""
+import llm_client  # Token estimates for model routing
+import model_router  # Picks the model for each request by task and prompt size
+
+# Retrieval queries used to pick the lecture chunks sent with the summary and contents prompts
+SUMMARY_QUERY = "Main topics, key definitions and conclusions of the lecture"
+CONTENTS_QUERY = "Sections, headings and topics covered in the lecture"
+
+
+def summary_prompt(context):
+    return f"Generate a concise summary of the following content:\n\n{context}"
+
+
+def contents_prompt(context):
+    return f"List the key contents or sections in the following content:\n\n{context}"
+
+
+def content_request(prompt, task="custom"):
+    """Return the chat completion parameters for a prompt, with the model routed by task and prompt size."""
+    return {
+        "model": model_router.route(task, llm_client.estimate_tokens(prompt)).model,
+        "messages": [
+            {"role": "system", "content": "You are an assistant that generates conceptual examples, summaries, and key contents based on PDF content."},
+            {"role": "user", "content": prompt}
+        ],
+        "max_tokens": 500
+    }
@@ -1,12 +1,127 @@
+import json
+import os
+import re
 import sqlite3
+import threading
+from contextlib import contextmanager
 from datetime import datetime
 
 DB_PATH = 'lecture_summaries.db'
+DB_BUSY_TIMEOUT = float(os.getenv("DB_BUSY_TIMEOUT", "5"))  # Seconds to wait for another writer's lock
+DB_STATEMENT_CACHE_SIZE = 256  # Prepared statements kept per connection
+PAGE_SIZE = 50  # Rows per page of the paginated teacher views
+SNIPPET_TOKENS = 16  # Words around the matches in a search result snippet
 
-def init_db():
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
+# Full-text indexes: FTS5 table -> (indexed table, indexed columns). Triggers keep them in sync.
+FTS_TABLES = {
+    "feedback_fts": ("feedback", ("feedback_text",)),
+    "assignments_fts": ("assignments", ("assignment_title", "generated_assignment")),
+}
+
+# Each thread keeps one open connection per database file; every open connection
+# is also registered so close_all_connections can close them from any thread
+_local = threading.local()
+_connections = {}  # id(connection) -> (thread, connection)
+_connections_lock = threading.Lock()
+_generation = 0  # Bumped by close_all_connections to invalidate the thread-local connections
+_migrated = set()  # Connection keys of the databases this process has migrated
+_migrate_lock = threading.Lock()
+
+# Rolled-up LLM usage views: view name -> (grouping column, expression it is computed from)
+USAGE_VIEWS = {
+    "llm_usage_by_day": ("day", "substr(created_at, 1, 10)"),
+    "llm_usage_by_caller": ("caller", "caller"),
+    "llm_usage_by_page": ("page", "page"),
+    "llm_usage_by_user": ("user_id", "user_id"),
+    "llm_usage_by_lecture": ("lecture_id", "lecture_id"),
+    "llm_usage_by_model": ("model", "model"),
+}
+
+def _connection_key(path):
+    """Identify a database file by path and inode, so a deleted and recreated file gets a fresh connection."""
+    try:
+        return path, os.stat(path).st_ino
+    except FileNotFoundError:
+        return path, None
+
+def _open_connection(path):
+    conn = sqlite3.connect(path, timeout=DB_BUSY_TIMEOUT, cached_statements=DB_STATEMENT_CACHE_SIZE,
+                           check_same_thread=False)
+    # WAL lets readers continue while a writer commits; NORMAL sync is durable across app crashes in WAL mode
+    conn.execute("PRAGMA journal_mode = WAL")
+    conn.execute("PRAGMA synchronous = NORMAL")
+    conn.execute(f"PRAGMA busy_timeout = {int(DB_BUSY_TIMEOUT * 1000)}")
+    return conn
+
+def _close(conn):
+    with _connections_lock:
+        _connections.pop(id(conn), None)
+    conn.close()
+
+def get_connection():
+    """
+    Return this thread's connection to DB_PATH, opening it on first use.
+
+    Connections stay open for the life of the thread, so repeated queries reuse
+    the connection and its prepared statements. Use `transaction()` for writes.
+    """
+    if getattr(_local, "generation", None) != _generation:
+        _local.connections = {}
+        _local.generation = _generation
+    path = os.path.abspath(DB_PATH)
+    conn = _local.connections.get(_connection_key(path))
+    if conn is None:
+        # Close connections to an earlier file at this path (e.g. a deleted test database)
+        for key in [key for key in _local.connections if key[0] == path]:
+            _close(_local.connections.pop(key))
+        conn = _open_connection(path)
+        key = _connection_key(path)
+        _local.connections[key] = conn
+        with _connections_lock:
+            # Connections of finished threads are no longer reachable; close them here
+            dead = [conn_id for conn_id, (thread, _) in _connections.items() if not thread.is_alive()]
+            for conn_id in dead:
+                _connections.pop(conn_id)[1].close()
+            _connections[id(conn)] = (threading.current_thread(), conn)
+        # Bring the schema up to date the first time this process opens the database
+        if key not in _migrated:
+            with _migrate_lock:
+                if key not in _migrated:
+                    migrate()
+                    _migrated.add(key)
+    return conn
+
+@contextmanager
+def transaction(immediate=False):
+    """
+    Run a block of statements as one transaction on this thread's connection.
+
+    Commits when the block succeeds and rolls back if it raises. With
+    `immediate`, the write lock is taken up front (BEGIN IMMEDIATE).
+    """
+    conn = get_connection()
+    if immediate:
+        conn.execute("BEGIN IMMEDIATE")
+    try:
+        yield conn
+    except BaseException:
+        conn.rollback()
+        raise
+    conn.commit()
+
+def close_all_connections():
+    """Close every open connection of every thread (e.g. before deleting the database file)."""
+    global _generation
+    with _connections_lock:
+        connections = [conn for _, conn in _connections.values()]
+        _connections.clear()
+        _migrated.clear()
+        _generation += 1
+    for conn in connections:
+        conn.close()
 
+def _create_initial_schema(cursor):
+    """Migration 1: the tables created before schema versioning (by init_db and the other init_* functions)."""
     # Create table for lecture summaries
     cursor.execute('''
         CREATE TABLE IF NOT EXISTS lectures (
@@ -28,127 +143,915 @@ def init_db():
         )
     ''')
 
-    conn.commit()
-    conn.close()
+    # Create tables for feedback, quiz results and assignments
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS feedback (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            feedback_text TEXT NOT NULL,
+            submitted_at TEXT NOT NULL
+        )
+    ''')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS quiz_results (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            student_id INTEGER NOT NULL,
+            lecture_name TEXT NOT NULL,
+            difficulty TEXT NOT NULL,
+            score INTEGER NOT NULL,
+            total_questions INTEGER NOT NULL,
+            submitted_at TEXT NOT NULL
+        )
+    ''')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS assignments (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            student_id TEXT,
+            student_name TEXT,
+            assignment_title TEXT NOT NULL,
+            generated_assignment TEXT,  -- Allow NULL for this column
+            submitted_file_path TEXT
+        )
+    ''')
+
+def _add_extraction_cache(cursor):
+    """Migration 2: cache extracted PDF text, keyed by content hash and extractor version."""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS extracted_texts (
+            content_hash TEXT NOT NULL,
+            extractor_version TEXT NOT NULL,
+            file_path TEXT,
+            file_size INTEGER,
+            file_mtime_ns INTEGER,
+            pages TEXT NOT NULL,  -- JSON list with the text of each page
+            extracted_at TEXT NOT NULL,
+            PRIMARY KEY (content_hash, extractor_version)
+        )
+    ''')
+
+def _add_vector_store(cursor):
+    """Migration 3: the chunk embedding store's shape record per course and its matrix row sidecar."""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS vector_stores (
+            course_id TEXT PRIMARY KEY,
+            dim INTEGER NOT NULL,
+            model TEXT NOT NULL
+        )
+    ''')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS vector_rows (
+            course_id TEXT NOT NULL,
+            row INTEGER NOT NULL,
+            lecture_id TEXT NOT NULL,
+            chunk_index INTEGER NOT NULL,
+            page INTEGER,
+            text TEXT NOT NULL,
+            ready INTEGER NOT NULL DEFAULT 0,  -- Set once the embedding is written to the matrix
+            deleted INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (course_id, row)
+        )
+    ''')
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_vector_rows_lecture ON vector_rows (course_id, lecture_id)")
+
+def _add_ann_index(cursor):
+    """Migration 4: IVF centroids per course and the IVF list of every matrix row."""
+    cursor.execute("ALTER TABLE vector_stores ADD COLUMN ann_centroids BLOB")  # float32, NULL until trained
+    cursor.execute("ALTER TABLE vector_stores ADD COLUMN ann_version INTEGER NOT NULL DEFAULT 0")
+    # Live rows when the index was last trained
+    cursor.execute("ALTER TABLE vector_stores ADD COLUMN ann_rows INTEGER NOT NULL DEFAULT 0")
+    # NULL if the row was added before the index was trained
+    cursor.execute("ALTER TABLE vector_rows ADD COLUMN list_id INTEGER")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_vector_rows_list ON vector_rows (course_id, list_id)")
+
+def _add_embedding_cache(cursor):
+    """Migration 5: cache embeddings, keyed by embedding model and text hash."""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS embedding_cache (
+            model TEXT NOT NULL,
+            text_hash TEXT NOT NULL,
+            embedding BLOB NOT NULL,  -- float32 vector
+            created_at TEXT NOT NULL,
+            PRIMARY KEY (model, text_hash)
+        )
+    ''')
+
+def _add_llm_cache(cursor):
+    """Migration 6: cache chat completion responses across processes."""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS llm_cache (
+            cache_key TEXT PRIMARY KEY,
+            model TEXT NOT NULL,
+            response TEXT NOT NULL,
+            created_at TEXT NOT NULL,
+            expires_at REAL NOT NULL  -- Unix timestamp
+        )
+    ''')
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_llm_cache_expires ON llm_cache (expires_at)")
+
+def _add_inflight_locks(cursor):
+    """Migration 7: cross-process locks for coalescing identical in-flight requests."""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS inflight_locks (
+            lock_key TEXT PRIMARY KEY,
+            owner TEXT NOT NULL,
+            expires_at REAL NOT NULL  -- Unix timestamp
+        )
+    ''')
+
+def _add_lecture_jobs(cursor):
+    """Migration 8: background jobs that precompute study material on upload, and what they produce."""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS lecture_jobs (
+            lecture_id INTEGER PRIMARY KEY,
+            status TEXT NOT NULL CHECK (status IN ('queued', 'running', 'done', 'failed')),
+            stage TEXT,  -- Step being run, e.g. 'embed' or 'quiz_easy'
+            error TEXT,
+            updated_at REAL NOT NULL  -- Unix timestamp, refreshed at every stage
+        )
+    ''')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS lecture_artifacts (
+            lecture_id INTEGER NOT NULL,
+            kind TEXT NOT NULL,  -- 'summary' or 'contents'
+            content TEXT NOT NULL,
+            created_at TEXT NOT NULL,
+            PRIMARY KEY (lecture_id, kind)
+        )
+    ''')
+
+def _add_quiz_bank(cursor):
+    """Migration 9: pre-generated quiz questions that quizzes are sampled from."""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS quiz_bank (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            lecture_id INTEGER NOT NULL,
+            difficulty TEXT NOT NULL,
+            source_hash TEXT NOT NULL,  -- Hash of the lecture PDF the question was generated from
+            question_hash TEXT NOT NULL,
+            question TEXT NOT NULL,  -- JSON question dict, including its answer
+            times_served INTEGER NOT NULL DEFAULT 0,
+            created_at TEXT NOT NULL,
+            UNIQUE (lecture_id, difficulty, source_hash, question_hash)
+        )
+    ''')
+
+def _add_llm_usage(cursor):
+    """Migration 10: the append-only log of LLM and embedding calls, with rolled-up views for the usage report."""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS llm_usage (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            created_at TEXT NOT NULL,
+            kind TEXT NOT NULL,  -- 'chat' or 'embedding'
+            model TEXT NOT NULL,
+            caller TEXT,  -- Function that made the call, e.g. 'generate_quiz'
+            page TEXT,
+            user_id TEXT,
+            lecture_id TEXT,
+            prompt_tokens INTEGER NOT NULL DEFAULT 0,
+            completion_tokens INTEGER NOT NULL DEFAULT 0,
+            latency_ms REAL,
+            cache_hit INTEGER NOT NULL DEFAULT 0,
+            cost_usd REAL,  -- Estimated at call time, NULL for unpriced models
+            status TEXT NOT NULL DEFAULT 'ok'
+        )
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS llm_usage_no_update BEFORE UPDATE ON llm_usage
+        BEGIN SELECT RAISE(ABORT, 'llm_usage is append-only'); END
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS llm_usage_no_delete BEFORE DELETE ON llm_usage
+        BEGIN SELECT RAISE(ABORT, 'llm_usage is append-only'); END
+    ''')
+    for view, (column, expression) in USAGE_VIEWS.items():
+        cursor.execute(f'''
+            CREATE VIEW IF NOT EXISTS {view} AS
+            SELECT {expression} AS {column},
+                   COUNT(*) AS calls,
+                   SUM(cache_hit) AS cache_hits,
+                   SUM(prompt_tokens) AS prompt_tokens,
+                   SUM(completion_tokens) AS completion_tokens,
+                   SUM(cost_usd) AS cost_usd,
+                   AVG(CASE WHEN cache_hit = 0 THEN latency_ms END) AS avg_latency_ms,
+                   SUM(status = 'error') AS errors
+            FROM llm_usage
+            GROUP BY {expression}
+        ''')
+
+def _add_model_routing_log(cursor):
+    """Migration 11: the log of model routing decisions."""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS model_routing_log (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            created_at TEXT NOT NULL,
+            task TEXT NOT NULL,
+            model TEXT NOT NULL,
+            reason TEXT NOT NULL,
+            prompt_tokens INTEGER NOT NULL,
+            budget TEXT NOT NULL,
+            caller TEXT,
+            page TEXT
+        )
+    ''')
+
+def _add_read_path_indexes(cursor):
+    """Migration 12: integer timestamps and composite indexes for the dashboard and cache lookups."""
+    # Integer copies of the text timestamps (Unix seconds) so ordering can use an index
+    for table in ("quiz_results", "feedback"):
+        cursor.execute(f"ALTER TABLE {table} ADD COLUMN submitted_ts INTEGER")
+        cursor.execute(f"UPDATE {table} SET submitted_ts = CAST(strftime('%s', submitted_at, 'utc') AS INTEGER)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_quiz_results_student_ts ON quiz_results (student_id, submitted_ts)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_quiz_results_ts ON quiz_results (submitted_ts)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_feedback_ts ON feedback (submitted_ts)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_assignments_student ON assignments (student_id)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_extracted_texts_file ON extracted_texts (file_path, extractor_version)")
+
+def _add_teacher_view_indexes(cursor):
+    """Migration 13: index for the teacher's quiz results filtered by lecture."""
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_quiz_results_lecture_ts ON quiz_results (lecture_name, submitted_ts)")
+
+def _add_full_text_search(cursor):
+    """Migration 14: FTS5 indexes over feedback and assignments, kept in sync by triggers."""
+    for fts, (table, columns) in FTS_TABLES.items():
+        names = ", ".join(columns)
+        new_values = ", ".join(f"new.{column}" for column in columns)
+        old_values = ", ".join(f"old.{column}" for column in columns)
+        # External content table: the text is stored once, in the indexed table
+        cursor.execute(f'''
+            CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5(
+                {names}, content='{table}', content_rowid='id', tokenize='porter unicode61'
+            )
+        ''')
+        cursor.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS {fts}_insert AFTER INSERT ON {table}
+            BEGIN INSERT INTO {fts} (rowid, {names}) VALUES (new.id, {new_values}); END
+        ''')
+        cursor.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS {fts}_delete AFTER DELETE ON {table}
+            BEGIN INSERT INTO {fts} ({fts}, rowid, {names}) VALUES ('delete', old.id, {old_values}); END
+        ''')
+        cursor.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS {fts}_update AFTER UPDATE OF {names} ON {table}
+            BEGIN
+                INSERT INTO {fts} ({fts}, rowid, {names}) VALUES ('delete', old.id, {old_values});
+                INSERT INTO {fts} (rowid, {names}) VALUES (new.id, {new_values});
+            END
+        ''')
+        cursor.execute(f"INSERT INTO {fts} ({fts}) VALUES ('rebuild')")  # Index the rows already there
+
+def _split_extracted_files(cursor):
+    """Migration 15: map lecture files to extractions in their own table, so PDFs with equal content share one."""
+    cursor.execute('''
+        CREATE TABLE extracted_files (
+            file_path TEXT PRIMARY KEY,
+            content_hash TEXT NOT NULL,
+            file_size INTEGER NOT NULL,
+            file_mtime_ns INTEGER NOT NULL
+        )
+    ''')
+    cursor.execute('''
+        INSERT OR REPLACE INTO extracted_files (file_path, content_hash, file_size, file_mtime_ns)
+        SELECT file_path, content_hash, file_size, file_mtime_ns FROM extracted_texts
+        WHERE file_path IS NOT NULL
+        ORDER BY extracted_at
+    ''')
+    cursor.execute("CREATE INDEX idx_extracted_files_hash ON extracted_files (content_hash)")
+    # Rebuild extracted_texts without the file columns, which only held the last file saved
+    cursor.execute("DROP INDEX IF EXISTS idx_extracted_texts_file")
+    cursor.execute('''
+        CREATE TABLE extracted_texts_new (
+            content_hash TEXT NOT NULL,
+            extractor_version TEXT NOT NULL,
+            pages TEXT NOT NULL,  -- JSON list with the text of each page
+            extracted_at TEXT NOT NULL,
+            PRIMARY KEY (content_hash, extractor_version)
+        )
+    ''')
+    cursor.execute('''
+        INSERT INTO extracted_texts_new (content_hash, extractor_version, pages, extracted_at)
+        SELECT content_hash, extractor_version, pages, extracted_at FROM extracted_texts
+    ''')
+    cursor.execute("DROP TABLE extracted_texts")
+    cursor.execute("ALTER TABLE extracted_texts_new RENAME TO extracted_texts")
+
+def _require_submitted_ts(cursor):
+    """Migration 16: never leave submitted_ts NULL, since the keyset cursors cannot page past NULL rows."""
+    # Rows whose text timestamp does not parse sort as the oldest
+    submitted_ts = "COALESCE(CAST(strftime('%s', {0}submitted_at, 'utc') AS INTEGER), 0)"
+    for table in ("quiz_results", "feedback"):
+        cursor.execute(f"UPDATE {table} SET submitted_ts = {submitted_ts.format('')} WHERE submitted_ts IS NULL")
+        # Fill it in for writers that only set submitted_at
+        cursor.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS {table}_submitted_ts AFTER INSERT ON {table}
+            WHEN new.submitted_ts IS NULL
+            BEGIN UPDATE {table} SET submitted_ts = {submitted_ts.format('new.')} WHERE id = new.id; END
+        ''')
+
+def _add_vector_store_generations(cursor):
+    """Migration 17: give every registration of a vector store its own generation."""
+    # Processes key their memmap and centroid caches on it, so a reset by another
+    # process, after which ann_version starts over, is never mistaken for the old store
+    cursor.execute("ALTER TABLE vector_stores ADD COLUMN generation INTEGER NOT NULL DEFAULT 0")
+
+# Numbered schema migrations, applied in order: (version, description, function taking a cursor).
+# Append new migrations here; never edit or renumber one that has been released.
+MIGRATIONS = [
+    (1, "Initial schema", _create_initial_schema),
+    (2, "Extracted text cache", _add_extraction_cache),
+    (3, "Chunk embedding store", _add_vector_store),
+    (4, "IVF index", _add_ann_index),
+    (5, "Embedding cache", _add_embedding_cache),
+    (6, "LLM response cache", _add_llm_cache),
+    (7, "In-flight request locks", _add_inflight_locks),
+    (8, "Lecture jobs and artifacts", _add_lecture_jobs),
+    (9, "Quiz bank", _add_quiz_bank),
+    (10, "LLM usage log", _add_llm_usage),
+    (11, "Model routing log", _add_model_routing_log),
+    (12, "Integer timestamps and read path indexes", _add_read_path_indexes),
+    (13, "Teacher view indexes", _add_teacher_view_indexes),
+    (14, "Full-text search", _add_full_text_search),
+    (15, "Extracted file mapping", _split_extracted_files),
+    (16, "Required submission timestamps", _require_submitted_ts),
+    (17, "Vector store generations", _add_vector_store_generations),
+]
+
+def migrate():
+    """
+    Apply the schema migrations not yet recorded in the schema_version table.
+
+    All pending migrations run in one immediate transaction, so concurrent
+    processes apply each one exactly once and a failing migration leaves the
+    schema unchanged. `get_connection` runs this once per process and database;
+    there is no need to call it per request.
+
+    Returns:
+        int: The schema version of the database.
+    """
+    with transaction(immediate=True) as conn:
+        cursor = conn.cursor()
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS schema_version (
+                version INTEGER PRIMARY KEY,
+                description TEXT NOT NULL,
+                applied_at TEXT NOT NULL
+            )
+        ''')
+        cursor.execute("SELECT COALESCE(MAX(version), 0) FROM schema_version")
+        current = cursor.fetchone()[0]
+        for version, description, apply in MIGRATIONS:
+            if version > current:
+                apply(cursor)
+                cursor.execute("INSERT INTO schema_version (version, description, applied_at) VALUES (?, ?, ?)",
+                               (version, description, datetime.now().strftime("%Y-%m-%d %H:%M:%S")))
+                current = version
+    return current
+
+def init_db():
+    """Create or upgrade the database schema (see `migrate`)."""
+    return migrate()
+
 
 def save_to_db(title, file_path):
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    cursor.execute("INSERT INTO lectures (title, upload_date, file_path) VALUES (?, ?, ?)", 
-                   (title, datetime.now().strftime("%Y-%m-%d %H:%M:%S"), file_path))
-    conn.commit()
-    conn.close()
+    with transaction() as conn:
+        cursor = conn.cursor()
+        cursor.execute("INSERT INTO lectures (title, upload_date, file_path) VALUES (?, ?, ?)", 
+                       (title, datetime.now().strftime("%Y-%m-%d %H:%M:%S"), file_path))
+        lecture_id = cursor.lastrowid
+    return lecture_id
 
 def get_lectures():
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
+    cursor = get_connection().cursor()
     cursor.execute("SELECT id, title, upload_date, file_path FROM lectures")
     lectures = cursor.fetchall()
-    conn.close()
     return lectures
 
+def get_lecture(lecture_id):
+    """Fetch a single lecture as (id, title, upload_date, file_path), or None."""
+    cursor = get_connection().cursor()
+    cursor.execute("SELECT id, title, upload_date, file_path FROM lectures WHERE id = ?", (lecture_id,))
+    lecture = cursor.fetchone()
+    return lecture
+
 def delete_from_db(lecture_id):
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    cursor.execute("DELETE FROM lectures WHERE id = ?", (lecture_id,))
-    conn.commit()
-    conn.close()
+    with transaction() as conn:
+        cursor = conn.cursor()
+        cursor.execute("DELETE FROM lectures WHERE id = ?", (lecture_id,))
+        cursor.execute("DELETE FROM lecture_jobs WHERE lecture_id = ?", (lecture_id,))
+        cursor.execute("DELETE FROM lecture_artifacts WHERE lecture_id = ?", (lecture_id,))
+        cursor.execute("DELETE FROM quiz_bank WHERE lecture_id = ?", (lecture_id,))
+
+def get_cached_extraction_by_stat(file_path, file_size, file_mtime_ns, extractor_version):
+    """Return cached page texts for a file whose path, size and mtime are unchanged, or None."""
+    cursor = get_connection().cursor()
+    cursor.execute('''
+        SELECT extracted_texts.pages
+        FROM extracted_files
+        JOIN extracted_texts ON extracted_texts.content_hash = extracted_files.content_hash
+        WHERE extracted_files.file_path = ? AND extracted_files.file_size = ? AND extracted_files.file_mtime_ns = ?
+          AND extracted_texts.extractor_version = ?
+    ''', (file_path, file_size, file_mtime_ns, extractor_version))
+    row = cursor.fetchone()
+    return json.loads(row[0]) if row else None
+
+def get_cached_extraction(content_hash, extractor_version):
+    """Return cached page texts for a PDF content hash, or None."""
+    cursor = get_connection().cursor()
+    cursor.execute("SELECT pages FROM extracted_texts WHERE content_hash = ? AND extractor_version = ?",
+                   (content_hash, extractor_version))
+    row = cursor.fetchone()
+    return json.loads(row[0]) if row else None
+
+def save_extraction(content_hash, extractor_version, file_path, file_size, file_mtime_ns, pages):
+    """Store (or refresh) the extracted page texts of a PDF and record which file they came from."""
+    with transaction() as conn:
+        cursor = conn.cursor()
+        cursor.execute('''
+            INSERT OR REPLACE INTO extracted_texts (content_hash, extractor_version, pages, extracted_at)
+            VALUES (?, ?, ?, ?)
+        ''', (content_hash, extractor_version, json.dumps(pages), datetime.now().strftime("%Y-%m-%d %H:%M:%S")))
+        cursor.execute('''
+            INSERT OR REPLACE INTO extracted_files (file_path, content_hash, file_size, file_mtime_ns)
+            VALUES (?, ?, ?, ?)
+        ''', (file_path, content_hash, file_size, file_mtime_ns))
+
+def delete_extraction(file_path):
+    """Forget a lecture file, dropping its cached extractions unless another file has the same content."""
+    with transaction() as conn:
+        cursor = conn.cursor()
+        cursor.execute("SELECT content_hash FROM extracted_files WHERE file_path = ?", (file_path,))
+        row = cursor.fetchone()
+        if row is None:
+            return
+        cursor.execute("DELETE FROM extracted_files WHERE file_path = ?", (file_path,))
+        cursor.execute('''
+            DELETE FROM extracted_texts
+            WHERE content_hash = ? AND NOT EXISTS (SELECT 1 FROM extracted_files WHERE content_hash = ?)
+        ''', (row[0], row[0]))
+
+def get_vector_store(course_id):
+    """
+    Return (dim, model, ann_version, generation) of a course's embedding matrix,
+    or None if it has no vectors yet.
+    """
+    cursor = get_connection().cursor()
+    cursor.execute("SELECT dim, model, ann_version, generation FROM vector_stores WHERE course_id = ?",
+                   (course_id,))
+    store = cursor.fetchone()
+    return store
+
+def register_vector_store(course_id, dim, model):
+    """
+    Record the shape of a course's embedding matrix (no-op if already registered).
+
+    Every registration gets a new random generation, so a store registered
+    again after `delete_vector_store` never matches caches of the deleted one.
+    """
+    with transaction() as conn:
+        cursor = conn.cursor()
+        cursor.execute('''
+            INSERT OR IGNORE INTO vector_stores (course_id, dim, model, generation)
+            VALUES (?, ?, ?, random())
+        ''', (course_id, dim, model))
+
+def reserve_vector_rows(course_id, lecture_id, chunks, list_ids=None):
+    """
+    Reserve consecutive matrix rows for a lecture's chunks.
+
+    Rows are inserted as not ready; the caller writes the embeddings and then
+    calls activate_vector_rows. The write lock makes concurrent writers in
+    other processes receive disjoint rows.
+
+    Args:
+        course_id (str): Course the matrix belongs to.
+        lecture_id: Lecture ID or document key.
+        chunks (list[dict]): Chunks as {"text": str, "page": int}.
+        list_ids (list[int], optional): IVF list of each chunk.
+
+    Returns:
+        int: The first reserved row.
+    """
+    with transaction(immediate=True) as conn:
+        cursor = conn.cursor()
+        cursor.execute("SELECT COALESCE(MAX(row) + 1, 0) FROM vector_rows WHERE course_id = ?", (course_id,))
+        start_row = cursor.fetchone()[0]
+        list_ids = list_ids if list_ids is not None else [None] * len(chunks)
+        cursor.executemany('''
+            INSERT INTO vector_rows (course_id, row, lecture_id, chunk_index, page, text, list_id)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        ''', [(course_id, start_row + i, str(lecture_id), i, chunk.get("page"), chunk["text"], list_id)
+              for i, (chunk, list_id) in enumerate(zip(chunks, list_ids))])
+    return start_row
+
+def activate_vector_rows(course_id, start_row, count):
+    """Mark reserved rows as ready once their embeddings are on disk."""
+    with transaction() as conn:
+        cursor = conn.cursor()
+        cursor.execute("UPDATE vector_rows SET ready = 1 WHERE course_id = ? AND row >= ? AND row < ?",
+                       (course_id, start_row, start_row + count))
+
+def get_live_vector_rows(course_id, lecture_ids=None, list_ids=None):
+    """
+    Return the ready, non-deleted rows of a course.
+
+    Args:
+        course_id (str): Course to read.
+        lecture_ids (list, optional): Only return rows of these lectures.
+        list_ids (list[int], optional): Only return rows in these IVF lists
+            (plus rows not yet assigned to a list).
+
+    Returns:
+        list[int]: Matching rows in ascending order.
+    """
+    cursor = get_connection().cursor()
+    query = "SELECT row FROM vector_rows WHERE course_id = ? AND ready = 1 AND deleted = 0"
+    params = [course_id]
+    if lecture_ids is not None:
+        lecture_ids = [str(lecture_id) for lecture_id in lecture_ids]
+        query += f" AND lecture_id IN ({', '.join('?' * len(lecture_ids))})"
+        params += lecture_ids
+    if list_ids is not None:
+        list_ids = [int(list_id) for list_id in list_ids]
+        query += f" AND (list_id IN ({', '.join('?' * len(list_ids))}) OR list_id IS NULL)"
+        params += list_ids
+    cursor.execute(query + " ORDER BY row", params)
+    rows = [row[0] for row in cursor.fetchall()]
+    return rows
+
+def get_vector_row_details(course_id, rows):
+    """Return {row: (lecture_id, chunk_index, page, text)} for the given rows."""
+    if not rows:
+        return {}
+    cursor = get_connection().cursor()
+    cursor.execute(f'''
+        SELECT row, lecture_id, chunk_index, page, text FROM vector_rows
+        WHERE course_id = ? AND row IN ({', '.join('?' * len(rows))})
+    ''', [course_id] + [int(row) for row in rows])
+    details = {row[0]: row[1:] for row in cursor.fetchall()}
+    return details
+
+def count_live_vector_rows(course_id):
+    """Count the searchable rows of a course."""
+    cursor = get_connection().cursor()
+    cursor.execute("SELECT COUNT(*) FROM vector_rows WHERE course_id = ? AND ready = 1 AND deleted = 0",
+                   (course_id,))
+    count = cursor.fetchone()[0]
+    return count
+
+def get_ann_index(course_id):
+    """Return (ann_version, centroids blob, ann_rows) of a course's IVF index."""
+    cursor = get_connection().cursor()
+    cursor.execute("SELECT ann_version, ann_centroids, ann_rows FROM vector_stores WHERE course_id = ?",
+                   (course_id,))
+    index = cursor.fetchone()
+    return index
+
+def save_ann_index(course_id, centroids, row_lists, ann_rows):
+    """
+    Store retrained IVF centroids and the list of every row in one transaction.
+
+    Args:
+        course_id (str): Course the index belongs to.
+        centroids (bytes): float32 centroid matrix.
+        row_lists (list[tuple]): (row, list_id) pairs.
+        ann_rows (int): Number of live rows the index was trained on.
+    """
+    with transaction() as conn:
+        cursor = conn.cursor()
+        cursor.execute('''
+            UPDATE vector_stores SET ann_centroids = ?, ann_version = ann_version + 1, ann_rows = ?
+            WHERE course_id = ?
+        ''', (centroids, ann_rows, course_id))
+        cursor.executemany("UPDATE vector_rows SET list_id = ? WHERE course_id = ? AND row = ?",
+                           [(list_id, course_id, row) for row, list_id in row_lists])
+
+def delete_vector_store(course_id):
+    """Remove every row and the shape record of a course's embedding matrix."""
+    with transaction() as conn:
+        cursor = conn.cursor()
+        cursor.execute("DELETE FROM vector_rows WHERE course_id = ?", (course_id,))
+        cursor.execute("DELETE FROM vector_stores WHERE course_id = ?", (course_id,))
+
+def has_vector_rows(course_id, lecture_id):
+    """Check whether a lecture already has live embeddings in the store."""
+    cursor = get_connection().cursor()
+    cursor.execute('''
+        SELECT 1 FROM vector_rows
+        WHERE course_id = ? AND lecture_id = ? AND ready = 1 AND deleted = 0
+        LIMIT 1
+    ''', (course_id, str(lecture_id)))
+    found = cursor.fetchone() is not None
+    return found
+
+def delete_vector_rows(course_id, lecture_id):
+    """Tombstone a lecture's rows so they are no longer searched."""
+    with transaction() as conn:
+        cursor = conn.cursor()
+        cursor.execute("UPDATE vector_rows SET deleted = 1 WHERE course_id = ? AND lecture_id = ?",
+                       (course_id, str(lecture_id)))
+
+def get_cached_embeddings(model, text_hashes):
+    """Return {text_hash: embedding blob} for the hashes cached for an embedding model."""
+    cursor = get_connection().cursor()
+    cached = {}
+    for start in range(0, len(text_hashes), 500):
+        batch = text_hashes[start:start + 500]
+        cursor.execute(f'''
+            SELECT text_hash, embedding FROM embedding_cache
+            WHERE model = ? AND text_hash IN ({', '.join('?' * len(batch))})
+        ''', [model] + list(batch))
+        cached.update(cursor.fetchall())
+    return cached
+
+def save_embeddings(model, embeddings):
+    """Cache embeddings given as (text_hash, embedding blob) pairs."""
+    with transaction() as conn:
+        cursor = conn.cursor()
+        created_at = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        cursor.executemany("INSERT OR REPLACE INTO embedding_cache (model, text_hash, embedding, created_at) VALUES (?, ?, ?, ?)",
+                           [(model, text_hash, embedding, created_at) for text_hash, embedding in embeddings])
+
+def get_llm_cache_entry(cache_key, now):
+    """Return (expires_at, response) of an unexpired cached completion, or None."""
+    cursor = get_connection().cursor()
+    cursor.execute("SELECT expires_at, response FROM llm_cache WHERE cache_key = ? AND expires_at > ?",
+                   (cache_key, now))
+    entry = cursor.fetchone()
+    return entry
+
+def save_llm_cache_entry(cache_key, model, response, expires_at):
+    """Store a completion and purge expired ones."""
+    with transaction() as conn:
+        cursor = conn.cursor()
+        cursor.execute('''
+            INSERT OR REPLACE INTO llm_cache (cache_key, model, response, created_at, expires_at)
+            VALUES (?, ?, ?, ?, ?)
+        ''', (cache_key, model, response, datetime.now().strftime("%Y-%m-%d %H:%M:%S"), expires_at))
+        cursor.execute("DELETE FROM llm_cache WHERE expires_at <= ?", (datetime.now().timestamp(),))
+
+def acquire_inflight_lock(lock_key, owner, now, expires_at):
+    """Take the lock for an in-flight request unless another live owner holds it. Returns True on success."""
+    with transaction() as conn:
+        cursor = conn.cursor()
+        cursor.execute("DELETE FROM inflight_locks WHERE lock_key = ? AND expires_at <= ?", (lock_key, now))
+        cursor.execute("INSERT OR IGNORE INTO inflight_locks (lock_key, owner, expires_at) VALUES (?, ?, ?)",
+                       (lock_key, owner, expires_at))
+        acquired = cursor.rowcount == 1
+    return acquired
+
+def release_inflight_lock(lock_key, owner):
+    """Release an in-flight request lock held by `owner`."""
+    with transaction() as conn:
+        cursor = conn.cursor()
+        cursor.execute("DELETE FROM inflight_locks WHERE lock_key = ? AND owner = ?", (lock_key, owner))
+
+def queue_lecture_job(lecture_id, now):
+    """Queue (or re-queue) the precomputation job of a lecture."""
+    with transaction() as conn:
+        cursor = conn.cursor()
+        cursor.execute('''
+            INSERT OR REPLACE INTO lecture_jobs (lecture_id, status, stage, error, updated_at)
+            VALUES (?, 'queued', NULL, NULL, ?)
+        ''', (lecture_id, now))
+
+def claim_lecture_job(lecture_id, now, stale_before):
+    """
+    Mark a queued, failed or stale running job as running.
+
+    Returns True if the caller claimed the job, False if it is done or running elsewhere.
+    """
+    with transaction() as conn:
+        cursor = conn.cursor()
+        cursor.execute('''
+            UPDATE lecture_jobs SET status = 'running', stage = NULL, error = NULL, updated_at = ?
+            WHERE lecture_id = ? AND (status IN ('queued', 'failed') OR (status = 'running' AND updated_at < ?))
+        ''', (now, lecture_id, stale_before))
+        claimed = cursor.rowcount == 1
+    return claimed
+
+def update_lecture_job(lecture_id, status, stage, error, now):
+    with transaction() as conn:
+        cursor = conn.cursor()
+        cursor.execute("UPDATE lecture_jobs SET status = ?, stage = ?, error = ?, updated_at = ? WHERE lecture_id = ?",
+                       (status, stage, error, now, lecture_id))
+
+def get_lecture_job(lecture_id):
+    """Fetch a lecture's job as (status, stage, error, updated_at), or None."""
+    cursor = get_connection().cursor()
+    cursor.execute("SELECT status, stage, error, updated_at FROM lecture_jobs WHERE lecture_id = ?", (lecture_id,))
+    job = cursor.fetchone()
+    return job
+
+def get_incomplete_lecture_jobs(stale_before):
+    """Return the IDs of lectures whose job is queued, or running but not updated since `stale_before`."""
+    cursor = get_connection().cursor()
+    cursor.execute('''
+        SELECT lecture_id FROM lecture_jobs
+        WHERE status = 'queued' OR (status = 'running' AND updated_at < ?)
+    ''', (stale_before,))
+    lecture_ids = [row[0] for row in cursor.fetchall()]
+    return lecture_ids
+
+def save_lecture_artifact(lecture_id, kind, content):
+    """Store a precomputed artifact, unless the lecture has been deleted meanwhile."""
+    with transaction() as conn:
+        cursor = conn.cursor()
+        cursor.execute('''
+            INSERT OR REPLACE INTO lecture_artifacts (lecture_id, kind, content, created_at)
+            SELECT ?, ?, ?, ? WHERE EXISTS (SELECT 1 FROM lectures WHERE id = ?)
+        ''', (lecture_id, kind, content, datetime.now().strftime("%Y-%m-%d %H:%M:%S"), lecture_id))
+
+def get_lecture_artifact(lecture_id, kind):
+    """Return a precomputed artifact, or None if it has not been generated yet."""
+    cursor = get_connection().cursor()
+    cursor.execute("SELECT content FROM lecture_artifacts WHERE lecture_id = ? AND kind = ?", (lecture_id, kind))
+    row = cursor.fetchone()
+    return row[0] if row else None
+
+def add_quiz_questions(lecture_id, difficulty, source_hash, questions):
+    """
+    Add questions to the quiz bank, skipping ones it already holds.
+
+    Args:
+        questions (list[tuple]): (question_hash, question_json) pairs.
+
+    Returns:
+        int: Number of questions added.
+    """
+    with transaction() as conn:
+        cursor = conn.cursor()
+        created_at = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        before = conn.total_changes
+        cursor.executemany('''
+            INSERT OR IGNORE INTO quiz_bank (lecture_id, difficulty, source_hash, question_hash, question, created_at)
+            VALUES (?, ?, ?, ?, ?, ?)
+        ''', [(lecture_id, difficulty, source_hash, question_hash, question, created_at)
+              for question_hash, question in questions])
+        added = conn.total_changes - before
+    return added
+
+def get_quiz_bank_questions(lecture_id, difficulty, source_hash):
+    """Return the JSON of every banked question for a lecture version and difficulty."""
+    cursor = get_connection().cursor()
+    cursor.execute("SELECT question FROM quiz_bank WHERE lecture_id = ? AND difficulty = ? AND source_hash = ?",
+                   (lecture_id, difficulty, source_hash))
+    questions = [row[0] for row in cursor.fetchall()]
+    return questions
+
+def count_quiz_questions(lecture_id, difficulty, source_hash):
+    cursor = get_connection().cursor()
+    cursor.execute("SELECT COUNT(*) FROM quiz_bank WHERE lecture_id = ? AND difficulty = ? AND source_hash = ?",
+                   (lecture_id, difficulty, source_hash))
+    count = cursor.fetchone()[0]
+    return count
+
+def sample_quiz_questions(lecture_id, difficulty, source_hash, count):
+    """Pick `count` banked questions, least served first and random among equals, and mark them served."""
+    with transaction() as conn:
+        cursor = conn.cursor()
+        cursor.execute('''
+            SELECT id, question FROM quiz_bank
+            WHERE lecture_id = ? AND difficulty = ? AND source_hash = ?
+            ORDER BY times_served, RANDOM()
+            LIMIT ?
+        ''', (lecture_id, difficulty, source_hash, count))
+        rows = cursor.fetchall()
+        cursor.executemany("UPDATE quiz_bank SET times_served = times_served + 1 WHERE id = ?", [(row[0],) for row in rows])
+    return [row[1] for row in rows]
+
+def delete_stale_quiz_questions(lecture_id, source_hash):
+    """Drop banked questions generated from an earlier version of a lecture."""
+    with transaction() as conn:
+        cursor = conn.cursor()
+        cursor.execute("DELETE FROM quiz_bank WHERE lecture_id = ? AND source_hash != ?", (lecture_id, source_hash))
+
+def record_llm_usage(kind, model, caller, page, user_id, lecture_id, prompt_tokens, completion_tokens,
+                     latency_ms, cache_hit, cost_usd, status):
+    with transaction() as conn:
+        cursor = conn.cursor()
+        cursor.execute('''
+            INSERT INTO llm_usage (created_at, kind, model, caller, page, user_id, lecture_id, prompt_tokens,
+                                   completion_tokens, latency_ms, cache_hit, cost_usd, status)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ''', (datetime.now().strftime("%Y-%m-%d %H:%M:%S"), kind, model, caller, page,
+              None if user_id is None else str(user_id), lecture_id, prompt_tokens, completion_tokens, latency_ms,
+              int(cache_hit), cost_usd, status))
+
+def get_llm_usage_report(view):
+    """Fetch the rows of a rolled-up usage view (a key of USAGE_VIEWS), most expensive first."""
+    if view not in USAGE_VIEWS:
+        raise ValueError(f"Unknown usage view '{view}'.")
+    cursor = get_connection().cursor()
+    cursor.execute(f"SELECT * FROM {view} ORDER BY cost_usd DESC, calls DESC")
+    columns = [description[0] for description in cursor.description]
+    rows = cursor.fetchall()
+    return columns, rows
+
+def record_model_routing(task, model, reason, prompt_tokens, budget, caller, page):
+    with transaction() as conn:
+        cursor = conn.cursor()
+        cursor.execute('''
+            INSERT INTO model_routing_log (created_at, task, model, reason, prompt_tokens, budget, caller, page)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        ''', (datetime.now().strftime("%Y-%m-%d %H:%M:%S"), task, model, reason, prompt_tokens, budget, caller, page))
 
 # Register a new user
 def register_user(email, password, role, student_id=None):
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
     try:
-        if role == "student":
-            if not student_id:  # Ensure Student ID is mandatory for students
-                raise ValueError("Student ID is required for student registration.")
-            cursor.execute("INSERT INTO users (email, password, role, student_id) VALUES (?, ?, ?, ?)",
-                           (email, password, role, student_id))
-        else:
-            cursor.execute("INSERT INTO users (email, password, role) VALUES (?, ?, ?)",
-                           (email, password, role))
-        conn.commit()
+        with transaction() as conn:
+            cursor = conn.cursor()
+            if role == "student":
+                if not student_id:  # Ensure Student ID is mandatory for students
+                    raise ValueError("Student ID is required for student registration.")
+                cursor.execute("INSERT INTO users (email, password, role, student_id) VALUES (?, ?, ?, ?)",
+                               (email, password, role, student_id))
+            else:
+                cursor.execute("INSERT INTO users (email, password, role) VALUES (?, ?, ?)",
+                               (email, password, role))
         return True
     except sqlite3.IntegrityError:
         return False
-    finally:
-        conn.close()
 
 # Authenticate a user
 def authenticate_user(email, password):
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
+    cursor = get_connection().cursor()
     cursor.execute("SELECT id, role FROM users WHERE email = ? AND password = ?", (email, password))
     user = cursor.fetchone()
-    conn.close()
     if user:
         return {"id": user[0], "role": user[1]}
     return None
 
 # Get user role by user ID
 def get_user_role(user_id):
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
+    cursor = get_connection().cursor()
     cursor.execute("SELECT role FROM users WHERE id = ?", (user_id,))
     role = cursor.fetchone()
-    conn.close()
     return role[0] if role else None
 
 def init_feedback_table():
-    """Initialize the feedback table in the database."""
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS feedback (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            feedback_text TEXT NOT NULL,
-            submitted_at TEXT NOT NULL
-        )
-    ''')
-    conn.commit()
-    conn.close()
+    """Initialize the feedback table in the database. Kept for compatibility: the table is created by `migrate`."""
+    migrate()
     print("Feedback table initialized successfully!")
 
 
 def submit_feedback(feedback_text):
     """Insert anonymous feedback into the feedback table."""
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    init_feedback_table()
-    cursor.execute("INSERT INTO feedback (feedback_text, submitted_at) VALUES (?, ?)",
-                   (feedback_text, datetime.now().strftime("%Y-%m-%d %H:%M:%S")))
-    conn.commit()
-    conn.close()
+    with transaction() as conn:
+        cursor = conn.cursor()
+        now = datetime.now()
+        cursor.execute("INSERT INTO feedback (feedback_text, submitted_at, submitted_ts) VALUES (?, ?, ?)",
+                       (feedback_text, now.strftime("%Y-%m-%d %H:%M:%S"), int(now.timestamp())))
     print("Feedback submitted successfully!")
 
 
 def get_all_feedback():
     """Retrieve all feedback from the feedback table."""
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    init_feedback_table()
-    cursor.execute("SELECT feedback_text, submitted_at FROM feedback ORDER BY submitted_at DESC")
+    cursor = get_connection().cursor()
+    cursor.execute("SELECT feedback_text, submitted_at FROM feedback ORDER BY submitted_ts DESC, id DESC")
     feedback = cursor.fetchall()
-    conn.close()
     return feedback
 
-def init_quiz_results_table():
-    """Initialize the quiz results table in the database."""
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
+def _fts_query(text):
+    """
+    Turn a search box entry into an FTS5 query matching rows that contain every word.
+
+    Each word is quoted, so punctuation and FTS5 operators typed by the user can't
+    cause a syntax error, and matched as a prefix so partial words still find rows.
+
+    Returns:
+        str: The MATCH expression, or None if the text contains no words.
+    """
+    words = re.findall(r"\w+", text)
+    if not words:
+        return None
+    return " ".join(f'"{word}"*' for word in words)
+
+def search_feedback(query, limit=PAGE_SIZE):
+    """
+    Search the feedback text, best matches first.
+
+    Args:
+        query (str): Words to look for.
+        limit (int): Maximum number of results.
+
+    Returns:
+        list[tuple]: (id, snippet with the matches in **bold**, submitted_at) of each match.
+    """
+    match = _fts_query(query)
+    if match is None:
+        return []
+    cursor = get_connection().cursor()
     cursor.execute('''
-        CREATE TABLE IF NOT EXISTS quiz_results (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            student_id INTEGER NOT NULL,
-            lecture_name TEXT NOT NULL,
-            difficulty TEXT NOT NULL,
-            score INTEGER NOT NULL,
-            total_questions INTEGER NOT NULL,
-            submitted_at TEXT NOT NULL
-        )
-    ''')
-    conn.commit()
-    conn.close()
+        SELECT feedback.id, snippet(feedback_fts, 0, '**', '**', '...', ?), feedback.submitted_at
+        FROM feedback_fts
+        JOIN feedback ON feedback.id = feedback_fts.rowid
+        WHERE feedback_fts MATCH ?
+        ORDER BY feedback_fts.rank
+        LIMIT ?
+    ''', (SNIPPET_TOKENS, match, limit))
+    return cursor.fetchall()
+
+def init_quiz_results_table():
+    """Initialize the quiz results table in the database. Kept for compatibility: the table is created by `migrate`."""
+    migrate()
 
 
 def save_quiz_result(student_id, lecture_name, difficulty, score, total_questions):
@@ -162,14 +1065,15 @@ def save_quiz_result(student_id, lecture_name, difficulty, score, total_question
         score (int): Student's score.
         total_questions (int): Total number of questions in the quiz.
     """
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    cursor.execute('''
-        INSERT INTO quiz_results (student_id, lecture_name, difficulty, score, total_questions, submitted_at)
-        VALUES (?, ?, ?, ?, ?, ?)
-    ''', (student_id, lecture_name, difficulty, score, total_questions, datetime.now().strftime("%Y-%m-%d %H:%M:%S")))
-    conn.commit()
-    conn.close()
+    now = datetime.now()
+    with transaction() as conn:
+        cursor = conn.cursor()
+        cursor.execute('''
+            INSERT INTO quiz_results (student_id, lecture_name, difficulty, score, total_questions, submitted_at,
+                                      submitted_ts)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        ''', (student_id, lecture_name, difficulty, score, total_questions, now.strftime("%Y-%m-%d %H:%M:%S"),
+              int(now.timestamp())))
 
 
 def get_student_quiz_results(student_id):
@@ -182,16 +1086,14 @@ def get_student_quiz_results(student_id):
     Returns:
         list[tuple]: List of quiz results.
     """
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
+    cursor = get_connection().cursor()
     cursor.execute('''
         SELECT lecture_name, difficulty, score, total_questions, submitted_at
         FROM quiz_results
         WHERE student_id = ?
-        ORDER BY submitted_at DESC
+        ORDER BY submitted_ts DESC, id DESC
     ''', (student_id,))
     results = cursor.fetchall()
-    conn.close()
     return results
 
 def get_all_quiz_results():
@@ -201,88 +1103,169 @@ def get_all_quiz_results():
     Returns:
         list[tuple]: List of all quiz results.
     """
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
+    cursor = get_connection().cursor()
     cursor.execute('''
         SELECT student_id, lecture_name, difficulty, score, total_questions, submitted_at
         FROM quiz_results
-        ORDER BY submitted_at DESC
+        ORDER BY submitted_ts DESC, id DESC
     ''')
     results = cursor.fetchall()
-    conn.close()
     return results
 
+def get_quiz_results(student_id=None, lecture=None, after=None, limit=PAGE_SIZE):
+    """
+    Retrieve one page of quiz results, newest first, filtered in SQL (for teacher viewing).
+
+    Pages are keyset-paginated: pass the cursor returned with a page as `after`
+    to get the next one, so every page costs the same however deep it is.
+
+    Args:
+        student_id (int, optional): Only results of this student.
+        lecture (str, optional): Only results of this lecture.
+        after (tuple, optional): Cursor returned with the previous page; None for the first page.
+        limit (int): Maximum number of results on the page.
+
+    Returns:
+        tuple: (list of (student_id, lecture_name, difficulty, score, total_questions, submitted_at),
+            cursor of the next page or None if this is the last one).
+    """
+    conditions, params = [], []
+    if student_id is not None:
+        conditions.append("student_id = ?")
+        params.append(student_id)
+    if lecture:
+        conditions.append("lecture_name = ?")
+        params.append(lecture)
+    if after is not None:
+        conditions.append("(submitted_ts, id) < (?, ?)")
+        params.extend(after)
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+    cursor = get_connection().cursor()
+    cursor.execute(f'''
+        SELECT submitted_ts, id, student_id, lecture_name, difficulty, score, total_questions, submitted_at
+        FROM quiz_results
+        {where}
+        ORDER BY submitted_ts DESC, id DESC
+        LIMIT ?
+    ''', (*params, limit + 1))
+    rows = cursor.fetchall()
+    next_cursor = tuple(rows[limit - 1][:2]) if len(rows) > limit else None
+    return [row[2:] for row in rows[:limit]], next_cursor
+
 def init_assignments_table():
-    """Initialize the assignments table."""
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS assignments (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            student_id TEXT,
-            student_name TEXT,
-            assignment_title TEXT NOT NULL,
-            generated_assignment TEXT,  -- Allow NULL for this column
-            submitted_file_path TEXT
-        )
-    ''')
-    conn.commit()
-    conn.close()
+    """Initialize the assignments table. Kept for compatibility: the table is created by `migrate`."""
+    migrate()
 
 def save_generated_assignment(assignment_title, generated_assignment):
     """Save the generated assignment text to the database."""
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    cursor.execute('''
-        INSERT INTO assignments (assignment_title, generated_assignment)
-        VALUES (?, ?)
-    ''', (assignment_title, generated_assignment))
-    conn.commit()
-    conn.close()
+    with transaction() as conn:
+        cursor = conn.cursor()
+        cursor.execute('''
+            INSERT INTO assignments (assignment_title, generated_assignment)
+            VALUES (?, ?)
+        ''', (assignment_title, generated_assignment))
 
 
 def submit_student_assignment(student_id, student_name, assignment_title, file_path):
     """Save the student-submitted assignment PDF to the database."""
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    cursor.execute('''
-        INSERT INTO assignments (student_id, student_name, assignment_title, submitted_file_path)
-        VALUES (?, ?, ?, ?)
-    ''', (student_id, student_name, assignment_title, file_path))
-    conn.commit()
-    conn.close()
+    with transaction() as conn:
+        cursor = conn.cursor()
+        cursor.execute('''
+            INSERT INTO assignments (student_id, student_name, assignment_title, submitted_file_path)
+            VALUES (?, ?, ?, ?)
+        ''', (student_id, student_name, assignment_title, file_path))
 
 
 def get_all_assignments():
     """Fetch all submitted assignments (for teachers)."""
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
+    cursor = get_connection().cursor()
     cursor.execute('''
         SELECT id, student_name, assignment_title, generated_assignment, submitted_file_path
         FROM assignments
     ''')
     assignments = cursor.fetchall()
-    conn.close()
     return assignments
 
 
+def get_assignments(student_id=None, email=None, after=None, limit=PAGE_SIZE):
+    """
+    Fetch one page of assignments, newest first, filtered in SQL (for teachers).
+
+    Args:
+        student_id (str, optional): Only assignments submitted by this student.
+        email (str, optional): Only assignments whose student email contains this text (case-insensitive).
+        after (int, optional): Cursor returned with the previous page; None for the first page.
+        limit (int): Maximum number of assignments on the page.
+
+    Returns:
+        tuple: (list of (id, student_id, student_name, assignment_title, generated_assignment, submitted_file_path),
+            cursor of the next page or None if this is the last one).
+    """
+    conditions, params = [], []
+    if student_id:
+        conditions.append("student_id = ?")
+        params.append(str(student_id))
+    if email:
+        escaped = email.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+        conditions.append("student_name LIKE ? ESCAPE '\\'")
+        params.append(f"%{escaped}%")
+    if after is not None:
+        conditions.append("id < ?")
+        params.append(after)
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+    cursor = get_connection().cursor()
+    cursor.execute(f'''
+        SELECT id, student_id, student_name, assignment_title, generated_assignment, submitted_file_path
+        FROM assignments
+        {where}
+        ORDER BY id DESC
+        LIMIT ?
+    ''', (*params, limit + 1))
+    rows = cursor.fetchall()
+    next_cursor = rows[limit - 1][0] if len(rows) > limit else None
+    return rows[:limit], next_cursor
+
+
+def search_assignments(query, limit=PAGE_SIZE):
+    """
+    Search assignment titles and generated assignment text, best matches first.
+
+    Args:
+        query (str): Words to look for.
+        limit (int): Maximum number of results.
+
+    Returns:
+        list[tuple]: (id, student_name, assignment_title, snippet with the matches in **bold**) of each match.
+    """
+    match = _fts_query(query)
+    if match is None:
+        return []
+    cursor = get_connection().cursor()
+    cursor.execute('''
+        SELECT assignments.id, assignments.student_name, assignments.assignment_title,
+               snippet(assignments_fts, -1, '**', '**', '...', ?)
+        FROM assignments_fts
+        JOIN assignments ON assignments.id = assignments_fts.rowid
+        WHERE assignments_fts MATCH ?
+        ORDER BY assignments_fts.rank
+        LIMIT ?
+    ''', (SNIPPET_TOKENS, match, limit))
+    return cursor.fetchall()
+
+
 def get_student_assignments(student_id):
     """Fetch assignments for a specific student."""
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
+    cursor = get_connection().cursor()
     cursor.execute('''
         SELECT assignment_title, generated_assignment, submitted_file_path
         FROM assignments
         WHERE student_id = ?
     ''', (student_id,))
     assignments = cursor.fetchall()
-    conn.close()
     return assignments
 
 def init_database():
     """Initialize all required tables."""
-    init_db()
-    init_quiz_results_table()
-    init_assignments_table()
+    migrate()
     print("Database tables initialized successfully!")
     
\ No newline at end of file
@@ -0,0 +1,263 @@
+"""
+Pluggable embedding backends.
+
+The EMBEDDING_BACKEND setting selects the backend used for retrieval and
+relevance scoring:
+
+* "openai" (default): the text-embedding-ada-002 API.
+* "local": hashed TF-IDF features projected to 256 dimensions in-process. The
+  projection is a fixed random one until the backend is fitted on the lecture
+  corpus (`python embeddings.py fit`), after which it is a truncated SVD of the
+  corpus TF-IDF matrix. No network access is needed and results are
+  deterministic.
+
+Backends expose `name` (stored with every vector, so switching backends
+invalidates stored embeddings), `embed(texts)`, and batching and caching hints.
+`embed_texts` is the entry point: it dedupes its inputs, serves what it can
+from the persistent embedding cache and sends the rest in provider-sized
+batches.
+"""
+import argparse
+import hashlib
+import os
+import re
+import sqlite3
+import time
+import zlib
+import numpy as np
+import llm_client
+import llm_usage
+from sklearn.feature_extraction.text import ENGLISH_STOP_WORDS
+from db import get_cached_embeddings, save_embeddings
+
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "openai")
+OPENAI_EMBEDDING_MODEL = "text-embedding-ada-002"
+LOCAL_EMBEDDING_DIM = 256
+LOCAL_HASH_FEATURES = 2 ** 20
+LOCAL_MODEL_PATH = os.path.join("vector_store", "local_embedding.npz")
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]{2,}")
+
+
+class OpenAIEmbeddingBackend:
+    """Embeddings from the OpenAI API."""
+
+    cacheable = True
+    max_batch_size = 512  # Inputs per request
+    max_batch_chars = 200000  # Roughly 50k tokens per request
+
+    def __init__(self, model=OPENAI_EMBEDDING_MODEL):
+        self.name = model
+
+    def embed(self, texts):
+        """Embed a list of texts in one API call."""
+        response = llm_client.embedding(texts, self.name)
+        return [item["embedding"] for item in sorted(response["data"], key=lambda item: item["index"])]
+
+
+class LocalEmbeddingBackend:
+    """Hashed TF-IDF embeddings computed in-process."""
+
+    cacheable = False  # Recomputing is as cheap as a cache lookup
+    max_batch_size = 10000
+    max_batch_chars = 10000000
+
+    def __init__(self, dim=LOCAL_EMBEDDING_DIM, model_path=LOCAL_MODEL_PATH):
+        self.dim = dim
+        self.model_path = model_path
+        self.features = None  # Sorted hashed features seen while fitting
+        self.idf = None
+        self.components = None  # SVD basis, one row per fitted feature
+        self._projections = {}  # Random projection rows used before fitting
+        self.name = f"local-hash-rp-{dim}"
+        if os.path.exists(model_path):
+            self._load()
+
+    @staticmethod
+    def _term_frequencies(text):
+        """Return (hashed features, sublinear term frequencies) of the unigrams and bigrams of a text."""
+        tokens = [token for token in TOKEN_PATTERN.findall(text.lower()) if token not in ENGLISH_STOP_WORDS]
+        grams = tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]
+        hashed = np.fromiter((zlib.crc32(gram.encode("utf-8")) % LOCAL_HASH_FEATURES for gram in grams),
+                             dtype=np.int64, count=len(grams))
+        features, counts = np.unique(hashed, return_counts=True)
+        return features, (1 + np.log(counts)).astype(np.float32)
+
+    def _projection(self, feature):
+        row = self._projections.get(feature)
+        if row is None:
+            row = np.random.default_rng(int(feature)).standard_normal(self.dim).astype(np.float32)
+            self._projections[feature] = row
+        return row
+
+    def _embed_one(self, text):
+        features, weights = self._term_frequencies(text)
+        vector = np.zeros(self.dim, dtype=np.float32)
+        if self.components is None:
+            for feature, weight in zip(features.tolist(), weights):
+                vector += weight * self._projection(feature)
+        else:
+            index = np.searchsorted(self.features, features)
+            index[index == len(self.features)] = 0
+            known = self.features[index] == features
+            index = index[known]
+            vector = (weights[known] * self.idf[index]) @ self.components[index]
+        norm = np.linalg.norm(vector)
+        return (vector / norm if norm else vector).tolist()
+
+    def embed(self, texts):
+        """Embed a list of texts."""
+        return [self._embed_one(text) for text in texts]
+
+    def fit(self, corpus):
+        """
+        Fit the IDF weights and SVD basis on a corpus and save them.
+
+        Args:
+            corpus (list[str]): Documents (e.g. lecture chunks) to fit on.
+        """
+        from scipy.sparse import csr_matrix
+        from sklearn.decomposition import TruncatedSVD
+        from sklearn.preprocessing import normalize
+
+        documents = [self._term_frequencies(text) for text in corpus]
+        documents = [(features, weights) for features, weights in documents if len(features)]
+        if len(documents) < 2:
+            raise ValueError("At least two non-empty documents are needed to fit the local embedding backend.")
+        features = np.unique(np.concatenate([doc_features for doc_features, _ in documents]))
+        columns = [np.searchsorted(features, doc_features) for doc_features, _ in documents]
+        indptr = np.cumsum([0] + [len(cols) for cols in columns])
+        matrix = csr_matrix((np.concatenate([weights for _, weights in documents]), np.concatenate(columns), indptr),
+                            shape=(len(documents), len(features)))
+
+        document_frequency = np.bincount(np.concatenate(columns), minlength=len(features))
+        idf = (np.log((1 + len(documents)) / (1 + document_frequency)) + 1).astype(np.float32)
+        matrix = normalize(matrix.multiply(idf).tocsr())
+
+        n_components = min(self.dim, len(documents) - 1, len(features) - 1)
+        svd = TruncatedSVD(n_components=n_components, random_state=0).fit(matrix)
+        components = np.zeros((len(features), self.dim), dtype=np.float32)
+        components[:, :n_components] = svd.components_.T
+
+        os.makedirs(os.path.dirname(self.model_path) or ".", exist_ok=True)
+        np.savez(self.model_path, features=features, idf=idf, components=components)
+        self._load()
+
+    def _load(self):
+        model = np.load(self.model_path)
+        self.features = model["features"]
+        self.idf = model["idf"]
+        self.components = model["components"]
+        self.dim = self.components.shape[1]
+        fingerprint = hashlib.md5(self.components.tobytes() + self.features.tobytes()).hexdigest()[:8]
+        self.name = f"local-hash-svd-{self.dim}-{fingerprint}"
+
+
+EMBEDDING_BACKENDS = {
+    "openai": OpenAIEmbeddingBackend,
+    "local": LocalEmbeddingBackend,
+}
+
+_backend = None
+
+
+def get_backend():
+    """Return the configured embedding backend (created once per process)."""
+    global _backend
+    if _backend is None:
+        if EMBEDDING_BACKEND not in EMBEDDING_BACKENDS:
+            raise ValueError(f"Unknown EMBEDDING_BACKEND '{EMBEDDING_BACKEND}'. "
+                             f"Choose one of: {', '.join(EMBEDDING_BACKENDS)}.")
+        _backend = EMBEDDING_BACKENDS[EMBEDDING_BACKEND]()
+    return _backend
+
+
+def text_hash(text):
+    """Cache key of a text."""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def make_batches(texts, max_batch_size, max_batch_chars):
+    """Split texts into batches bounded by input count and total characters."""
+    batches = []
+    batch = []
+    batch_chars = 0
+    for text in texts:
+        if batch and (len(batch) >= max_batch_size or batch_chars + len(text) > max_batch_chars):
+            batches.append(batch)
+            batch = []
+            batch_chars = 0
+        batch.append(text)
+        batch_chars += len(text)
+    if batch:
+        batches.append(batch)
+    return batches
+
+
+def embed_texts(texts):
+    """
+    Embed many texts with the configured backend.
+
+    Identical texts are embedded once, cached embeddings (keyed by model and
+    text hash) are reused, and the remaining texts are sent in as few
+    provider-sized requests as possible.
+
+    Args:
+        texts (list[str]): Texts to embed.
+
+    Returns:
+        list[list[float]]: One embedding per input text, in input order.
+    """
+    backend = get_backend()
+    hashes = [text_hash(text) for text in texts]
+    unique = dict(zip(hashes, texts))
+
+    vectors = {}
+    if backend.cacheable:
+        try:
+            started = time.monotonic()
+            cached = get_cached_embeddings(backend.name, list(unique))
+            vectors = {key: np.frombuffer(blob, dtype=np.float32).tolist() for key, blob in cached.items()}
+            if vectors:
+                llm_usage.record("embedding", backend.name, latency_ms=(time.monotonic() - started) * 1000,
+                                 cache_hit=True)
+        except sqlite3.Error as e:
+            print(f"Embedding cache unavailable: {e}")
+
+    missing = [key for key in unique if key not in vectors]
+    start = 0
+    for batch in make_batches([unique[key] for key in missing], backend.max_batch_size, backend.max_batch_chars):
+        vectors.update(zip(missing[start:start + len(batch)], backend.embed(batch)))
+        start += len(batch)
+
+    if backend.cacheable and missing:
+        try:
+            save_embeddings(backend.name, [(key, np.asarray(vectors[key], dtype=np.float32).tobytes())
+                                           for key in missing])
+        except sqlite3.Error as e:
+            print(f"Embedding cache unavailable: {e}")
+    return [vectors[key] for key in hashes]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Manage the local embedding backend')
+    parser.add_argument('command', choices=['fit'], help='fit: fit the local backend on all uploaded lectures')
+    parser.parse_args()
+
+    from db import get_lectures
+    from pdf_extractor import extract_pages_from_pdf
+    from rag_engine import chunk_pages
+
+    corpus = []
+    for _, title, _, file_path in get_lectures():
+        try:
+            corpus.extend(chunk["text"] for chunk in chunk_pages(extract_pages_from_pdf(file_path)))
+        except Exception as e:
+            print(f"Skipping {title}: {e}")
+    backend = LocalEmbeddingBackend()
+    backend.fit(corpus)
+    print(f"Fitted {backend.name} on {len(corpus)} chunks. Stored lecture vectors will be rebuilt on next use.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,177 @@
+"""
+Incremental parser for a JSON array arriving in pieces (e.g. a streamed completion).
+
+Text before the opening `[` (such as a model's preamble or a ```json fence) is
+skipped. Each top-level element of the array is decoded and returned as soon
+as its closing bracket, brace or quote has arrived, so callers can act on the
+first items while the rest are still being generated. `salvage_objects`
+recovers the well-formed objects from text that is not valid JSON as a whole.
+"""
+import json
+import re
+
+TRAILING_COMMA = re.compile(r",\s*([}\]])")
+
+
+class JsonArrayStream:
+    """Feed text pieces in, get completed top-level array elements out."""
+
+    def __init__(self):
+        self._buffer = ""
+        self._pos = 0             # Next character of the buffer to scan
+        self._depth = 0           # 0 before the array opens, 1 inside it, >1 inside an element
+        self._start = None        # Buffer offset where the current element starts
+        self._in_string = False
+        self._escaped = False
+        self.closed = False       # True once the array's closing `]` has been seen
+
+    def feed(self, text):
+        """
+        Add the next piece of text.
+
+        Args:
+            text (str): The next piece of the stream.
+
+        Returns:
+            list: Elements completed by this piece, in order. Elements that are
+                not valid JSON are skipped.
+        """
+        if self.closed:
+            return []
+        self._buffer += text
+        items = []
+        buffer = self._buffer
+        pos = self._pos
+        while pos < len(buffer):
+            char = buffer[pos]
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif char == "\\":
+                    self._escaped = True
+                elif char == '"':
+                    self._in_string = False
+                    if self._depth == 1:
+                        self._emit(buffer[self._start:pos + 1], items)
+            elif self._depth == 0:
+                if char == "[":
+                    self._depth = 1
+            elif char == '"':
+                self._in_string = True
+                if self._depth == 1:
+                    self._start = pos
+            elif char in "[{":
+                if self._depth == 1:
+                    self._start = pos
+                self._depth += 1
+            elif char in "]}":
+                self._depth -= 1
+                if self._depth == 1:
+                    self._emit(buffer[self._start:pos + 1], items)
+                elif self._depth == 0:
+                    self._scalar(buffer, pos, items)
+                    self.closed = True
+                    pos += 1
+                    break
+            elif char == "," and self._depth == 1:
+                self._scalar(buffer, pos, items)
+            elif self._depth == 1 and self._start is None and not char.isspace():
+                self._start = pos  # Start of a number, true, false or null
+            pos += 1
+
+        # Drop text that has been fully consumed so the buffer stays small
+        keep = pos if self._start is None else self._start
+        self._buffer = buffer[keep:]
+        self._pos = pos - keep
+        if self._start is not None:
+            self._start -= keep
+        return items
+
+    def _scalar(self, buffer, end, items):
+        """Emit a pending bare value (number, true, false or null) ended by `,` or `]`."""
+        if self._start is not None:
+            self._emit(buffer[self._start:end], items)
+
+    def _emit(self, text, items):
+        self._start = None
+        try:
+            items.append(json.loads(text))
+        except json.JSONDecodeError as e:
+            print(f"Skipping malformed array element: {e}")
+
+
+def iter_array_items(pieces):
+    """
+    Yield the elements of a JSON array as the text pieces that make it up arrive.
+
+    Args:
+        pieces (Iterable[str]): Successive pieces of the text containing the array.
+
+    Yields:
+        Each top-level element of the first JSON array in the text.
+    """
+    parser = JsonArrayStream()
+    for piece in pieces:
+        yield from parser.feed(piece)
+        if parser.closed:
+            return
+
+
+def _balanced_end(text, start):
+    """Return the offset just past the bracket closing the one at `start`, or None if it never closes."""
+    depth = 0
+    in_string = escaped = False
+    for pos in range(start, len(text)):
+        char = text[pos]
+        if in_string:
+            if escaped:
+                escaped = False
+            elif char == "\\":
+                escaped = True
+            elif char == '"':
+                in_string = False
+        elif char == '"':
+            in_string = True
+        elif char in "[{":
+            depth += 1
+        elif char in "]}":
+            depth -= 1
+            if depth == 0:
+                return pos + 1
+    return None
+
+
+def salvage_objects(text):
+    """
+    Recover every well-formed JSON object from text that may not parse as a whole.
+
+    Outermost objects are decoded one by one, so a broken element, a missing
+    bracket, surrounding prose or a truncated tail only loses the objects it
+    touches. Trailing commas inside an object are tolerated.
+
+    Args:
+        text (str): Text containing JSON objects, e.g. a malformed JSON array.
+
+    Returns:
+        list[dict]: The recovered objects, in order.
+    """
+    decoder = json.JSONDecoder()
+    objects = []
+    start = text.find("{")
+    while start != -1:
+        try:
+            obj, end = decoder.raw_decode(text, start)
+        except json.JSONDecodeError:
+            obj = None
+            end = _balanced_end(text, start)
+            if end is not None:
+                try:
+                    obj = json.loads(TRAILING_COMMA.sub(r"\1", text[start:end]))
+                except json.JSONDecodeError:
+                    end = None
+        if obj is not None:
+            objects.append(obj)
+            start = text.find("{", end)
+        else:
+            start = text.find("{", start + 1)
+    return objects
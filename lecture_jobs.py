@@ -0,0 +1,126 @@
+"""
+Background precomputation of lecture study material.
+
+When a teacher uploads a lecture, a job is queued that extracts and embeds the
+PDF, pre-generates the summary and the key-contents list into the
+`lecture_artifacts` table and fills the quiz bank for every difficulty.
+Student pages read those artifacts and only generate live while a job is
+still running. Job progress is kept in the `lecture_jobs` table so that a
+restarted server picks up jobs that were queued or interrupted.
+"""
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+import llm_usage
+import quiz_bank
+import rag_engine
+from content_prompts import SUMMARY_QUERY, CONTENTS_QUERY, content_request, summary_prompt, contents_prompt
+from db import (queue_lecture_job, claim_lecture_job, update_lecture_job, get_incomplete_lecture_jobs,
+                get_lecture, get_lecture_artifact, save_lecture_artifact)
+from llm_cache import cached_chat_completion
+from pdf_extractor import extract_text_from_pdf
+
+LECTURE_JOB_WORKERS = int(os.getenv("LECTURE_JOB_WORKERS", "2"))
+LECTURE_JOB_STALE_AFTER = 600  # Seconds without progress before a running job is considered abandoned
+
+_executor = ThreadPoolExecutor(max_workers=LECTURE_JOB_WORKERS, thread_name_prefix="lecture-job")
+_resumed = False
+_resume_lock = threading.Lock()
+
+
+def _lecture_text(lecture_id):
+    lecture = get_lecture(lecture_id)
+    if lecture is None:
+        raise ValueError(f"Lecture {lecture_id} not found.")
+    text = extract_text_from_pdf(lecture[3])
+    if not text:
+        raise ValueError("No text could be extracted from the PDF.")
+    return text
+
+
+@llm_usage.track("generate_summary")
+def _generate_summary(lecture_id):
+    context = rag_engine.build_context(lecture_id, SUMMARY_QUERY) or _lecture_text(lecture_id)
+    return cached_chat_completion(**content_request(summary_prompt(context), "summary"))
+
+
+@llm_usage.track("generate_contents")
+def _generate_contents(lecture_id):
+    context = rag_engine.build_context(lecture_id, CONTENTS_QUERY) or _lecture_text(lecture_id)
+    return cached_chat_completion(**content_request(contents_prompt(context), "contents"))
+
+
+# Artifacts generated by a job, in order
+ARTIFACT_GENERATORS = {
+    "summary": _generate_summary,
+    "contents": _generate_contents,
+}
+
+
+def run_lecture_job(lecture_id):
+    """
+    Precompute the study material of a lecture, unless another worker is already on it.
+
+    Artifacts stored by an earlier, interrupted run are kept, so a retried job
+    only generates what is missing.
+
+    Returns:
+        bool: True if every stage finished.
+    """
+    if not claim_lecture_job(lecture_id, time.time(), time.time() - LECTURE_JOB_STALE_AFTER):
+        return False
+    with llm_usage.tagged(lecture_id=lecture_id):
+        stage = "extract"
+        try:
+            update_lecture_job(lecture_id, "running", stage, None, time.time())
+            _lecture_text(lecture_id)
+
+            stage = "embed"
+            update_lecture_job(lecture_id, "running", stage, None, time.time())
+            rag_engine.ingest_lecture(lecture_id)
+
+            for stage, generate in ARTIFACT_GENERATORS.items():
+                if get_lecture_artifact(lecture_id, stage) is not None:
+                    continue
+                update_lecture_job(lecture_id, "running", stage, None, time.time())
+                save_lecture_artifact(lecture_id, stage, generate(lecture_id))
+
+            for difficulty in quiz_bank.QUIZ_DIFFICULTIES:
+                stage = f"quiz_{difficulty}"
+                update_lecture_job(lecture_id, "running", stage, None, time.time())
+                if quiz_bank.refill(lecture_id, difficulty) == 0:
+                    raise ValueError(f"No {difficulty} quiz questions could be generated.")
+
+            update_lecture_job(lecture_id, "done", None, None, time.time())
+            return True
+        except Exception as e:
+            print(f"Error precomputing lecture {lecture_id} ({stage}): {e}")
+            try:
+                update_lecture_job(lecture_id, "failed", stage, str(e), time.time())
+            except sqlite3.Error as db_error:
+                print(f"Error recording job failure: {db_error}")
+            return False
+
+
+def submit_lecture_job(lecture_id):
+    """Queue a lecture's precomputation and start it in the background."""
+    queue_lecture_job(lecture_id, time.time())
+    return llm_usage.submit_in_context(_executor, run_lecture_job, lecture_id)
+
+
+def resume_incomplete_jobs():
+    """Restart jobs left queued or interrupted by a previous server process (once per process)."""
+    global _resumed
+    with _resume_lock:
+        if _resumed:
+            return
+        _resumed = True
+    try:
+        lecture_ids = get_incomplete_lecture_jobs(time.time() - LECTURE_JOB_STALE_AFTER)
+    except sqlite3.Error as e:
+        print(f"Error loading lecture jobs: {e}")
+        return
+    for lecture_id in lecture_ids:
+        _executor.submit(run_lecture_job, lecture_id)
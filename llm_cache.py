@@ -0,0 +1,179 @@
+"""
+Response cache for chat completions.
+
+Responses are keyed by model, messages, max_tokens and temperature. Lookups go
+to a size-bounded in-memory LRU first, then to the `llm_cache` SQLite table
+shared by every server process. Entries expire after a TTL. Streaming
+requests are cached once the stream has completed. On a miss, identical
+concurrent requests are coalesced into a single API call (see singleflight).
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+import llm_client
+import llm_usage
+import singleflight
+from db import get_llm_cache_entry, save_llm_cache_entry
+
+LLM_CACHE_TTL = int(os.getenv("LLM_CACHE_TTL", str(7 * 24 * 3600)))  # Seconds
+LLM_CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "512"))  # In-memory tier size
+
+# In-memory tier: cache key -> (expires_at, response), least recently used first
+_memory = OrderedDict()
+_lock = threading.Lock()
+
+
+def cache_key(model, messages, max_tokens=None, temperature=None):
+    """Return the cache key of a chat completion request."""
+    request = json.dumps({"model": model, "messages": messages, "max_tokens": max_tokens,
+                          "temperature": temperature}, sort_keys=True)
+    return hashlib.sha256(request.encode("utf-8")).hexdigest()
+
+
+def _remember(key, expires_at, response):
+    with _lock:
+        _memory[key] = (expires_at, response)
+        _memory.move_to_end(key)
+        while len(_memory) > LLM_CACHE_MAX_ENTRIES:
+            _memory.popitem(last=False)
+
+
+def get(key):
+    """Return a cached response, or None if it is missing or expired."""
+    now = time.time()
+    with _lock:
+        entry = _memory.get(key)
+        if entry is not None:
+            if entry[0] > now:
+                _memory.move_to_end(key)
+                return entry[1]
+            del _memory[key]
+    try:
+        entry = get_llm_cache_entry(key, now)
+    except sqlite3.Error as e:
+        print(f"LLM cache unavailable: {e}")
+        return None
+    if entry is None:
+        return None
+    _remember(key, *entry)
+    return entry[1]
+
+
+def put(key, model, response, ttl=LLM_CACHE_TTL):
+    """Store a response in both cache tiers."""
+    expires_at = time.time() + ttl
+    _remember(key, expires_at, response)
+    try:
+        save_llm_cache_entry(key, model, response, expires_at)
+    except sqlite3.Error as e:
+        print(f"LLM cache unavailable: {e}")
+
+
+def clear_memory():
+    """Empty this process's in-memory tier."""
+    with _lock:
+        _memory.clear()
+
+
+def _record_hit(model, started):
+    """Log a response served from the cache or shared with an identical in-flight request."""
+    llm_usage.record("chat", model, latency_ms=(time.monotonic() - started) * 1000, cache_hit=True)
+
+
+def cached_chat_completion(model, messages, max_tokens=None, temperature=None, ttl=LLM_CACHE_TTL, use_cache=True):
+    """
+    Return the content of a chat completion, serving repeated requests from the cache.
+
+    Args:
+        model (str): OpenAI model name.
+        messages (list[dict]): Chat messages.
+        max_tokens (int, optional): Completion token limit.
+        temperature (float, optional): Sampling temperature.
+        ttl (int): Seconds the response stays cached.
+        use_cache (bool): Set to False to bypass the cache and force a new completion
+            (the fresh response still replaces the cached one).
+
+    Returns:
+        str: The completion text.
+    """
+    key = cache_key(model, messages, max_tokens, temperature)
+    flight = None
+    if use_cache:
+        started = time.monotonic()
+        response = get(key)
+        if response is None:
+            flight, response = singleflight.begin(key, check=lambda: get(key))
+        if flight is None:
+            _record_hit(model, started)
+            return response
+
+    params = {}
+    if max_tokens is not None:
+        params["max_tokens"] = max_tokens
+    if temperature is not None:
+        params["temperature"] = temperature
+    try:
+        response = llm_client.chat_completion(model, messages, **params)["choices"][0]["message"]["content"]
+        put(key, model, response, ttl)
+    except Exception as e:
+        if flight is not None:
+            singleflight.finish(flight, error=e)
+        raise
+    if flight is not None:
+        singleflight.finish(flight, response)
+    return response
+
+
+def cached_chat_completion_stream(model, messages, max_tokens=None, temperature=None, ttl=LLM_CACHE_TTL,
+                                  use_cache=True):
+    """
+    Yield the text of a chat completion as the model produces it.
+
+    A cached response is yielded in one piece. Otherwise the completion is
+    streamed and, once finished, stored in the cache. Callers that join an
+    identical request already streaming elsewhere get its text in one piece
+    when it completes. Arguments are the same as for `cached_chat_completion`.
+
+    Yields:
+        str: Successive pieces of the completion text.
+    """
+    key = cache_key(model, messages, max_tokens, temperature)
+    flight = None
+    if use_cache:
+        started = time.monotonic()
+        response = get(key)
+        if response is None:
+            flight, response = singleflight.begin(key, check=lambda: get(key))
+        if flight is None:
+            _record_hit(model, started)
+            yield response
+            return
+
+    params = {}
+    if max_tokens is not None:
+        params["max_tokens"] = max_tokens
+    if temperature is not None:
+        params["temperature"] = temperature
+    parts = []
+    response = error = None
+    try:
+        for chunk in llm_client.chat_completion_stream(model, messages, **params):
+            if not chunk["choices"]:
+                continue
+            content = chunk["choices"][0].get("delta", {}).get("content")
+            if content:
+                parts.append(content)
+                yield content
+        response = "".join(parts)
+        put(key, model, response, ttl)
+    except Exception as e:
+        error = e
+        raise
+    finally:
+        # An abandoned stream finishes without a result, so a waiter takes over the request
+        if flight is not None:
+            singleflight.finish(flight, response, error)
@@ -0,0 +1,219 @@
+"""
+Shared client for OpenAI API calls.
+
+Every chat completion and embedding request goes through this module so that
+the whole process shares:
+
+*   one pooled HTTP session (`openai.requestssession`), instead of a new
+    connection per thread;
+*   token-bucket limits on requests and tokens per minute, so bursts from a
+    whole class are queued instead of being rejected with 429s;
+*   retries with exponential backoff and jitter on rate limits, timeouts and
+    5xx errors, honouring `Retry-After`;
+*   a per-call timeout;
+*   usage accounting: every call is logged by llm_usage with its tokens,
+    latency and the caller's tags.
+"""
+import os
+import random
+import threading
+import time
+import openai
+import requests
+from dotenv import load_dotenv
+from requests.adapters import HTTPAdapter
+import llm_usage
+
+load_dotenv()
+openai.api_key = os.getenv("OPENAI_API_KEY")
+# Point at a compatible server instead of OpenAI, e.g. mock_openai_server.py for load tests
+openai.api_base = os.getenv("OPENAI_API_BASE", openai.api_base)
+
+OPENAI_RPM_LIMIT = int(os.getenv("OPENAI_RPM_LIMIT", "500"))  # Requests per minute
+OPENAI_TPM_LIMIT = int(os.getenv("OPENAI_TPM_LIMIT", "30000"))  # Tokens per minute
+LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT", "60"))  # Seconds per API call
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "5"))
+LLM_QUEUE_TIMEOUT = float(os.getenv("LLM_QUEUE_TIMEOUT", "120"))  # Longest wait for rate-limit budget
+LLM_POOL_SIZE = int(os.getenv("LLM_POOL_SIZE", "32"))  # Pooled connections to the API host
+BACKOFF_BASE = 1.0  # Seconds before the first retry (before jitter)
+BACKOFF_MAX = 30.0
+DEFAULT_COMPLETION_TOKENS = 500  # Assumed completion size when max_tokens is not set
+CHARS_PER_TOKEN = 4
+
+RETRYABLE_ERRORS = (openai.error.RateLimitError, openai.error.ServiceUnavailableError, openai.error.Timeout,
+                    openai.error.APIConnectionError, openai.error.TryAgain)
+
+
+class TokenBucket:
+    """
+    Rate limiter refilling `per_minute` units evenly over a minute.
+
+    Reservations may take the balance negative; later callers then wait for it
+    to refill, so waiting callers are served in arrival order.
+    """
+
+    def __init__(self, per_minute):
+        self.capacity = float(per_minute)
+        self.rate = per_minute / 60.0
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def acquire(self, amount, timeout=LLM_QUEUE_TIMEOUT):
+        """Take `amount` units, sleeping until they are available. Raises TimeoutError if that takes over `timeout`."""
+        amount = min(float(amount), self.capacity)
+        with self.lock:
+            self._refill()
+            wait = max(0.0, (amount - self.tokens) / self.rate)
+            if wait > timeout:
+                raise TimeoutError(f"Rate limit queue is full; request would wait {wait:.0f}s.")
+            self.tokens -= amount
+        if wait:
+            time.sleep(wait)
+
+    def adjust(self, amount):
+        """Return (positive) or charge (negative) units once the real cost of a request is known."""
+        with self.lock:
+            self._refill()
+            self.tokens = min(self.capacity, self.tokens + amount)
+
+
+_session = requests.Session()
+_adapter = HTTPAdapter(pool_connections=4, pool_maxsize=LLM_POOL_SIZE)
+_session.mount("https://", _adapter)
+_session.mount("http://", _adapter)
+openai.requestssession = _session
+
+request_limiter = TokenBucket(OPENAI_RPM_LIMIT)
+token_limiter = TokenBucket(OPENAI_TPM_LIMIT)
+
+
+def require_api_key():
+    """Raise if no OpenAI API key is configured."""
+    if not openai.api_key:
+        raise ValueError("OPENAI_API_KEY not set! Please configure it in your .env file or environment variables.")
+
+
+def estimate_tokens(text):
+    return len(text) // CHARS_PER_TOKEN + 1
+
+
+def _is_retryable(error):
+    if isinstance(error, RETRYABLE_ERRORS):
+        return True
+    return isinstance(error, openai.error.APIError) and (error.http_status is None or error.http_status >= 500)
+
+
+def _backoff(attempt, error):
+    """Seconds to wait before retry number `attempt` (full jitter, at least any Retry-After)."""
+    delay = random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * 2 ** attempt))
+    retry_after = (getattr(error, "headers", None) or {}).get("retry-after")
+    try:
+        return max(delay, float(retry_after)) if retry_after else delay
+    except ValueError:
+        return delay
+
+
+def _call(create, estimated_tokens, timeout, **params):
+    """Run an API call under the rate limits, retrying transient failures."""
+    for attempt in range(LLM_MAX_RETRIES + 1):
+        request_limiter.acquire(1)
+        token_limiter.acquire(estimated_tokens)
+        try:
+            return create(request_timeout=timeout, **params)
+        except Exception as e:
+            if attempt == LLM_MAX_RETRIES or not _is_retryable(e):
+                raise
+            print(f"OpenAI request failed ({e}); retrying")
+            time.sleep(_backoff(attempt, e))
+
+
+def _prompt_tokens(messages):
+    return sum(estimate_tokens(message.get("content") or "") for message in messages)
+
+
+def _elapsed_ms(started):
+    return (time.monotonic() - started) * 1000
+
+
+def chat_completion(model, messages, timeout=LLM_TIMEOUT, **params):
+    """
+    Create a chat completion.
+
+    Args:
+        model (str): OpenAI model name.
+        messages (list[dict]): Chat messages.
+        timeout (float): Seconds allowed per attempt.
+        **params: Further `openai.ChatCompletion.create` parameters (max_tokens, temperature, ...).
+
+    Returns:
+        dict: The API response.
+    """
+    prompt_tokens = _prompt_tokens(messages)
+    estimated = prompt_tokens + (params.get("max_tokens") or DEFAULT_COMPLETION_TOKENS)
+    started = time.monotonic()
+    try:
+        response = _call(openai.ChatCompletion.create, estimated, timeout, model=model, messages=messages, **params)
+    except Exception:
+        llm_usage.record("chat", model, latency_ms=_elapsed_ms(started), status="error")
+        raise
+    usage = response.get("usage") if hasattr(response, "get") else None
+    if usage and "total_tokens" in usage:
+        token_limiter.adjust(estimated - usage["total_tokens"])
+        llm_usage.record("chat", model, usage.get("prompt_tokens", 0), usage.get("completion_tokens", 0),
+                         _elapsed_ms(started))
+    else:
+        content = response["choices"][0]["message"]["content"] or ""
+        llm_usage.record("chat", model, prompt_tokens, estimate_tokens(content), _elapsed_ms(started))
+    return response
+
+
+def _record_stream(chunks, model, prompt_tokens, started):
+    """Pass chunks through, logging the call (with estimated token counts) once the stream ends."""
+    parts = []
+    status = "incomplete"
+    try:
+        for chunk in chunks:
+            if chunk["choices"]:
+                parts.append(chunk["choices"][0].get("delta", {}).get("content") or "")
+            yield chunk
+        status = "ok"
+    except Exception:
+        status = "error"
+        raise
+    finally:
+        llm_usage.record("chat", model, prompt_tokens, estimate_tokens("".join(parts)), _elapsed_ms(started),
+                         status=status)
+
+
+def chat_completion_stream(model, messages, timeout=LLM_TIMEOUT, **params):
+    """Create a streaming chat completion and return its chunk iterator (retries only apply before streaming starts)."""
+    prompt_tokens = _prompt_tokens(messages)
+    estimated = prompt_tokens + (params.get("max_tokens") or DEFAULT_COMPLETION_TOKENS)
+    started = time.monotonic()
+    try:
+        chunks = _call(openai.ChatCompletion.create, estimated, timeout, model=model, messages=messages, stream=True,
+                       **params)
+    except Exception:
+        llm_usage.record("chat", model, latency_ms=_elapsed_ms(started), status="error")
+        raise
+    return _record_stream(chunks, model, prompt_tokens, started)
+
+
+def embedding(texts, model, timeout=LLM_TIMEOUT):
+    """Embed a list of texts in one API call and return the API response."""
+    estimated = sum(estimate_tokens(text) for text in texts)
+    started = time.monotonic()
+    try:
+        response = _call(openai.Embedding.create, estimated, timeout, input=texts, model=model)
+    except Exception:
+        llm_usage.record("embedding", model, latency_ms=_elapsed_ms(started), status="error")
+        raise
+    usage = response.get("usage") if hasattr(response, "get") else None
+    llm_usage.record("embedding", model, (usage or {}).get("prompt_tokens", estimated), 0, _elapsed_ms(started))
+    return response
@@ -0,0 +1,118 @@
+"""
+Token and cost accounting for LLM and embedding calls.
+
+Every API call made through llm_client, and every request answered from a
+cache, is appended to the `llm_usage` table with its model, token counts,
+latency, cache-hit status and estimated cost. Rows are tagged with the
+calling function, the page, the user and the lecture taken from a context
+variable, so callers only declare tags once:
+
+    with llm_usage.tagged(page="Quiz", user_id=user["id"]):
+        ...
+
+Context variables do not follow work handed to thread pools; submit such work
+with `submit_in_context` so it keeps the submitter's tags.
+"""
+import contextvars
+import functools
+import inspect
+import sqlite3
+from contextlib import contextmanager
+from db import record_llm_usage
+
+# USD per million tokens: (prompt, completion)
+MODEL_PRICES = {
+    "gpt-4o": (2.50, 10.00),
+    "gpt-4o-mini": (0.15, 0.60),
+    "text-embedding-ada-002": (0.10, 0.0),
+}
+
+TAGS = ("caller", "page", "user_id", "lecture_id")
+
+_tags = contextvars.ContextVar("llm_usage_tags", default={})
+
+
+@contextmanager
+def tagged(**tags):
+    """Tag every call made inside the block (inner tags override outer ones)."""
+    unknown = set(tags) - set(TAGS)
+    if unknown:
+        raise ValueError(f"Unknown usage tags: {', '.join(sorted(unknown))}")
+    token = _tags.set({**_tags.get(), **tags})
+    try:
+        yield
+    finally:
+        _tags.reset(token)
+
+
+def track(caller):
+    """Decorator tagging the calls made by a function (or generator) with its name."""
+    def decorator(fn):
+        if inspect.isgeneratorfunction(fn):
+            @functools.wraps(fn)
+            def generator_wrapper(*args, **kwargs):
+                # Apply the tag only while the generator body runs, not while the consumer does
+                generator = fn(*args, **kwargs)
+                try:
+                    while True:
+                        with tagged(caller=caller):
+                            try:
+                                item = next(generator)
+                            except StopIteration as stop:
+                                return stop.value
+                        yield item
+                finally:
+                    with tagged(caller=caller):
+                        generator.close()
+            return generator_wrapper
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with tagged(caller=caller):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def current_tags():
+    return dict(_tags.get())
+
+
+def submit_in_context(executor, fn, *args, **kwargs):
+    """Submit work to a thread pool so that it keeps the caller's tags."""
+    return executor.submit(contextvars.copy_context().run, fn, *args, **kwargs)
+
+
+def estimate_cost(model, prompt_tokens, completion_tokens):
+    """Estimated USD cost of a call, or None for models without a known price."""
+    prices = MODEL_PRICES.get(model)
+    if prices is None:
+        # Dated snapshots such as gpt-4o-2024-08-06 are priced like their base model
+        base = max((name for name in MODEL_PRICES if model.startswith(name + "-")), key=len, default=None)
+        prices = MODEL_PRICES.get(base)
+    if prices is None:
+        return None
+    return (prompt_tokens * prices[0] + completion_tokens * prices[1]) / 1_000_000
+
+
+def record(kind, model, prompt_tokens=0, completion_tokens=0, latency_ms=None, cache_hit=False, status="ok"):
+    """
+    Append one call to the usage log. Failures to log never fail the call.
+
+    Args:
+        kind (str): "chat" or "embedding".
+        model (str): Model name.
+        prompt_tokens (int): Prompt (input) tokens billed.
+        completion_tokens (int): Completion tokens billed.
+        latency_ms (float, optional): Wall-clock time of the call.
+        cache_hit (bool): True if the response came from a cache (no tokens billed).
+        status (str): "ok" or "error".
+    """
+    tags = _tags.get()
+    cost = 0.0 if cache_hit else estimate_cost(model, prompt_tokens, completion_tokens)
+    try:
+        record_llm_usage(kind, model, tags.get("caller"), tags.get("page"), tags.get("user_id"),
+                         None if tags.get("lecture_id") is None else str(tags["lecture_id"]),
+                         prompt_tokens, completion_tokens, latency_ms, cache_hit, cost, status)
+    except sqlite3.Error as e:
+        print(f"Error recording LLM usage: {e}")
@@ -0,0 +1,282 @@
+"""
+Local stand-in for the OpenAI API, for load and integration testing.
+
+Implements the two endpoints this app uses, `POST /v1/chat/completions`
+(including `stream: true`) and `POST /v1/embeddings`, with configurable
+latency, injected 429/500 errors and canned responses:
+
+*   quiz prompts get valid quiz JSON for the requested difficulty;
+*   evaluation prompts (test_runner.py, relevance feedback) get scores in the
+    expected format;
+*   anything else gets filler text sized to max_tokens;
+*   embeddings are deterministic unit vectors derived from the input text.
+
+Point the app or test_runner.py at it by setting
+OPENAI_API_BASE=http://localhost:8081/v1 (any OPENAI_API_KEY is accepted).
+
+Usage:
+    python mock_openai_server.py [--port 8081] [--latency 0.5] [--latency-spread 0.2]
+        [--latency-dist fixed|uniform|normal|lognormal] [--token-delay 0.01]
+        [--rate-limit-rate 0.05] [--server-error-rate 0.01] [--seed 0]
+"""
+
+import argparse
+import hashlib
+import itertools
+import json
+import random
+import re
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import numpy as np
+
+EMBEDDING_DIM = 1536  # Same as text-embedding-ada-002
+QUIZ_QUESTIONS = 5
+WORDS_PER_TOKEN = 0.75
+STREAM_CHUNK_WORDS = 3
+
+FILLER = ("Requirements engineering covers elicitation, analysis, specification, validation and management of "
+          "stakeholder needs so that the system built is the system wanted.").split()
+
+
+class MockSettings:
+    """Behaviour of a mock server (see the command-line options for meanings)."""
+
+    def __init__(self, latency=0.5, latency_spread=0.2, latency_dist="lognormal", token_delay=0.01,
+                 rate_limit_rate=0.0, server_error_rate=0.0, seed=None):
+        self.latency = latency
+        self.latency_spread = latency_spread
+        self.latency_dist = latency_dist
+        self.token_delay = token_delay
+        self.rate_limit_rate = rate_limit_rate
+        self.server_error_rate = server_error_rate
+        self.rng = random.Random(seed)
+        self.rng_lock = threading.Lock()
+        self.question_ids = itertools.count(1)  # Keeps generated questions distinct across calls
+
+    def random(self):
+        with self.rng_lock:
+            return self.rng.random()
+
+    def sample_latency(self):
+        """Seconds before the first byte of a response."""
+        with self.rng_lock:
+            if self.latency_dist == "fixed":
+                value = self.latency
+            elif self.latency_dist == "uniform":
+                value = self.rng.uniform(self.latency - self.latency_spread, self.latency + self.latency_spread)
+            elif self.latency_dist == "normal":
+                value = self.rng.gauss(self.latency, self.latency_spread)
+            elif self.latency_dist == "lognormal":
+                # Median `latency`, with the long right tail real APIs show
+                sigma = self.latency_spread / self.latency if self.latency else 0.0
+                value = self.latency * self.rng.lognormvariate(0.0, sigma)
+            else:
+                raise ValueError(f"Unknown latency distribution '{self.latency_dist}'.")
+        return max(0.0, value)
+
+
+def prompt_text(messages):
+    return "\n".join(message.get("content") or "" for message in messages)
+
+
+def quiz_response(prompt, settings):
+    """Build quiz JSON matching quiz_handler's requested format."""
+    match = re.search(r"Difficulty Level:\s*(\w+)", prompt)
+    difficulty = match.group(1) if match else "easy"
+    topics = [word for word in re.findall(r"[A-Za-z]{7,}", prompt.split("Generate a quiz")[0])][:50] or FILLER
+    types = ["mcq_single", "true_false"] if difficulty == "easy" else ["mcq_single", "mcq_multiple", "true_false"]
+    questions = []
+    for idx in range(QUIZ_QUESTIONS):
+        number = next(settings.question_ids)
+        topic = topics[(number * 7) % len(topics)]
+        question_type = types[idx % len(types)]
+        if question_type == "true_false":
+            questions.append({"question": f"({number}) {topic} is part of this lecture.", "type": question_type,
+                              "options": ["True", "False"], "answer": "True"})
+        elif question_type == "mcq_multiple":
+            questions.append({"question": f"({number}) Which options relate to {topic}?", "type": question_type,
+                              "options": ["Option A", "Option B", "Option C", "Option D"],
+                              "answer": ["Option A", "Option C"]})
+        else:
+            questions.append({"question": f"({number}) What best describes {topic}?", "type": question_type,
+                              "options": ["Option A", "Option B", "Option C", "Option D"], "answer": "Option B"})
+    return "```json\n" + json.dumps(questions, indent=2) + "\n```"
+
+
+def evaluation_response(settings):
+    scores = [round(6 + 4 * settings.random()) for _ in range(4)]
+    return ("CORRECTNESS: {}\nCOMPLETENESS: {}\nCLARITY: {}\nRELEVANCE: {}\nOVERALL: {:.1f}\n"
+            "REASONING: Mock evaluation.".format(*scores, sum(scores) / 4))
+
+
+def filler_response(max_tokens):
+    words = int((max_tokens or 300) * WORDS_PER_TOKEN)
+    return " ".join(itertools.islice(itertools.cycle(FILLER), words))
+
+
+def chat_response(messages, max_tokens, settings):
+    """Pick a canned answer for a chat prompt."""
+    prompt = prompt_text(messages)
+    if "Generate a quiz" in prompt:
+        return quiz_response(prompt, settings)
+    if "CORRECTNESS:" in prompt:
+        return evaluation_response(settings)
+    if "relevance score" in prompt.lower():
+        return f"{round(5 + 5 * settings.random())} - The generated content matches the course material."
+    return filler_response(max_tokens)
+
+
+def embed(text):
+    """Deterministic unit vector for a text."""
+    seed = int.from_bytes(hashlib.sha256(text.encode("utf-8")).digest()[:8], "little")
+    vector = np.random.default_rng(seed).normal(size=EMBEDDING_DIM)
+    return (vector / np.linalg.norm(vector)).tolist()
+
+
+def usage(prompt_tokens, completion_tokens=0):
+    return {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens}
+
+
+def count_tokens(text):
+    return max(1, int(len(text.split()) / WORDS_PER_TOKEN))
+
+
+class MockOpenAIHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass  # Keep load tests quiet
+
+    def _send_json(self, status, body, headers=None):
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _send_error(self, status, message, error_type, headers=None):
+        self._send_json(status, {"error": {"message": message, "type": error_type, "param": None, "code": None}},
+                        headers)
+
+    def do_POST(self):
+        settings = self.server.settings
+        length = int(self.headers.get("Content-Length") or 0)
+        try:
+            request = json.loads(self.rfile.read(length) or b"{}")
+        except json.JSONDecodeError:
+            self._send_error(400, "Invalid JSON body.", "invalid_request_error")
+            return
+
+        time.sleep(settings.sample_latency())
+        roll = settings.random()
+        if roll < settings.rate_limit_rate:
+            self._send_error(429, "Rate limit reached (injected by mock server).", "requests", {"Retry-After": "1"})
+            return
+        if roll < settings.rate_limit_rate + settings.server_error_rate:
+            self._send_error(500, "Internal server error (injected by mock server).", "server_error")
+            return
+
+        path = self.path.rstrip("/")
+        if path.endswith("/chat/completions"):
+            self._chat_completion(request, settings)
+        elif path.endswith("/embeddings"):
+            self._embeddings(request)
+        else:
+            self._send_error(404, f"Unknown endpoint {self.path}.", "invalid_request_error")
+
+    def _chat_completion(self, request, settings):
+        messages = request.get("messages") or []
+        model = request.get("model", "gpt-4o")
+        content = chat_response(messages, request.get("max_tokens"), settings)
+        completion_id = f"chatcmpl-mock-{uuid.uuid4().hex[:12]}"
+        created = int(time.time())
+        if not request.get("stream"):
+            self._send_json(200, {
+                "id": completion_id, "object": "chat.completion", "created": created, "model": model,
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": content},
+                             "finish_reason": "stop"}],
+                "usage": usage(count_tokens(prompt_text(messages)), count_tokens(content)),
+            })
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        self.close_connection = True
+
+        def send_chunk(delta, finish_reason=None):
+            chunk = {"id": completion_id, "object": "chat.completion.chunk", "created": created, "model": model,
+                     "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}]}
+            self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode("utf-8"))
+            self.wfile.flush()
+
+        send_chunk({"role": "assistant"})
+        words = content.split(" ")
+        for start in range(0, len(words), STREAM_CHUNK_WORDS):
+            piece = " ".join(words[start:start + STREAM_CHUNK_WORDS])
+            send_chunk({"content": piece if start == 0 else " " + piece})
+            time.sleep(settings.token_delay)
+        send_chunk({}, "stop")
+        self.wfile.write(b"data: [DONE]\n\n")
+        self.wfile.flush()
+
+    def _embeddings(self, request):
+        texts = request.get("input")
+        if isinstance(texts, str):
+            texts = [texts]
+        if not texts:
+            self._send_error(400, "'input' is required.", "invalid_request_error")
+            return
+        self._send_json(200, {
+            "object": "list",
+            "data": [{"object": "embedding", "index": idx, "embedding": embed(text)} for idx, text in enumerate(texts)],
+            "model": request.get("model", "text-embedding-ada-002"),
+            "usage": usage(sum(count_tokens(text) for text in texts)),
+        })
+
+
+def make_server(host="127.0.0.1", port=8081, settings=None):
+    """Create (but do not start) a mock server; port 0 picks a free port."""
+    server = ThreadingHTTPServer((host, port), MockOpenAIHandler)
+    server.daemon_threads = True
+    server.settings = settings or MockSettings()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Local OpenAI-compatible stand-in server')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8081)
+    parser.add_argument('--latency', type=float, default=0.5, help='Mean (median for lognormal) seconds to first byte')
+    parser.add_argument('--latency-spread', type=float, default=0.2, help='Spread of the latency distribution in seconds')
+    parser.add_argument('--latency-dist', choices=['fixed', 'uniform', 'normal', 'lognormal'], default='lognormal')
+    parser.add_argument('--token-delay', type=float, default=0.01, help='Seconds between streamed chunks')
+    parser.add_argument('--rate-limit-rate', type=float, default=0.0, help='Fraction of requests answered with 429')
+    parser.add_argument('--server-error-rate', type=float, default=0.0, help='Fraction of requests answered with 500')
+    parser.add_argument('--seed', type=int, default=None)
+    args = parser.parse_args()
+
+    settings = MockSettings(args.latency, args.latency_spread, args.latency_dist, args.token_delay,
+                            args.rate_limit_rate, args.server_error_rate, args.seed)
+    server = make_server(args.host, args.port, settings)
+    print(f"Mock OpenAI server on http://{args.host}:{server.server_address[1]}/v1 "
+          f"(set OPENAI_API_BASE to this URL)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+"""
+Model routing for generation tasks.
+
+Picks the model for each request from its task, its prompt size and the
+configured budget, so short requests (most slides and questions) go to the
+cheaper, faster model and only long or demanding prompts pay for the large one.
+
+*   `MODEL_ROUTER_BUDGET`: "quality" (large model wherever it is the task's
+    default), "balanced" (default; small model for prompts under the task's
+    size limit) or "economy" (small model everywhere, lowest cost and latency).
+*   `MODEL_ROUTER_OVERRIDES`: per-task models, e.g. "quiz=gpt-4o,summary=gpt-4o-mini".
+
+Every decision is appended to the `model_routing_log` table, and can be
+collected in-process with `capture()` (test_runner.py stores them with each
+result so routing can be evaluated against answer quality).
+"""
+import contextvars
+import math
+import os
+import sqlite3
+from collections import namedtuple
+from contextlib import contextmanager
+import llm_usage
+from db import record_model_routing
+
+SMALL_MODEL = os.getenv("MODEL_ROUTER_SMALL_MODEL", "gpt-4o-mini")
+LARGE_MODEL = os.getenv("MODEL_ROUTER_LARGE_MODEL", "gpt-4o")
+MODEL_ROUTER_BUDGET = os.getenv("MODEL_ROUTER_BUDGET", "balanced")
+
+# Multiplier applied to each task's small-model size limit
+BUDGET_SCALES = {"quality": 0, "balanced": 1, "economy": math.inf}
+
+# Task -> prompt tokens up to which the small model is good enough under the balanced
+# budget (None: the task always uses the small model)
+TASK_SMALL_MODEL_LIMITS = {
+    "summary": 2000,
+    "contents": 3000,
+    "conceptual_example": 1500,
+    "custom": 1500,
+    "quiz": 1200,
+    "assignment": 1000,
+    "chatbot": None,
+    "feedback": None,
+}
+
+RoutingDecision = namedtuple("RoutingDecision", ["task", "model", "reason", "prompt_tokens"])
+
+_captures = contextvars.ContextVar("model_router_captures", default=None)
+
+
+def parse_overrides(value):
+    """Parse "task=model,task=model" into a dict."""
+    overrides = {}
+    for item in (value or "").split(","):
+        if "=" in item:
+            task, model = item.split("=", 1)
+            overrides[task.strip()] = model.strip()
+    return overrides
+
+
+MODEL_ROUTER_OVERRIDES = parse_overrides(os.getenv("MODEL_ROUTER_OVERRIDES"))
+
+
+def route(task, prompt_tokens, model=None, budget=None):
+    """
+    Choose the model for a request.
+
+    Args:
+        task (str): A key of TASK_SMALL_MODEL_LIMITS.
+        prompt_tokens (int): Estimated prompt size.
+        model (str, optional): Explicit model for this call, overriding everything else.
+        budget (str, optional): Budget for this call, defaulting to MODEL_ROUTER_BUDGET.
+
+    Returns:
+        RoutingDecision: The chosen model and why.
+    """
+    if task not in TASK_SMALL_MODEL_LIMITS:
+        raise ValueError(f"Unknown task '{task}'.")
+    budget = budget or MODEL_ROUTER_BUDGET
+    if budget not in BUDGET_SCALES:
+        raise ValueError(f"Unknown budget '{budget}'.")
+
+    if model:
+        decision = RoutingDecision(task, model, "call override", prompt_tokens)
+    elif task in MODEL_ROUTER_OVERRIDES:
+        decision = RoutingDecision(task, MODEL_ROUTER_OVERRIDES[task], "task override", prompt_tokens)
+    elif TASK_SMALL_MODEL_LIMITS[task] is None:
+        decision = RoutingDecision(task, SMALL_MODEL, "small-model task", prompt_tokens)
+    else:
+        limit = TASK_SMALL_MODEL_LIMITS[task] * BUDGET_SCALES[budget]
+        if prompt_tokens <= limit:
+            decision = RoutingDecision(task, SMALL_MODEL, f"{budget}: prompt <= {limit:g} tokens", prompt_tokens)
+        else:
+            decision = RoutingDecision(task, LARGE_MODEL, f"{budget}: prompt > {limit:g} tokens", prompt_tokens)
+    _log(decision, budget)
+    return decision
+
+
+def _log(decision, budget):
+    captured = _captures.get()
+    if captured is not None:
+        captured.append(decision)
+    tags = llm_usage.current_tags()
+    try:
+        record_model_routing(decision.task, decision.model, decision.reason, decision.prompt_tokens, budget,
+                             tags.get("caller"), tags.get("page"))
+    except sqlite3.Error as e:
+        print(f"Error logging routing decision: {e}")
+
+
+@contextmanager
+def capture():
+    """Collect the routing decisions made inside the block into the yielded list."""
+    decisions = []
+    token = _captures.set(decisions)
+    try:
+        yield decisions
+    finally:
+        _captures.reset(token)
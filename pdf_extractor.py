@@ -1,13 +1,64 @@
+import hashlib
+import os
+import sqlite3
 import fitz  # PyMuPDF
+from db import get_cached_extraction_by_stat, get_cached_extraction, save_extraction
+
+# Bump whenever the extraction logic changes so stale cache entries are ignored
+EXTRACTOR_VERSION = f"pymupdf-{fitz.VersionBind}-text-1"
+
+
+def hash_file(pdf_path):
+    """Return the SHA-256 hex digest of a file's contents."""
+    digest = hashlib.sha256()
+    with open(pdf_path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _extract_pages(pdf_path):
+    """Run PyMuPDF over every page of a PDF."""
+    with fitz.open(pdf_path) as pdf:
+        return [pdf[page_num].get_text("text") for page_num in range(pdf.page_count)]
+
+
+def extract_pages_from_pdf(pdf_path):
+    """
+    Extract the text of each page of a PDF, using the persistent extraction cache.
+
+    The cache is keyed by the file's content hash and EXTRACTOR_VERSION. A lookup
+    on (path, size, mtime) is tried first so unchanged files are served without
+    being opened at all.
+
+    Args:
+        pdf_path (str): Path to the PDF file.
+
+    Returns:
+        list[str]: The text of each page, in order.
+    """
+    stat = os.stat(pdf_path)
+    try:
+        pages = get_cached_extraction_by_stat(pdf_path, stat.st_size, stat.st_mtime_ns, EXTRACTOR_VERSION)
+        if pages is not None:
+            return pages
+        content_hash = hash_file(pdf_path)
+        pages = get_cached_extraction(content_hash, EXTRACTOR_VERSION)
+        if pages is None:
+            pages = _extract_pages(pdf_path)
+        save_extraction(content_hash, EXTRACTOR_VERSION, pdf_path, stat.st_size, stat.st_mtime_ns, pages)
+        return pages
+    except sqlite3.Error as e:
+        # The cache is an optimisation only; never fail extraction because of it
+        print(f"Extraction cache unavailable: {e}")
+        return _extract_pages(pdf_path)
+
 
 def extract_text_from_pdf(pdf_path):
     """Extracts text from a PDF file."""
     text = ""
     try:
-        with fitz.open(pdf_path) as pdf:
-            for page_num in range(pdf.page_count):
-                page = pdf[page_num]
-                text += page.get_text("text")  # Extract text from each page
+        text = "".join(extract_pages_from_pdf(pdf_path))
     except Exception as e:
         text = f"Error extracting text: {str(e)}"
     return text
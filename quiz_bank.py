@@ -0,0 +1,152 @@
+"""
+Per-lecture, per-difficulty bank of pre-generated quiz questions.
+
+Generating a quiz takes a full GPT-4o call, so questions are generated ahead
+of time into the `quiz_bank` table and quizzes are assembled by sampling from
+it. Whenever a bank drops below a low watermark (or its lecture PDF changes,
+which invalidates the bank) a background worker tops it up, keeping
+generation off the students' critical path.
+"""
+import hashlib
+import json
+import os
+import random
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+import llm_usage
+import rag_engine
+from db import (get_lecture, add_quiz_questions, get_quiz_bank_questions, count_quiz_questions,
+                sample_quiz_questions, delete_stale_quiz_questions, acquire_inflight_lock, release_inflight_lock)
+from pdf_extractor import hash_file, extract_text_from_pdf
+from quiz_handler import generate_quiz
+
+QUIZ_DIFFICULTIES = ["easy", "medium", "hard"]
+QUIZ_SIZE = int(os.getenv("QUIZ_SIZE", "5"))  # Questions per quiz
+QUIZ_BANK_LOW_WATERMARK = int(os.getenv("QUIZ_BANK_LOW_WATERMARK", "15"))  # Refill below this many questions
+QUIZ_BANK_TARGET = int(os.getenv("QUIZ_BANK_TARGET", "30"))  # Refill up to this many questions
+QUIZ_BANK_MAX_BATCHES = 5  # Generation calls per refill, in case the model keeps repeating itself
+REFILL_LOCK_TTL = 600  # Seconds before another process may take over a crashed refill
+
+# Retrieval settings for the lecture chunks a quiz is generated from
+QUIZ_QUERY = "Key concepts, definitions, facts and techniques suitable for quiz questions"
+QUIZ_TOP_K = 6
+
+_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="quiz-bank")
+_refilling = set()  # (lecture_id, difficulty) pairs queued or refilling in this process
+_refilling_lock = threading.Lock()
+# (file_path, size, mtime_ns) -> content hash, so sampling does not re-read the PDF
+_versions = {}
+
+
+def lecture_version(lecture_id):
+    """Return the content hash of a lecture's PDF, or None if the lecture or file is missing."""
+    lecture = get_lecture(lecture_id)
+    if lecture is None:
+        return None
+    file_path = lecture[3]
+    try:
+        stat = os.stat(file_path)
+        key = (file_path, stat.st_size, stat.st_mtime_ns)
+        if key not in _versions:
+            _versions[key] = hash_file(file_path)
+        return _versions[key]
+    except OSError:
+        return None
+
+
+def question_hash(question):
+    """Identify a question by its normalised text, so rephrased whitespace or case do not count as new."""
+    text = " ".join(str(question.get("question", "")).lower().split())
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def add_questions(lecture_id, difficulty, questions, version=None):
+    """Add generated questions to a lecture's bank. Returns the number of new questions."""
+    version = version or lecture_version(lecture_id)
+    if version is None or not questions:
+        return 0
+    return add_quiz_questions(lecture_id, difficulty, version,
+                              [(question_hash(q), json.dumps(q)) for q in questions if q.get("question")])
+
+
+def refill(lecture_id, difficulty, target=QUIZ_BANK_TARGET):
+    """
+    Generate questions until a lecture's bank holds at least `target` of them.
+
+    Questions from an earlier version of the lecture are discarded first.
+
+    Returns:
+        int: Questions in the bank afterwards, or None if another process is
+        already refilling it.
+    """
+    version = lecture_version(lecture_id)
+    if version is None:
+        raise ValueError(f"Lecture {lecture_id} or its PDF not found.")
+
+    lock_key = f"quiz-bank:{lecture_id}:{difficulty}"
+    owner = uuid.uuid4().hex
+    if not acquire_inflight_lock(lock_key, owner, time.time(), time.time() + REFILL_LOCK_TTL):
+        return None
+    try:
+        delete_stale_quiz_questions(lecture_id, version)
+        existing = [json.loads(q) for q in get_quiz_bank_questions(lecture_id, difficulty, version)]
+        context = None
+        for _ in range(QUIZ_BANK_MAX_BATCHES):
+            if len(existing) >= target:
+                break
+            if context is None:
+                context = (rag_engine.build_context(lecture_id, QUIZ_QUERY, top_k=QUIZ_TOP_K)
+                           or extract_text_from_pdf(get_lecture(lecture_id)[3]))
+            quiz_questions, _ = generate_quiz(context, difficulty,
+                                              exclude_questions=[q["question"] for q in existing])
+            if not quiz_questions:
+                break
+            add_questions(lecture_id, difficulty, quiz_questions, version)
+            existing = [json.loads(q) for q in get_quiz_bank_questions(lecture_id, difficulty, version)]
+        return len(existing)
+    finally:
+        release_inflight_lock(lock_key, owner)
+
+
+def _refill_in_background(lecture_id, difficulty):
+    try:
+        with llm_usage.tagged(lecture_id=lecture_id):
+            refill(lecture_id, difficulty)
+    except Exception as e:
+        print(f"Error refilling quiz bank for lecture {lecture_id} ({difficulty}): {e}")
+    finally:
+        with _refilling_lock:
+            _refilling.discard((lecture_id, difficulty))
+
+
+def schedule_refill(lecture_id, difficulty):
+    """Top up a bank in the background, unless a refill is already queued in this process."""
+    with _refilling_lock:
+        if (lecture_id, difficulty) in _refilling:
+            return
+        _refilling.add((lecture_id, difficulty))
+    llm_usage.submit_in_context(_executor, _refill_in_background, lecture_id, difficulty)
+
+
+def sample_quiz(lecture_id, difficulty, size=QUIZ_SIZE):
+    """
+    Assemble a quiz from the bank, scheduling a refill when it runs low.
+
+    Returns:
+        tuple: A list of question dictionaries and a dictionary of correct
+        answers, like `generate_quiz`. Both are empty if the bank holds fewer
+        than `size` questions for the current version of the lecture.
+    """
+    version = lecture_version(lecture_id)
+    if version is None:
+        return [], {}
+    quiz_questions = [json.loads(q) for q in sample_quiz_questions(lecture_id, difficulty, version, size)]
+    if count_quiz_questions(lecture_id, difficulty, version) < QUIZ_BANK_LOW_WATERMARK:
+        schedule_refill(lecture_id, difficulty)
+    if len(quiz_questions) < size:
+        return [], {}
+    random.shuffle(quiz_questions)
+    correct_answers = {idx: q["answer"] for idx, q in enumerate(quiz_questions)}
+    return quiz_questions, correct_answers
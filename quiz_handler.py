@@ -1,109 +1,278 @@
-import openai
-import json
-import random
-import os
-from dotenv import load_dotenv
-
-# Load environment variables from .env file
-load_dotenv()
-
-api_key = os.getenv("OPENAI_API_KEY")
-if not api_key:
-    raise ValueError("OPENAI_API_KEY not set! Please configure it in your .env file or environment variables.")
-openai.api_key = api_key
-
-def generate_quiz(pdf_content, difficulty):
-    """
-    Generate quiz questions and answers in real-time using OpenAI API.
-
-    Args:
-        pdf_content (str): The text content extracted from the lecture PDF.
-        difficulty (str): Selected difficulty level: 'easy', 'medium', or 'hard'.
-
-    Returns:
-        tuple: A list of question dictionaries and a dictionary of correct answers.
-    """
-    # Define the prompt for quiz generation
-    prompt = f"""
-    You are a helpful teaching assistant. Based on the following course material:
-    {pdf_content}
-
-    Generate a quiz with the following requirements:
-    - Difficulty Level: {difficulty}
-    - Question types:
-      - 'easy': MCQ (single correct answer) and True/False questions only.
-      - 'medium': Include MCQ (multiple correct answers).
-      - 'hard': Generate more complex variations of MCQs and True/False questions.
-    - Provide correct answers for each question.
-    - Format questions as JSON in this structure:
-      [
-        {{
-            "question": "Sample question text",
-            "type": "mcq_single / mcq_multiple / true_false",
-            "options": ["Option1", "Option2", "Option3"],
-            "answer": "Correct answer or list of correct answers"
-        }}
-      ]
-    - Ensure the generated quiz is in valid JSON format.
-    """
-    # Call OpenAI API
-    try:
-        # Call OpenAI API
-        response = openai.ChatCompletion.create(
-            model="gpt-4o",
-            messages=[{"role": "system", "content": prompt}]
-        )
-        raw_data = response['choices'][0]['message']['content']
-
-        # Extract JSON block
-        json_start = raw_data.find("[")
-        json_end = raw_data.rfind("]")
-        if json_start == -1 or json_end == -1 or json_start > json_end:
-            raise ValueError("No valid JSON block found in the response.")
-        quiz_data = raw_data[json_start:json_end + 1]
-
-        # Parse the JSON block
-        quiz_questions = json.loads(quiz_data)
-        correct_answers = {idx: q["answer"] for idx, q in enumerate(quiz_questions)}
-        return quiz_questions, correct_answers
-
-    except json.JSONDecodeError as e:
-        print(f"Error parsing JSON: {e}")
-        return [], {}
-    except Exception as e:
-        print(f"Error generating quiz: {e}")
-        return [], {}
-
-def evaluate_quiz(submitted_answers, correct_answers):
-    """
-    Evaluate submitted quiz answers.
-
-    Args:
-        submitted_answers (dict): Answers submitted by the student.
-        correct_answers (dict): The correct answers for the quiz.
-
-    Returns:
-        tuple: Score, total questions, and detailed feedback.
-    """
-    score = 0
-    total = len(correct_answers)
-    feedback = {}
-
-    for idx, correct in correct_answers.items():
-        submitted = submitted_answers.get(idx, None)
-        if isinstance(correct, list):
-            # For MCQ (multiple answers), compare sets
-            if set(submitted) == set(correct):
-                score += 1
-                feedback[idx] = "Correct"
-            else:
-                feedback[idx] = f"Incorrect. Correct answers: {', '.join(correct)}"
-        else:
-            # For MCQ (single answer) and True/False
-            if submitted == correct:
-                score += 1
-                feedback[idx] = "Correct"
-            else:
-                feedback[idx] = f"Incorrect. Correct answer: {correct}"
-
-    return score, total, feedback
+import json
+import random
+import re
+import llm_client
+import llm_usage
+import model_router
+from json_stream import iter_array_items, salvage_objects
+
+llm_client.require_api_key()
+
+QUESTION_TYPES = ("mcq_single", "mcq_multiple", "true_false")
+QUIZ_REPAIR_TOKENS_PER_QUESTION = 250  # Completion budget per question of a repair call
+QUESTION_KEY = re.compile(r'"question"\s*:')  # Counts the questions the model attempted, parsed or not
+
+def quiz_prompt(pdf_content, difficulty, exclude_questions=None):
+    """Build the quiz generation prompt (see `generate_quiz` for the arguments)."""
+    prompt = f"""
+    You are a helpful teaching assistant. Based on the following course material:
+    {pdf_content}
+
+    Generate a quiz with the following requirements:
+    - Difficulty Level: {difficulty}
+    - Question types:
+      - 'easy': MCQ (single correct answer) and True/False questions only.
+      - 'medium': Include MCQ (multiple correct answers).
+      - 'hard': Generate more complex variations of MCQs and True/False questions.
+    - Provide correct answers for each question.
+    - Format questions as JSON in this structure:
+      [
+        {{
+            "question": "Sample question text",
+            "type": "mcq_single / mcq_multiple / true_false",
+            "options": ["Option1", "Option2", "Option3"],
+            "answer": "Correct answer or list of correct answers"
+        }}
+      ]
+    - Ensure the generated quiz is in valid JSON format.
+    """
+    if exclude_questions:
+        prompt += "\n    Do not repeat any of these existing questions:\n" + "\n".join(
+            f"    - {question}" for question in exclude_questions)
+    return prompt
+
+def _quiz_request(pdf_content, difficulty, exclude_questions):
+    """Return the model and messages of a quiz generation request."""
+    prompt = quiz_prompt(pdf_content, difficulty, exclude_questions)
+    return model_router.route("quiz", llm_client.estimate_tokens(prompt)).model, [{"role": "system", "content": prompt}]
+
+def validate_question(question):
+    """Return why a generated question does not fit the quiz schema, or None if it does."""
+    if not isinstance(question, dict):
+        return "not a JSON object"
+    if not isinstance(question.get("question"), str) or not question["question"].strip():
+        return "missing question text"
+    if question.get("type") not in QUESTION_TYPES:
+        return f"unknown type {question.get('type')!r}"
+    options = question.get("options")
+    if not isinstance(options, list) or len(options) < 2 or not all(isinstance(o, str) for o in options):
+        return "options must be a list of at least two strings"
+    answer = question.get("answer")
+    if question["type"] == "mcq_multiple":
+        if not isinstance(answer, list) or not answer:
+            return "an mcq_multiple answer must be a non-empty list"
+        if any(choice not in options for choice in answer):
+            return "answer is not among the options"
+    elif not isinstance(answer, str) or answer not in options:
+        return "answer is not among the options"
+    return None
+
+def _question_candidates(items):
+    """
+    Yield the question candidates among parsed JSON values.
+
+    Objects without a "question" key that hold lists or objects, such as
+    {"questions": [...]}, are wrappers: the values inside them are yielded instead.
+    """
+    for item in items:
+        if isinstance(item, dict) and "question" not in item:
+            nested = [value for value in item.values() if isinstance(value, (dict, list))]
+            if nested:
+                for value in nested:
+                    yield from _question_candidates(value if isinstance(value, list) else [value])
+                continue
+        yield item
+
+def _accept(candidate, seen, problems):
+    """
+    Return a generated question if it is valid and new.
+
+    Invalid candidates have their problem appended to `problems`; they are the
+    ones worth regenerating. Duplicates and excluded questions are dropped silently.
+    """
+    if isinstance(candidate, dict) and candidate.get("type") == "true_false":
+        # Common harmless deviations: boolean answers and omitted True/False options
+        if isinstance(candidate.get("answer"), bool):
+            candidate["answer"] = str(candidate["answer"])
+        candidate.setdefault("options", ["True", "False"])
+    problem = validate_question(candidate)
+    if problem:
+        print(f"Rejected quiz question ({problem}): {candidate!r}")
+        problems.append(problem)
+        return None
+    if candidate["question"] in seen:
+        return None
+    seen.add(candidate["question"])
+    return candidate
+
+def _missing_count(raw_data, candidates, problems):
+    """
+    Return how many questions to regenerate: the invalid ones plus those that did not parse.
+
+    Args:
+        raw_data (str): The model's full response.
+        candidates (list): Every question candidate parsed from it.
+        problems (list[str]): Problems recorded by `_accept`, one per invalid candidate.
+    """
+    parsed = sum(1 for candidate in candidates if isinstance(candidate, dict) and "question" in candidate)
+    return len(problems) + max(len(QUESTION_KEY.findall(raw_data)) - parsed, 0)
+
+@llm_usage.track("repair_quiz")
+def repair_questions(pdf_content, difficulty, count, exclude_questions, problems=()):
+    """
+    Generate replacements for missing or invalid questions in one small follow-up call.
+
+    Args:
+        pdf_content (str): The course material the quiz is based on.
+        difficulty (str): Selected difficulty level.
+        count (int): Number of questions to generate.
+        exclude_questions (list[str]): Questions already in the quiz.
+        problems (Iterable[str]): Why earlier questions were rejected, passed on to the model.
+
+    Returns:
+        list[dict]: Up to `count` valid question dictionaries (empty on failure).
+    """
+    prompt = quiz_prompt(pdf_content, difficulty, exclude_questions)
+    prompt += f"\n    Generate exactly {count} question{'s' if count != 1 else ''}."
+    if problems:
+        prompt += "\n    Earlier questions were rejected because: " + "; ".join(sorted(set(problems))) + "."
+    try:
+        response = llm_client.chat_completion(
+            model=model_router.route("quiz", llm_client.estimate_tokens(prompt)).model,
+            messages=[{"role": "system", "content": prompt}],
+            max_tokens=QUIZ_REPAIR_TOKENS_PER_QUESTION * count
+        )
+        raw_data = response['choices'][0]['message']['content']
+    except Exception as e:
+        print(f"Error repairing quiz: {e}")
+        return []
+    seen = set(exclude_questions)
+    questions = [q for q in (_accept(c, seen, []) for c in _question_candidates(salvage_objects(raw_data))) if q]
+    return questions[:count]
+
+@llm_usage.track("generate_quiz")
+def generate_quiz(pdf_content, difficulty, exclude_questions=None):
+    """
+    Generate quiz questions and answers in real-time using OpenAI API.
+
+    Args:
+        pdf_content (str): The text content extracted from the lecture PDF.
+        difficulty (str): Selected difficulty level: 'easy', 'medium', or 'hard'.
+        exclude_questions (list[str], optional): Questions already asked, which
+            should not be repeated (used when topping up the quiz bank).
+
+    Returns:
+        tuple: A list of question dictionaries and a dictionary of correct answers.
+
+    Every well-formed question is recovered from a malformed response, and only
+    the missing or invalid ones are regenerated (see `repair_questions`).
+    """
+    try:
+        # Call OpenAI API
+        model, messages = _quiz_request(pdf_content, difficulty, exclude_questions)
+        response = llm_client.chat_completion(model=model, messages=messages)
+        raw_data = response['choices'][0]['message']['content']
+
+        # Keep the valid questions, then regenerate the rest
+        seen, problems = set(exclude_questions or []), []
+        candidates = list(_question_candidates(salvage_objects(raw_data)))
+        quiz_questions = [q for q in (_accept(c, seen, problems) for c in candidates) if q]
+        missing = _missing_count(raw_data, candidates, problems)
+        if missing:
+            quiz_questions += repair_questions(pdf_content, difficulty, missing,
+                                               list(seen), problems)
+        if not quiz_questions:
+            raise ValueError("No valid questions found in the response.")
+        correct_answers = {idx: q["answer"] for idx, q in enumerate(quiz_questions)}
+        return quiz_questions, correct_answers
+
+    except Exception as e:
+        print(f"Error generating quiz: {e}")
+        return [], {}
+
+def _completion_text(chunks, parts):
+    """Yield the text pieces of a streamed chat completion, also appending them to `parts`."""
+    for chunk in chunks:
+        if chunk["choices"]:
+            content = chunk["choices"][0].get("delta", {}).get("content")
+            if content:
+                parts.append(content)
+                yield content
+
+@llm_usage.track("generate_quiz")
+def generate_quiz_stream(pdf_content, difficulty, exclude_questions=None):
+    """
+    Generate quiz questions, yielding each one as soon as the model has finished writing it.
+
+    Takes the same arguments as `generate_quiz`. Once the stream ends, questions
+    the incremental parser missed are salvaged from the full text, and missing
+    or invalid ones are regenerated. Generation errors are printed and end the
+    stream early, after the questions already yielded.
+
+    Yields:
+        dict: A question dictionary (with its correct answer under "answer").
+    """
+    chunks = None
+    parts, candidates, streamed, problems = [], [], set(), []
+    seen = set(exclude_questions or [])
+    try:
+        model, messages = _quiz_request(pdf_content, difficulty, exclude_questions)
+        chunks = llm_client.chat_completion_stream(model=model, messages=messages)
+        for candidate in _question_candidates(iter_array_items(_completion_text(chunks, parts))):
+            # Remember the candidate as parsed, before _accept normalizes it
+            streamed.add(json.dumps(candidate, sort_keys=True))
+            candidates.append(candidate)
+            question = _accept(candidate, seen, problems)
+            if question:
+                yield question
+
+        raw_data = "".join(parts)
+        for candidate in _question_candidates(salvage_objects(raw_data)):
+            if json.dumps(candidate, sort_keys=True) not in streamed:
+                candidates.append(candidate)
+                question = _accept(candidate, seen, problems)
+                if question:
+                    yield question
+        missing = _missing_count(raw_data, candidates, problems)
+        if missing:
+            yield from repair_questions(pdf_content, difficulty, missing,
+                                        list(seen), problems)
+    except Exception as e:
+        print(f"Error generating quiz: {e}")
+    finally:
+        if chunks is not None:
+            chunks.close()
+
+def evaluate_quiz(submitted_answers, correct_answers):
+    """
+    Evaluate submitted quiz answers.
+
+    Args:
+        submitted_answers (dict): Answers submitted by the student.
+        correct_answers (dict): The correct answers for the quiz.
+
+    Returns:
+        tuple: Score, total questions, and detailed feedback.
+    """
+    score = 0
+    total = len(correct_answers)
+    feedback = {}
+
+    for idx, correct in correct_answers.items():
+        submitted = submitted_answers.get(idx, None)
+        if isinstance(correct, list):
+            # For MCQ (multiple answers), compare sets
+            if set(submitted) == set(correct):
+                score += 1
+                feedback[idx] = "Correct"
+            else:
+                feedback[idx] = f"Incorrect. Correct answers: {', '.join(correct)}"
+        else:
+            # For MCQ (single answer) and True/False
+            if submitted == correct:
+                score += 1
+                feedback[idx] = "Correct"
+            else:
+                feedback[idx] = f"Incorrect. Correct answer: {correct}"
+
+    return score, total, feedback
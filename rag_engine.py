@@ -0,0 +1,164 @@
+"""
+Retrieval engine for lecture material.
+
+Lecture text is split into ~500-word chunks, each chunk is embedded once and
+stored in the memory-mapped vector store, and queries are answered with the
+top-k chunks by cosine similarity so prompts only carry the relevant part of a
+lecture.
+
+Documents that are not lectures of the course, such as PDFs uploaded to the
+chatbot, are scored in memory by `retrieve_document` and never enter the store.
+"""
+import numpy as np
+import embeddings
+import llm_usage
+import vector_store
+from db import get_lecture
+from pdf_extractor import extract_pages_from_pdf
+
+CHUNK_SIZE = 500  # Words per chunk
+TOP_K = 4  # Chunks returned per query
+
+
+def chunk_pages(pages, chunk_size=CHUNK_SIZE):
+    """
+    Split page texts into chunks of about `chunk_size` words.
+
+    Args:
+        pages (list[str]): Text of each page, in order.
+        chunk_size (int): Number of words per chunk.
+
+    Returns:
+        list[dict]: Chunks as {"text": str, "page": int}, where page is the
+        1-based page the chunk starts on.
+    """
+    chunks = []
+    words = []
+    start_page = None
+    for page_number, page_text in enumerate(pages, start=1):
+        for word in page_text.split():
+            if not words:
+                start_page = page_number
+            words.append(word)
+            if len(words) >= chunk_size:
+                chunks.append({"text": " ".join(words), "page": start_page})
+                words = []
+    if words:
+        chunks.append({"text": " ".join(words), "page": start_page})
+    return chunks
+
+
+def chunk_text(text, chunk_size=CHUNK_SIZE):
+    """Split plain text into chunks of about `chunk_size` words."""
+    return [chunk["text"] for chunk in chunk_pages([text], chunk_size)]
+
+
+def get_embeddings(texts):
+    """Embed a list of texts with the configured embedding backend."""
+    return embeddings.embed_texts(texts)
+
+
+@llm_usage.track("ingest_pages")
+def ingest_pages(key, pages, chunk_size=CHUNK_SIZE):
+    """
+    Chunk and embed a document and add it to the vector store under `key`.
+
+    Documents already in the store are skipped, so re-ingesting costs no API calls.
+    """
+    model = embeddings.get_backend().name
+    vector_store.check_model(model)
+    if vector_store.has_lecture(key):
+        return
+    chunks = chunk_pages(pages, chunk_size)
+    if chunks:
+        vector_store.add(key, chunks, get_embeddings([chunk["text"] for chunk in chunks]), model)
+
+
+def ingest_lecture(lecture_id):
+    """Chunk and embed an uploaded lecture PDF."""
+    lecture = get_lecture(lecture_id)
+    if lecture is None:
+        raise ValueError(f"Lecture {lecture_id} not found.")
+    ingest_pages(lecture_id, extract_pages_from_pdf(lecture[3]))
+
+
+def remove_lecture(lecture_id):
+    """Remove a deleted lecture from retrieval."""
+    vector_store.delete_lecture(lecture_id)
+
+
+@llm_usage.track("retrieve")
+def retrieve(lecture_id, query, top_k=TOP_K, nprobe=None):
+    """
+    Find the lecture chunks most similar to a query.
+
+    Args:
+        lecture_id: ID of the lecture (or key passed to `ingest_pages`), or None
+            to search every lecture of the course.
+        query (str): Text to match against the lecture chunks.
+        top_k (int): Maximum number of chunks to return.
+        nprobe (int, optional): ANN lists probed for course-wide searches.
+
+    Returns:
+        list[dict]: Chunks as {"lecture_id": str, "chunk": int, "page": int,
+        "text": str, "score": float}, best match first.
+    """
+    vector_store.check_model(embeddings.get_backend().name)
+    lecture_ids = None
+    if lecture_id is not None:
+        if not vector_store.has_lecture(lecture_id):
+            ingest_lecture(lecture_id)
+        lecture_ids = [lecture_id]
+    query_embedding = get_embeddings([query])[0]
+    return vector_store.search(query_embedding, top_k, lecture_ids=lecture_ids, nprobe=nprobe)
+
+
+def retrieve_document(pages, query, top_k=TOP_K, chunk_size=CHUNK_SIZE):
+    """
+    Find the chunks of a document most similar to a query without storing the document.
+
+    The chunk embeddings come from the embedding cache after the first query, so
+    asking again costs no API calls.
+
+    Args:
+        pages (list[str]): Text of each page, in order.
+        query (str): Text to match against the chunks.
+        top_k (int): Maximum number of chunks to return.
+        chunk_size (int): Number of words per chunk.
+
+    Returns:
+        list[dict]: Chunks as {"chunk": int, "page": int, "text": str, "score": float},
+        best match first.
+    """
+    chunks = chunk_pages(pages, chunk_size)
+    if not chunks:
+        return []
+    vectors = get_embeddings([chunk["text"] for chunk in chunks] + [query])
+    scores = vector_store.cosine_scores(vectors[:-1], vectors[-1])
+    best = np.argsort(-scores)[:top_k]
+    return [{"chunk": int(i), "page": chunks[i]["page"], "text": chunks[i]["text"], "score": float(scores[i])}
+            for i in best]
+
+
+def _format_context(results):
+    return "\n\n".join(f"[Page {result['page']}]\n{result['text']}" for result in results) or None
+
+
+def build_context(lecture_id, query, top_k=TOP_K):
+    """Return the retrieved chunks as a prompt-ready block of text, or None if retrieval fails."""
+    try:
+        results = retrieve(lecture_id, query, top_k)
+    except Exception as e:
+        print(f"Error retrieving lecture context: {e}")
+        return None
+    return _format_context(results)
+
+
+def build_document_context(pages, query, top_k=TOP_K):
+    """Like `build_context`, for a document scored in memory with `retrieve_document`."""
+    try:
+        results = retrieve_document(pages, query, top_k)
+    except Exception as e:
+        print(f"Error retrieving document context: {e}")
+        return None
+    return _format_context(results)
@@ -1,41 +1,179 @@
-import openai
-from sklearn.metrics.pairwise import cosine_similarity
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+import numpy as np
+import spacy
+import llm_client
+import llm_usage
+import model_router
+from embeddings import embed_texts
+from rag_engine import chunk_text
+from vector_store import cosine_scores
 
-def get_embedding(text, model="text-embedding-ada-002"):
-    response = openai.Embedding.create(input=text, model=model)
-    return response["data"][0]["embedding"]
+SIMILARITY_TOP_K = 3  # Best-matching chunks averaged into the headline similarity score
+SIMILARITY_CACHE_MAX_ENTRIES = 32  # Course materials whose chunk embeddings are kept in memory
+MATCH_SNIPPET_CHARS = 200
 
-def calculate_semantic_similarity(course_material, generated_content):
-    """Calculate semantic similarity between course material and generated content."""
+# Content hash -> (chunk texts, chunk embedding matrix), least recently used first
+_chunk_cache = OrderedDict()
+_chunk_cache_lock = threading.Lock()
+
+def get_embedding(text):
+    """Embed a single text with the configured embedding backend."""
+    return embed_texts([text])[0]
+
+def get_chunk_embeddings(course_material):
+    """
+    Return the chunks of the course material and their embeddings, computed once per content.
+
+    Chunks stay within the embedding model's input limit whatever the length of
+    the material. Embeddings are also kept in the persistent embedding cache,
+    so other processes only pay for a lookup.
+
+    Returns:
+        tuple: (list of chunk texts, 2-D array with one embedding per chunk).
+    """
+    key = hashlib.sha256(course_material.encode("utf-8")).hexdigest()
+    with _chunk_cache_lock:
+        if key in _chunk_cache:
+            _chunk_cache.move_to_end(key)
+            return _chunk_cache[key]
+
+    chunks = chunk_text(course_material)
+    entry = (chunks, np.asarray(embed_texts(chunks), dtype=np.float32))
+    with _chunk_cache_lock:
+        _chunk_cache[key] = entry
+        while len(_chunk_cache) > SIMILARITY_CACHE_MAX_ENTRIES:
+            _chunk_cache.popitem(last=False)
+    return entry
+
+@llm_usage.track("calculate_semantic_similarity")
+def semantic_similarity_scores(course_material, generated_content, top_k=SIMILARITY_TOP_K):
+    """
+    Compare generated content with each chunk of the course material.
+
+    Only the generated content needs a fresh embedding; the chunk embeddings
+    come from `get_chunk_embeddings`.
+
+    Args:
+        course_material (str): The lecture text.
+        generated_content (str): The generated text to check.
+        top_k (int): Number of best-matching chunks averaged into "top_k_mean" and listed in "matches".
+
+    Returns:
+        dict: "max", "mean" and "top_k_mean" cosine similarity over the chunks, and
+        "matches" ([{"chunk": int, "score": float, "text": str}], best first), or
+        None if the similarity could not be calculated.
+    """
     try:
-        course_embedding = get_embedding(course_material)
-        generated_embedding = get_embedding(generated_content)
-        similarity = cosine_similarity([course_embedding], [generated_embedding])[0][0]
-        return round(similarity, 3)
+        chunks, chunk_embeddings = get_chunk_embeddings(course_material)
+        if not chunks:
+            return None
+        scores = cosine_scores(chunk_embeddings, get_embedding(generated_content))
+        best = np.argsort(-scores)[:top_k]
+        return {
+            "max": round(float(scores[best[0]]), 3),
+            "mean": round(float(scores.mean()), 3),
+            "top_k_mean": round(float(scores[best].mean()), 3),
+            "matches": [{"chunk": int(idx), "score": round(float(scores[idx]), 3),
+                         "text": chunks[idx][:MATCH_SNIPPET_CHARS]} for idx in best],
+        }
     except Exception as e:
         print(f"Error calculating semantic similarity: {e}")
         return None
 
-import spacy
+def calculate_semantic_similarity(course_material, generated_content):
+    """Calculate semantic similarity between course material and generated content (the top-k chunk mean)."""
+    scores = semantic_similarity_scores(course_material, generated_content)
+    return scores["top_k_mean"] if scores else None
+
+SPACY_MODEL = os.getenv("SPACY_MODEL", "en_core_web_sm")
+# Keyword extraction only needs the tokenizer and lexical attributes (is_alpha, is_stop)
+SPACY_EXCLUDE = ["tok2vec", "tagger", "morphologizer", "parser", "senter", "attribute_ruler", "lemmatizer", "ner"]
+SPACY_PIECE_CHARS = 50000   # Large texts are split into pieces of about this size...
+SPACY_BATCH_SIZE = 16       # ...which nlp.pipe processes in batches
+KEYWORD_CACHE_MAX_ENTRIES = 128
 
-nlp = spacy.load("en_core_web_sm")
+_nlp = None
+_nlp_lock = threading.Lock()
 
-def extract_keywords(text):
-    """Extract keywords from a given text using spaCy."""
-    doc = nlp(text)
-    return {token.text.lower() for token in doc if token.is_alpha and not token.is_stop}
+# Content hash -> keyword set, least recently used first
+_keyword_cache = OrderedDict()
+_keyword_cache_lock = threading.Lock()
+
+def get_nlp():
+    """Load the trimmed spaCy pipeline on first use (once per process)."""
+    global _nlp
+    with _nlp_lock:
+        if _nlp is None:
+            try:
+                _nlp = spacy.load(SPACY_MODEL, exclude=SPACY_EXCLUDE)
+            except OSError:
+                # The tokenizer and stop words come with the language, so a blank pipeline gives the same keywords
+                print(f"spaCy model {SPACY_MODEL} is not installed; using a blank English pipeline.")
+                _nlp = spacy.blank("en")
+    return _nlp
+
+def _split_text(text, size=None):
+    """Split text into pieces of about `size` characters (SPACY_PIECE_CHARS by default), breaking only at whitespace."""
+    size = size or SPACY_PIECE_CHARS
+    pieces = []
+    start = 0
+    while len(text) - start > size:
+        end = text.rfind(" ", start, start + size)
+        if end <= start:
+            end = start + size
+        pieces.append(text[start:end])
+        start = end
+    pieces.append(text[start:])
+    return pieces
+
+def extract_keywords(text, use_cache=True):
+    """
+    Extract keywords from a given text using spaCy.
+
+    Args:
+        text (str): The text to extract keywords from.
+        use_cache (bool): Cache the keywords by content hash. Use this for lecture
+            material, which is checked again and again, and not for one-off text.
+
+    Returns:
+        frozenset: Lower-cased alphabetic tokens that are not stop words.
+    """
+    key = hashlib.sha256(text.encode("utf-8")).hexdigest() if use_cache else None
+    if key is not None:
+        with _keyword_cache_lock:
+            if key in _keyword_cache:
+                _keyword_cache.move_to_end(key)
+                return _keyword_cache[key]
+
+    keywords = frozenset(
+        token.text.lower()
+        for doc in get_nlp().pipe(_split_text(text), batch_size=SPACY_BATCH_SIZE)
+        for token in doc if token.is_alpha and not token.is_stop
+    )
+    if key is not None:
+        with _keyword_cache_lock:
+            _keyword_cache[key] = keywords
+            while len(_keyword_cache) > KEYWORD_CACHE_MAX_ENTRIES:
+                _keyword_cache.popitem(last=False)
+    return keywords
 
 def calculate_keyword_overlap(course_material, generated_content):
     """Calculate the percentage overlap of keywords between course material and generated content."""
     try:
         course_keywords = extract_keywords(course_material)
-        generated_keywords = extract_keywords(generated_content)
+        generated_keywords = extract_keywords(generated_content, use_cache=False)
         overlap = course_keywords.intersection(generated_keywords)
         return round(len(overlap) / len(course_keywords), 3) if course_keywords else 0.0
     except Exception as e:
         print(f"Error calculating keyword overlap: {e}")
         return None
 
+@llm_usage.track("calculate_feedback_score")
 def calculate_feedback_score(course_material, generated_content):
     """Get relevance feedback from the LLM."""
     feedback_prompt = f"""
@@ -49,8 +187,8 @@ def calculate_feedback_score(course_material, generated_content):
     {generated_content}
     """
     try:
-        response = openai.ChatCompletion.create(
-            model="gpt-4o-mini",
+        response = llm_client.chat_completion(
+            model=model_router.route("feedback", llm_client.estimate_tokens(feedback_prompt)).model,
             messages=[
                 {"role": "system", "content": "You are an evaluator who provides feedback on content relevance."},
                 {"role": "user", "content": feedback_prompt}
@@ -63,3 +201,67 @@ def calculate_feedback_score(course_material, generated_content):
     except Exception as e:
         print(f"Error in feedback loop: {e}")
         return None, "Failed to get feedback."
+
+# Seconds each metric may take before check_relevance gives up on it
+RELEVANCE_TIMEOUTS = {"semantic_similarity": 30, "keyword_overlap": 30, "feedback": 60}
+
+# Shared pool so a metric that times out keeps running without blocking the caller
+_executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix="relevance")
+
+def check_relevance(course_material, generated_content, timeouts=None):
+    """
+    Run the three relevance metrics concurrently.
+
+    Wall-clock time is that of the slowest metric (bounded by its timeout)
+    instead of the sum of all three. A metric that fails or times out is
+    reported as None and listed in "errors"; the others are still returned.
+
+    Args:
+        course_material (str): The lecture text.
+        generated_content (str): The generated text to check.
+        timeouts (dict, optional): Per-metric timeouts in seconds, overriding RELEVANCE_TIMEOUTS.
+
+    Returns:
+        dict: "semantic_similarity", "semantic_scores" (the details from
+        `semantic_similarity_scores`), "keyword_overlap", "feedback_score",
+        "feedback_details" and "errors" ({metric: message}).
+    """
+    timeouts = {**RELEVANCE_TIMEOUTS, **(timeouts or {})}
+    started = time.monotonic()
+    futures = {
+        "semantic_similarity": llm_usage.submit_in_context(_executor, semantic_similarity_scores, course_material,
+                                                            generated_content),
+        "keyword_overlap": llm_usage.submit_in_context(_executor, calculate_keyword_overlap, course_material,
+                                                        generated_content),
+        "feedback": llm_usage.submit_in_context(_executor, calculate_feedback_score, course_material, generated_content),
+    }
+
+    results = {}
+    errors = {}
+    for metric, future in futures.items():
+        remaining = max(0.0, timeouts[metric] - (time.monotonic() - started))
+        try:
+            results[metric] = future.result(timeout=remaining)
+        except TimeoutError:
+            errors[metric] = f"Timed out after {timeouts[metric]} seconds."
+            results[metric] = None
+        except Exception as e:
+            errors[metric] = str(e)
+            results[metric] = None
+
+    semantic_scores = results["semantic_similarity"]
+    results["semantic_similarity"] = semantic_scores["top_k_mean"] if semantic_scores else None
+    feedback_score, feedback_details = results["feedback"] or (None, None)
+    for metric in ("semantic_similarity", "keyword_overlap"):
+        if results[metric] is None and metric not in errors:
+            errors[metric] = "Metric could not be calculated."
+    if feedback_score is None and "feedback" not in errors:
+        errors["feedback"] = feedback_details or "Metric could not be calculated."
+    return {
+        "semantic_similarity": results["semantic_similarity"],
+        "semantic_scores": semantic_scores,
+        "keyword_overlap": results["keyword_overlap"],
+        "feedback_score": feedback_score,
+        "feedback_details": feedback_details,
+        "errors": errors,
+    }
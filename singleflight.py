@@ -0,0 +1,126 @@
+"""
+Single-flight coalescing of identical in-flight requests.
+
+When many callers ask for the same result at once (e.g. a class opening the
+same lecture summary), only one of them - the leader - does the work; the
+others wait and share its result. Within a process, callers wait on the
+leader's event. Across server processes, leaders take a row in the
+`inflight_locks` SQLite table and the other processes poll a `check` function
+(typically a cache lookup) until the result appears or the lock is released.
+"""
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from db import acquire_inflight_lock, release_inflight_lock
+
+SINGLEFLIGHT_TIMEOUT = float(os.getenv("SINGLEFLIGHT_TIMEOUT", "180"))  # Seconds a caller waits for a leader
+SINGLEFLIGHT_LOCK_TTL = float(os.getenv("SINGLEFLIGHT_LOCK_TTL", "180"))  # Seconds before a crashed leader's lock is ignored
+POLL_INTERVAL = 0.25
+
+# Flights led by this process, keyed by request key
+_flights = {}
+_lock = threading.Lock()
+
+
+class Flight:
+    """An in-flight request led by this process."""
+
+    def __init__(self, key):
+        self.key = key
+        self.owner = uuid.uuid4().hex
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.holds_lock = False
+
+
+def _acquire_process_lock(flight):
+    now = time.time()
+    try:
+        return acquire_inflight_lock(flight.key, flight.owner, now, now + SINGLEFLIGHT_LOCK_TTL)
+    except sqlite3.Error as e:
+        # Without the lock table, coalesce within this process only
+        print(f"Single-flight lock table unavailable: {e}")
+        return True
+
+
+def begin(key, check, timeout=SINGLEFLIGHT_TIMEOUT):
+    """
+    Join the flight for `key`.
+
+    Args:
+        key (str): Identifies identical requests.
+        check (callable): Returns the finished result (e.g. from a cache) or None.
+        timeout (float): Seconds to wait for another caller's result.
+
+    Returns:
+        tuple: (flight, None) if the caller must do the work and then call
+        `finish(flight, ...)`, or (None, result) if another caller produced it.
+    """
+    deadline = time.monotonic() + timeout
+    while True:
+        with _lock:
+            flight = _flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = Flight(key)
+                _flights[key] = flight
+
+        if not leader:
+            if not flight.done.wait(max(0.0, deadline - time.monotonic())):
+                raise TimeoutError("Timed out waiting for an identical in-flight request.")
+            if flight.error is not None:
+                raise flight.error
+            if flight.result is not None:
+                return None, flight.result
+            continue  # The leader gave up without a result; try again
+
+        # Leader in this process: make sure no other process is already working on it
+        while not _acquire_process_lock(flight):
+            result = check()
+            if result is not None:
+                finish(flight, result)
+                return None, result
+            if time.monotonic() > deadline:
+                return flight, None  # Stop waiting on a stuck process and do the work
+            time.sleep(POLL_INTERVAL)
+        flight.holds_lock = True
+
+        # Another process may have finished between our cache miss and taking the lock
+        result = check()
+        if result is not None:
+            finish(flight, result)
+            return None, result
+        return flight, None
+
+
+def finish(flight, result=None, error=None):
+    """Publish a leader's result (or error) to its waiters and release its locks."""
+    if flight.holds_lock:
+        try:
+            release_inflight_lock(flight.key, flight.owner)
+        except sqlite3.Error as e:
+            print(f"Single-flight lock table unavailable: {e}")
+        flight.holds_lock = False
+    with _lock:
+        if _flights.get(flight.key) is flight:
+            del _flights[flight.key]
+    flight.result = result
+    flight.error = error
+    flight.done.set()
+
+
+def do(key, fn, check, timeout=SINGLEFLIGHT_TIMEOUT):
+    """Return fn(), sharing one call among concurrent callers with the same key."""
+    flight, result = begin(key, check, timeout)
+    if flight is None:
+        return result
+    try:
+        result = fn()
+    except Exception as e:
+        finish(flight, error=e)
+        raise
+    finish(flight, result)
+    return result
@@ -3,11 +3,12 @@ Test Runner for APUOPE-RE Application
 Evaluates the application using a 90-test benchmark dataset.
 
 Usage:
-    python test_runner.py [--limit N] [--start-from N]
+    python test_runner.py [--limit N] [--start-from N] [--budget quality|balanced|economy]
     
 Options:
     --limit N: Run only first N tests (for testing)
     --start-from N: Start from test N (for resuming)
+    --budget B: Model routing budget; each result records the models it was routed to
 """
 
 import json
@@ -17,7 +18,9 @@ import sys
 import re
 from datetime import datetime
 from typing import Dict, List, Any, Tuple
-import openai
+import llm_client
+import llm_usage
+import model_router
 from dotenv import load_dotenv
 
 # Fix Windows console encoding for emoji characters
@@ -32,13 +35,12 @@ load_dotenv()
 from components.conceptual_examples import generate_content
 from quiz_handler import generate_quiz
 
-# Set up OpenAI API key
+# Check the OpenAI API key (llm_client loads it)
 api_key = os.getenv("OPENAI_API_KEY")
 if not api_key:
     print("❌ ERROR: OPENAI_API_KEY not set!")
     print("   Please set it in your .env file or environment variable")
     sys.exit(1)
-openai.api_key = api_key
 
 # Configuration
 TEST_DATASET_FILE = "test_dataset_re_90.json"
@@ -51,6 +53,7 @@ stats = {
     "succeeded": 0,
     "failed": 0,
     "by_task_type": {},
+    "by_model": {},
     "total_latency": 0.0,
     "start_time": None,
     "end_time": None
@@ -99,7 +102,8 @@ def save_results_incremental(results: List[Dict]):
 def run_summarization_test(slide_content: str, instruction: str) -> str:
     """Run a summarization test."""
     prompt = f"{instruction}\n\nContent to summarize:\n{slide_content}"
-    return generate_content(prompt)
+    # Bypass the LLM cache: a cached answer would report no latency and no cost
+    return generate_content(prompt, use_cache=False, task="summary")
 
 
 def run_quiz_generation_test(slide_content: str, constraints: Dict) -> Any:
@@ -123,13 +127,14 @@ def run_quiz_generation_test(slide_content: str, constraints: Dict) -> Any:
 def run_qa_test(slide_content: str, instruction: str) -> str:
     """Run a Q&A test (conceptual or application)."""
     prompt = f"{instruction}\n\nContext/Course Material:\n{slide_content}"
-    return generate_content(prompt)
+    return generate_content(prompt, use_cache=False, task="custom")
 
 
 # REMOVED: Grading test handler no longer needed (grading tests removed from dataset)
 # def run_grading_test(...): ...
 
 
+@llm_usage.track("evaluate_with_llm_judge")
 def evaluate_with_llm_judge(generated_output: Any, reference_answer: str, task_type: str, instruction: str) -> Dict:
     """
     Use GPT-4 as a judge to evaluate the generated output.
@@ -167,7 +172,7 @@ OVERALL: [average of above 4]
 REASONING: [2-3 sentences explaining the scores]"""
 
     try:
-        response = openai.ChatCompletion.create(
+        response = llm_client.chat_completion(
             model="gpt-4o",  # Consistent model for evaluation
             messages=[
                 {"role": "system", "content": "You are an expert educational content evaluator. Provide objective, consistent scores."},
@@ -252,40 +257,41 @@ def calculate_automated_metrics(generated_output: Any, reference_answer: str, ta
     return metrics
 
 
-def execute_test(slide_content: str, test_case: Dict) -> Tuple[Any, float, str]:
+def execute_test(slide_content: str, test_case: Dict) -> Tuple[Any, float, str, List[Dict]]:
     """
     Execute a single test case.
     
     Supported task types: summarization, quiz_generation, qa_conceptual, qa_application
     
     Returns:
-        Tuple of (output, latency_seconds, error_message)
+        Tuple of (output, latency_seconds, error_message, routing_decisions)
     """
     task_type = test_case['task_type']
     start_time = time.time()
     error = None
     output = None
     
-    try:
-        if task_type == 'summarization':
-            output = run_summarization_test(slide_content, test_case['instruction'])
+    with model_router.capture() as decisions:
+        try:
+            if task_type == 'summarization':
+                output = run_summarization_test(slide_content, test_case['instruction'])
             
-        elif task_type == 'quiz_generation':
-            output = run_quiz_generation_test(slide_content, test_case.get('constraints', {}))
+            elif task_type == 'quiz_generation':
+                output = run_quiz_generation_test(slide_content, test_case.get('constraints', {}))
             
-        elif task_type in ['qa_conceptual', 'qa_application']:
-            output = run_qa_test(slide_content, test_case['instruction'])
+            elif task_type in ['qa_conceptual', 'qa_application']:
+                output = run_qa_test(slide_content, test_case['instruction'])
             
-        else:
-            raise ValueError(f"Unknown task type: {task_type}")
+            else:
+                raise ValueError(f"Unknown task type: {task_type}")
             
-    except Exception as e:
-        error = str(e)
-        output = None
+        except Exception as e:
+            error = str(e)
+            output = None
     
     latency = time.time() - start_time
     
-    return output, latency, error
+    return output, latency, error, [decision._asdict() for decision in decisions]
 
 
 def format_reference_answer(reference_answer: Any) -> str:
@@ -362,7 +368,7 @@ def run_all_tests(limit: int = None, start_from: int = 0):
         print(f"   Test ID: {test_id}")
         
         # Execute the test
-        output, latency, error = execute_test(slide['content'], test_case)
+        output, latency, error, routing = execute_test(slide['content'], test_case)
         
         # Track statistics
         if task_type not in stats['by_task_type']:
@@ -371,6 +377,12 @@ def run_all_tests(limit: int = None, start_from: int = 0):
         stats['by_task_type'][task_type]['count'] += 1
         stats['total_latency'] += latency
         stats['by_task_type'][task_type]['total_latency'] += latency
+
+        # Track statistics per routed model, to compare latency (and later scores) across models
+        for model in sorted({decision['model'] for decision in routing}):
+            model_stats = stats['by_model'].setdefault(model, {'count': 0, 'total_latency': 0.0})
+            model_stats['count'] += 1
+            model_stats['total_latency'] += latency
         
         if error:
             stats['failed'] += 1
@@ -420,7 +432,8 @@ def run_all_tests(limit: int = None, start_from: int = 0):
             "latency_seconds": round(latency, 3),
             "timestamp": datetime.now().isoformat(),
             "llm_evaluation": llm_evaluation,
-            "automated_metrics": automated_metrics
+            "automated_metrics": automated_metrics,
+            "routing": routing
         }
         
         # Add task-specific metadata
@@ -474,6 +487,13 @@ def print_summary_statistics():
         print(f"  Failed:   {failed}/{count}")
         print(f"  Avg Time: {avg_latency:.2f}s")
 
+    if stats['by_model']:
+        print(f"\n🧭 BY ROUTED MODEL (budget: {model_router.MODEL_ROUTER_BUDGET}):")
+        print(f"{'─' * 70}")
+        for model, model_stats in stats['by_model'].items():
+            print(f"  {model}: {model_stats['count']} tests, "
+                  f"avg time {model_stats['total_latency'] / model_stats['count']:.2f}s")
+
 
 def main():
     """Main entry point."""
@@ -484,11 +504,16 @@ def main():
                         help='Limit number of tests to run (for testing)')
     parser.add_argument('--start-from', type=int, default=0,
                         help='Start from test number N (for resuming)')
+    parser.add_argument('--budget', choices=sorted(model_router.BUDGET_SCALES), default=None,
+                        help='Model routing budget (default: MODEL_ROUTER_BUDGET or balanced)')
     
     args = parser.parse_args()
+    if args.budget:
+        model_router.MODEL_ROUTER_BUDGET = args.budget
     
     try:
-        run_all_tests(limit=args.limit, start_from=args.start_from)
+        with llm_usage.tagged(page="test_runner"):
+            run_all_tests(limit=args.limit, start_from=args.start_from)
     except KeyboardInterrupt:
         print("\n\n⚠️  Test run interrupted by user")
         print(f"Partial results saved to: {OUTPUT_FILE}")
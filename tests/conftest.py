@@ -0,0 +1,16 @@
+import pytest
+import db
+
+
+@pytest.fixture(autouse=True)
+def test_db_path(tmp_path, monkeypatch):
+    """
+    Give every test its own empty database, so no test writes to lecture_summaries.db.
+
+    The schema is created on the first connection. Tests that need the file,
+    e.g. to open a second connection, can request this fixture for its path.
+    """
+    path = str(tmp_path / "test_lecture_summaries.db")
+    monkeypatch.setattr(db, "DB_PATH", path)
+    yield path
+    db.close_all_connections()
@@ -0,0 +1,69 @@
+import numpy as np
+import pytest
+import ann_index
+import db
+import vector_store
+
+@pytest.fixture
+def store(tmp_path, mocker):
+    """Use a temporary store that trains its IVF index from 200 rows."""
+    mocker.patch("vector_store.VECTOR_STORE_DIR", str(tmp_path))
+    mocker.patch("ann_index.ANN_MIN_ROWS", 200)
+    mocker.patch.dict(vector_store._matrices, clear=True)
+    mocker.patch.dict(vector_store._centroids, clear=True)
+    return tmp_path
+
+
+def clustered_vectors(n, dim=16, clusters=8, seed=0):
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(clusters, dim))
+    return vector_store.normalize(centers[rng.integers(0, clusters, n)] + 0.1 * rng.normal(size=(n, dim)))
+
+
+def add_lecture(lecture_id, vectors):
+    chunks = [{"text": f"chunk {i}", "page": 1} for i in range(len(vectors))]
+    return vector_store.add(lecture_id, chunks, vectors, "test-model")
+
+
+def test_kmeans_and_probe():
+    """Test that each vector's own list is the first one probed."""
+    vectors = clustered_vectors(500)
+    centroids = ann_index.kmeans(vectors, 8)
+    assert centroids.shape == (8, 16)
+    assert np.allclose(np.linalg.norm(centroids, axis=1), 1.0, atol=1e-5)
+    lists = ann_index.assign(centroids, vectors)
+    for vector, list_id in zip(vectors[:20], lists[:20]):
+        assert ann_index.probe(centroids, vector, nprobe=1)[0] == list_id
+
+
+def test_index_is_trained_and_updated_incrementally(store):
+    """Test training on growth, incremental inserts and deletes."""
+    add_lecture(1, clustered_vectors(150, seed=1))
+    assert not db.get_vector_store("default")[2]
+    add_lecture(2, clustered_vectors(100, seed=2))
+    assert db.get_vector_store("default")[2] == 1
+
+    rows = add_lecture(3, clustered_vectors(10, seed=3))
+    details = db.get_live_vector_rows("default", lecture_ids=[3], list_ids=[])
+    assert details == []  # New rows were assigned to lists rather than left unassigned
+    assert len(db.get_live_vector_rows("default", lecture_ids=[3])) == len(rows)
+
+    vector_store.delete_lecture(3)
+    results = vector_store.search(clustered_vectors(1, seed=3)[0], top_k=5, nprobe=1000)
+    assert all(result["lecture_id"] != "3" for result in results)
+
+
+def test_recall_against_exact_search(store):
+    """Test that probing more lists reaches the exact top-k."""
+    add_lecture(1, clustered_vectors(400, seed=4))
+    queries = clustered_vectors(20, seed=5)
+    for query in queries:
+        exact = [r["row"] for r in vector_store.search(query, top_k=5, lecture_ids=[1])]
+        approx = [r["row"] for r in vector_store.search(query, top_k=5, nprobe=10000)]
+        assert approx == exact
+    recalls = []
+    for query in queries:
+        exact = {r["row"] for r in vector_store.search(query, top_k=5, lecture_ids=[1])}
+        approx = {r["row"] for r in vector_store.search(query, top_k=5, nprobe=16)}
+        recalls.append(len(exact & approx) / 5)
+    assert np.mean(recalls) >= 0.9
@@ -1,24 +1,17 @@
 import sqlite3
 import os
+import threading
+from datetime import datetime
 import pytest
-from db import init_db, save_to_db, get_lectures, delete_from_db, register_user, authenticate_user, submit_feedback, get_all_feedback
+from db import init_db, save_to_db, get_lectures, delete_from_db, register_user, authenticate_user, submit_feedback, get_all_feedback, close_all_connections
+import db
+from db import get_connection, transaction, migrate
 
-# Path for a temporary test database
-TEST_DB_PATH = "test_lecture_summaries.db"
 
-@pytest.fixture
-def setup_database(mocker):
-    """Fixture to set up and tear down the test database."""
-    # Mock DB_PATH to use a test database
-    mocker.patch("db.DB_PATH", TEST_DB_PATH)
-    init_db()  # Initialize the test database
-    yield
-    os.remove(TEST_DB_PATH)  # Clean up after tests
-
-
-def test_init_db(setup_database):
+def test_init_db(test_db_path):
     """Test database initialization."""
-    conn = sqlite3.connect(TEST_DB_PATH)
+    init_db()
+    conn = sqlite3.connect(test_db_path)
     cursor = conn.cursor()
     cursor.execute("SELECT name FROM sqlite_master WHERE type='table'")
     tables = [row[0] for row in cursor.fetchall()]
@@ -27,7 +20,7 @@ def test_init_db(setup_database):
     assert "users" in tables
 
 
-def test_save_to_db(setup_database):
+def test_save_to_db():
     """Test saving a lecture to the database."""
     save_to_db("Test Lecture", "test_path.pdf")
     lectures = get_lectures()
@@ -36,7 +29,7 @@ def test_save_to_db(setup_database):
     assert lectures[0][3] == "test_path.pdf"
 
 
-def test_delete_from_db(setup_database):
+def test_delete_from_db():
     """Test deleting a lecture from the database."""
     save_to_db("Test Lecture", "test_path.pdf")
     lectures = get_lectures()
@@ -45,7 +38,7 @@ def test_delete_from_db(setup_database):
     assert len(lectures_after_delete) == 0
 
 
-def test_register_user(setup_database):
+def test_register_user():
     """Test registering a new user."""
     success = register_user("test@example.com", "password123", "teacher")
     assert success is True
@@ -55,7 +48,7 @@ def test_register_user(setup_database):
     assert duplicate is False
 
 
-def test_authenticate_user(setup_database):
+def test_authenticate_user():
     """Test user authentication."""
     register_user("test@example.com", "password123", "teacher")
     user = authenticate_user("test@example.com", "password123")
@@ -66,7 +59,7 @@ def test_authenticate_user(setup_database):
     invalid_user = authenticate_user("test@example.com", "wrongpassword")
     assert invalid_user is None
 
-def test_feedback_submission(setup_database):
+def test_feedback_submission():
     """Test submitting anonymous feedback."""
     feedback_text = "This is a test feedback."
     submit_feedback(feedback_text)
@@ -75,7 +68,198 @@ def test_feedback_submission(setup_database):
     assert feedback_data[0][0] == feedback_text
 
 
-def test_get_all_feedback_empty(setup_database):
+def test_get_all_feedback_empty():
     """Test retrieving feedback when the table is empty."""
     feedback_data = get_all_feedback()
     assert len(feedback_data) == 0
+
+
+def test_connection_reused_per_thread():
+    """Test that a thread reuses its connection and other threads get their own."""
+    conn = get_connection()
+    assert get_connection() is conn
+    assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+    assert conn.execute("PRAGMA synchronous").fetchone()[0] == 1  # NORMAL
+    others = []
+    thread = threading.Thread(target=lambda: others.append(get_connection()))
+    thread.start()
+    thread.join()
+    assert others[0] is not conn
+
+
+def test_recreated_database_gets_new_connection(test_db_path):
+    """Test that deleting and recreating the database file does not reuse the old connection."""
+    save_to_db("Test Lecture", "test_path.pdf")
+    conn = get_connection()
+    close_all_connections()
+    os.remove(test_db_path)
+    init_db()
+    assert get_connection() is not conn
+    assert get_lectures() == []
+
+
+def test_transaction_rolls_back_on_error():
+    with pytest.raises(RuntimeError):
+        with transaction() as conn:
+            conn.execute("INSERT INTO lectures (title) VALUES ('Partial')")
+            raise RuntimeError("failed halfway")
+    assert get_lectures() == []
+
+
+def test_readers_not_blocked_by_writer(test_db_path):
+    """Test that another connection can read while a write transaction is open."""
+    save_to_db("Committed", "a.pdf")
+    with transaction(immediate=True) as conn:
+        conn.execute("INSERT INTO lectures (title) VALUES ('Uncommitted')")
+        reader = sqlite3.connect(test_db_path, timeout=0)
+        titles = [row[0] for row in reader.execute("SELECT title FROM lectures")]
+        reader.close()
+    assert titles == ["Committed"]
+
+
+def test_migrations_recorded_once():
+    """Test that each migration is applied once and recorded in schema_version."""
+    assert migrate() == len(db.MIGRATIONS)
+    versions = get_connection().execute("SELECT version FROM schema_version").fetchall()
+    assert versions == [(version,) for version, _, _ in db.MIGRATIONS]
+
+
+def test_schema_created_on_first_connection():
+    """Test that a new database gets its schema without any init call."""
+    assert get_lectures() == []
+    assert get_all_feedback() == []
+
+
+def test_pending_migration_applied(mocker):
+    """Test that a new migration is applied to an existing database, and a failing one changes nothing."""
+    def add_notes(cursor):
+        cursor.execute("CREATE TABLE notes (id INTEGER PRIMARY KEY)")
+
+    def broken(cursor):
+        cursor.execute("CREATE TABLE broken (id INTEGER PRIMARY KEY)")
+        cursor.execute("SELECT * FROM missing_table")
+
+    version = len(db.MIGRATIONS)
+    mocker.patch("db.MIGRATIONS", db.MIGRATIONS + [(version + 1, "Notes", add_notes)])
+    assert migrate() == version + 1
+    assert migrate() == version + 1
+
+    mocker.patch("db.MIGRATIONS", db.MIGRATIONS + [(version + 2, "Broken", broken)])
+    with pytest.raises(sqlite3.OperationalError):
+        migrate()
+    tables = [row[0] for row in get_connection().execute("SELECT name FROM sqlite_master WHERE type = 'table'")]
+    assert "notes" in tables and "broken" not in tables
+
+
+def migrations_before(migration):
+    """Return the migrations that run before `migration`, to set up a database from before an upgrade."""
+    return db.MIGRATIONS[:[function for _, _, function in db.MIGRATIONS].index(migration)]
+
+
+def test_timestamps_backfilled(mocker):
+    """Test that upgrading to integer timestamps fills them from the text ones."""
+    mocker.patch("db.MIGRATIONS", migrations_before(db._add_read_path_indexes))
+    get_connection().execute('''
+        INSERT INTO quiz_results (student_id, lecture_name, difficulty, score, total_questions, submitted_at)
+        VALUES (1, 'Lecture', 'easy', 3, 5, '2024-01-02 03:04:05')
+    ''')
+    get_connection().commit()
+    mocker.stopall()
+    assert migrate() == len(db.MIGRATIONS)
+    submitted_ts = get_connection().execute("SELECT submitted_ts FROM quiz_results").fetchone()[0]
+    assert submitted_ts == int(datetime(2024, 1, 2, 3, 4, 5).timestamp())
+
+
+def test_quiz_results_paginated():
+    """Test that pages follow each other without gaps or repeats, newest first, filtered in SQL."""
+    for i in range(5):
+        db.save_quiz_result(i % 2, f"Lecture {i % 3}", "easy", i, 5)
+    rows, cursor = db.get_quiz_results(limit=2)
+    pages = [rows]
+    while cursor is not None:
+        rows, cursor = db.get_quiz_results(after=cursor, limit=2)
+        pages.append(rows)
+    assert [len(page) for page in pages] == [2, 2, 1]
+    assert [row[3] for page in pages for row in page] == [4, 3, 2, 1, 0]
+
+    rows, cursor = db.get_quiz_results(student_id=0, limit=2)
+    assert [row[3] for row in rows] == [4, 2] and cursor is not None
+    last_page = db.get_quiz_results(student_id=0, after=cursor, limit=2)
+    assert last_page == ([(0, "Lecture 0", "easy", 0, 5, rows[0][5])], None)
+    assert [row[3] for row in db.get_quiz_results(student_id=1, lecture="Lecture 1")[0]] == [1]
+
+
+def test_quiz_results_without_timestamp_are_paged():
+    """Test that rows written without submitted_ts still show up after the first page."""
+    db.save_quiz_result(1, "Lecture", "easy", 1, 5)
+    with transaction() as conn:
+        conn.execute('''
+            INSERT INTO quiz_results (student_id, lecture_name, difficulty, score, total_questions, submitted_at)
+            VALUES (1, 'Lecture', 'easy', 2, 5, '2024-01-02 03:04:05')
+        ''')
+    rows, cursor = db.get_quiz_results(limit=1)
+    assert [row[3] for row in rows] == [1]
+    assert [row[3] for row in db.get_quiz_results(after=cursor, limit=1)[0]] == [2]
+
+
+def test_assignments_paginated():
+    """Test that assignments page by id and that the email filter matches text, not LIKE wildcards."""
+    db.save_generated_assignment("Generated", "Text")
+    db.submit_student_assignment(7, "ann@example.com", "Essay", "ann.pdf")
+    db.submit_student_assignment(8, "bob_smith@example.com", "Essay", "bob.pdf")
+    db.submit_student_assignment(7, "ann@example.com", "Report", "ann2.pdf")
+    rows, cursor = db.get_assignments(limit=3)
+    assert [row[3] for row in rows] == ["Report", "Essay", "Essay"]
+    assert db.get_assignments(after=cursor, limit=3) == ([(1, None, None, "Generated", "Text", None)], None)
+    assert [row[0] for row in db.get_assignments(student_id=7)[0]] == [4, 2]
+    assert [row[2] for row in db.get_assignments(email="ANN@")[0]] == ["ann@example.com"] * 2
+    assert [row[2] for row in db.get_assignments(email="_")[0]] == ["bob_smith@example.com"]
+
+
+def test_search_feedback_ranked_and_in_sync():
+    """Test that search ranks matches, highlights them and follows updates and deletes through the triggers."""
+    submit_feedback("The graph lecture was clear")
+    submit_feedback("Graph quizzes on graph traversal were too hard; more graph examples please")
+    submit_feedback("Loved the sorting demo")
+    results = db.search_feedback("graphs")
+    assert [row[0] for row in results] == [2, 1]
+    assert results[1][1] == "The **graph** lecture was clear"
+    assert db.search_feedback('"quiz -(') == [(2, db.search_feedback("quiz")[0][1], results[0][2])]
+    assert db.search_feedback("?!") == []
+
+    with transaction() as conn:
+        conn.execute("UPDATE feedback SET feedback_text = 'Loved the sorting demo' WHERE id = 1")
+        conn.execute("DELETE FROM feedback WHERE id = 2")
+    assert db.search_feedback("graph") == []
+    assert [row[0] for row in db.search_feedback("sort")] == [1, 3]
+
+
+def test_search_assignments():
+    db.save_generated_assignment("Shortest paths", "Implement Dijkstra's algorithm on a weighted graph.")
+    db.submit_student_assignment(7, "ann@example.com", "Sorting", "ann.pdf")
+    assert db.search_assignments("dijkstra") == [
+        (1, None, "Shortest paths", "Implement **Dijkstra**'s algorithm on a weighted graph.")]
+    assert [row[0] for row in db.search_assignments("sort")] == [2]
+
+
+def test_search_indexes_rows_from_before_upgrade(mocker):
+    """Test that upgrading to full-text search indexes the feedback that was already there."""
+    mocker.patch("db.MIGRATIONS", migrations_before(db._add_full_text_search))
+    submit_feedback("Slides were hard to read")
+    close_all_connections()
+    mocker.stopall()
+    assert [row[0] for row in db.search_feedback("slide")] == [1]
+
+
+def test_baseline_database_upgraded(test_db_path):
+    """Test that a database with only the tables from before schema versioning gets every later table."""
+    close_all_connections()
+    conn = sqlite3.connect(test_db_path)
+    db._create_initial_schema(conn.cursor())
+    conn.execute("INSERT INTO lectures (title, upload_date, file_path) VALUES ('Lecture', '2024-01-02', 'a.pdf')")
+    conn.commit()
+    conn.close()
+    assert migrate() == len(db.MIGRATIONS)
+    assert db.get_lecture(1)[1] == "Lecture"
+    db.register_vector_store("course", 3, "model")
+    assert db.get_vector_store("course")[:3] == (3, "model", 0)
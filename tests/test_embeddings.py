@@ -0,0 +1,123 @@
+import numpy as np
+import pytest
+import embeddings
+from embeddings import LocalEmbeddingBackend, OpenAIEmbeddingBackend, get_backend
+
+CORPUS = [
+    "Requirements elicitation uses interviews, workshops and observation of stakeholders.",
+    "The vision and scope document defines the business objectives of the product.",
+    "Requirements validation checks requirements through reviews and inspections.",
+    "Stakeholder analysis ranks stakeholders by their power and interest.",
+]
+
+
+@pytest.fixture
+def backend(tmp_path):
+    """Local backend that has not been fitted."""
+    return LocalEmbeddingBackend(model_path=str(tmp_path / "local_embedding.npz"))
+
+
+def cosine(a, b):
+    return float(np.dot(a, b) / (np.linalg.norm(a) * np.linalg.norm(b)))
+
+
+def test_local_backend_is_deterministic(backend, tmp_path):
+    """Test that the same text always gets the same embedding."""
+    first = backend.embed(["Stakeholder interviews"])[0]
+    other = LocalEmbeddingBackend(model_path=str(tmp_path / "other.npz")).embed(["Stakeholder interviews"])[0]
+    assert len(first) == 256
+    assert first == other
+
+
+def test_local_backend_ranks_related_text_higher(backend):
+    """Test that overlapping texts are more similar than unrelated ones."""
+    query, related, unrelated = backend.embed([
+        "How are stakeholder interviews used for elicitation?",
+        "Elicitation interviews with stakeholders",
+        "The weather is sunny today",
+    ])
+    assert cosine(query, related) > cosine(query, unrelated)
+
+
+def test_fit_switches_to_svd_model(backend):
+    """Test fitting the backend on a corpus and reloading it."""
+    unfitted_name = backend.name
+    backend.fit(CORPUS)
+    assert backend.name != unfitted_name
+    assert backend.name.startswith("local-hash-svd-256-")
+
+    reloaded = LocalEmbeddingBackend(model_path=backend.model_path)
+    assert reloaded.name == backend.name
+    vectors = reloaded.embed(CORPUS + ["completely unseen words"])
+    assert cosine(vectors[0], reloaded.embed(["elicitation interviews"])[0]) > 0.5
+    assert not np.any(vectors[-1])
+
+
+def test_fit_needs_a_corpus(backend):
+    """Test that fitting on too few documents fails clearly."""
+    with pytest.raises(ValueError):
+        backend.fit(["only one document"])
+
+
+def test_backend_selected_by_configuration(mocker):
+    """Test selecting the backend through EMBEDDING_BACKEND."""
+    mocker.patch("embeddings._backend", None)
+    mocker.patch("embeddings.EMBEDDING_BACKEND", "local")
+    assert isinstance(get_backend(), LocalEmbeddingBackend)
+
+    mocker.patch("embeddings._backend", None)
+    mocker.patch("embeddings.EMBEDDING_BACKEND", "openai")
+    assert isinstance(get_backend(), OpenAIEmbeddingBackend)
+
+    mocker.patch("embeddings._backend", None)
+    mocker.patch("embeddings.EMBEDDING_BACKEND", "unknown")
+    with pytest.raises(ValueError):
+        get_backend()
+
+
+class CountingBackend:
+    """Fake provider backend that records every request."""
+
+    name = "counting-model"
+    cacheable = True
+    max_batch_size = 3
+    max_batch_chars = 1000
+
+    def __init__(self):
+        self.requests = []
+
+    def embed(self, texts):
+        self.requests.append(list(texts))
+        return [[float(len(text)), 1.0] for text in texts]
+
+
+@pytest.fixture
+def counting_backend(mocker, tmp_path):
+    """Install a counting backend."""
+    backend = CountingBackend()
+    mocker.patch("embeddings._backend", backend)
+    return backend
+
+
+def test_make_batches():
+    """Test that batches respect both the count and character limits."""
+    assert embeddings.make_batches(["a", "b", "c", "d"], 3, 100) == [["a", "b", "c"], ["d"]]
+    assert embeddings.make_batches(["aaaa", "bbbb", "cc"], 10, 8) == [["aaaa", "bbbb"], ["cc"]]
+
+
+def test_embed_texts_batches_and_dedupes(counting_backend):
+    """Test that duplicate inputs are embedded once and requests are batched."""
+    texts = ["one", "two", "one", "three", "four", "two", "five"]
+    vectors = embeddings.embed_texts(texts)
+    assert [len(request) for request in counting_backend.requests] == [3, 2]
+    assert vectors[0] == vectors[2] == [3.0, 1.0]
+    assert vectors[3] == [5.0, 1.0]
+
+
+def test_embed_texts_uses_persistent_cache(counting_backend):
+    """Test that cached texts are not sent to the provider again."""
+    embeddings.embed_texts(["course material", "answer"])
+    counting_backend.requests.clear()
+    vectors = embeddings.embed_texts(["course material", "new answer"])
+    assert counting_backend.requests == [["new answer"]]
+    assert vectors[0] == [15.0, 1.0]
@@ -0,0 +1,61 @@
+import json
+import pytest
+from json_stream import JsonArrayStream, iter_array_items, salvage_objects
+from quiz_handler import generate_quiz_stream
+
+QUESTIONS = [
+    {"question": "Is [1, 2] a \"list\"?", "type": "true_false", "options": ["True", "False"], "answer": "True"},
+    {"question": "Pick {braces}", "type": "mcq_multiple", "options": ["{", "}", "\\"], "answer": ["{", "}"]},
+]
+
+
+def test_items_complete_one_character_at_a_time():
+    """Test that each element is returned by the piece that completes it, and not before."""
+    text = "Here is your quiz:\n```json\n" + json.dumps(QUESTIONS, indent=2) + "\n```"
+    parser = JsonArrayStream()
+    completed = []
+    for position, char in enumerate(text):
+        for item in parser.feed(char):
+            completed.append((position, item))
+    assert [item for _, item in completed] == QUESTIONS
+    first_end = text.index("}") + 1
+    assert completed[0][0] == first_end - 1
+    assert parser.closed
+
+
+def test_scalars_and_nested_arrays():
+    assert list(iter_array_items(["[1, tr", "ue, \"a,b\", [2, [3]], null", ", {}]"])) == [
+        1, True, "a,b", [2, [3]], None, {}]
+
+
+def test_malformed_element_is_skipped():
+    """Test that an invalid element does not stop the elements after it."""
+    assert list(iter_array_items(['[{"a": 1}, {"b": oops}, {"c": 3}]'])) == [{"a": 1}, {"c": 3}]
+
+
+def test_truncated_stream_keeps_complete_items():
+    assert list(iter_array_items(['[{"a": 1}, {"b": '])) == [{"a": 1}]
+
+
+def test_salvage_objects():
+    """Test that well-formed objects survive a broken element, trailing commas and a truncated tail."""
+    text = 'Quiz:\n[{"a": "x}"}, {"b": oops}, {"c": [1, 2,],}, {"d": 4}, {"e": "trunc'
+    assert salvage_objects(text) == [{"a": "x}"}, {"c": [1, 2]}, {"d": 4}]
+
+
+def test_generate_quiz_stream_yields_before_completion_ends(mocker):
+    """Test that the first question is yielded before the rest of the completion is read."""
+    text = json.dumps(QUESTIONS)
+    split = text.index("},") + 1
+    read = []
+
+    def chunks():
+        for piece in (text[:split], text[split:]):
+            read.append(piece)
+            yield {"choices": [{"delta": {"content": piece}}]}
+
+    mocker.patch("llm_client.chat_completion_stream", return_value=chunks())
+    questions = generate_quiz_stream("Lecture text", "easy")
+    assert next(questions) == QUESTIONS[0]
+    assert len(read) == 1
+    assert list(questions) == QUESTIONS[1:]
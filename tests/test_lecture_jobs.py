@@ -0,0 +1,54 @@
+import pytest
+import lecture_jobs
+from db import save_to_db, delete_from_db, queue_lecture_job, get_lecture_job, get_lecture_artifact
+
+
+@pytest.fixture
+def lecture(mocker):
+    """Create a lecture and stub out extraction, indexing and the API."""
+    mocker.patch("lecture_jobs.extract_text_from_pdf", return_value="Lecture text")
+    mocker.patch("lecture_jobs.rag_engine.ingest_lecture")
+    mocker.patch("lecture_jobs.rag_engine.build_context", return_value="[Page 1]\nLecture text")
+    mocker.patch("lecture_jobs.cached_chat_completion", return_value="Generated")
+    mocker.patch("lecture_jobs.quiz_bank.refill", return_value=30)
+    lecture_id = save_to_db("Lecture 1", "uploaded_pdfs/lecture1.pdf")
+    queue_lecture_job(lecture_id, 0.0)
+    return lecture_id
+
+
+def test_job_stores_all_artifacts(lecture):
+    """Test that a job generates the summary and contents and fills the quiz bank for each difficulty."""
+    assert lecture_jobs.run_lecture_job(lecture)
+    assert get_lecture_job(lecture)[0] == "done"
+    assert get_lecture_artifact(lecture, "summary") == "Generated"
+    assert get_lecture_artifact(lecture, "contents") == "Generated"
+    assert [c.args for c in lecture_jobs.quiz_bank.refill.call_args_list] == [
+        (lecture, "easy"), (lecture, "medium"), (lecture, "hard")]
+
+
+def test_finished_job_is_not_rerun(lecture):
+    """Test that a job cannot be claimed again once done."""
+    assert lecture_jobs.run_lecture_job(lecture)
+    assert not lecture_jobs.run_lecture_job(lecture)
+    assert lecture_jobs.cached_chat_completion.call_count == 2
+
+
+def test_failed_job_resumes_missing_artifacts(lecture, mocker):
+    """Test that a retried job keeps the artifacts of the failed run."""
+    lecture_jobs.quiz_bank.refill.return_value = 0
+    assert not lecture_jobs.run_lecture_job(lecture)
+    status, stage, error, _ = get_lecture_job(lecture)
+    assert (status, stage) == ("failed", "quiz_easy")
+    assert get_lecture_artifact(lecture, "summary") == "Generated"
+
+    lecture_jobs.quiz_bank.refill.return_value = 30
+    assert lecture_jobs.run_lecture_job(lecture)
+    assert lecture_jobs.cached_chat_completion.call_count == 2
+
+
+def test_deleting_lecture_removes_artifacts(lecture):
+    """Test that artifacts and jobs are removed with their lecture."""
+    lecture_jobs.run_lecture_job(lecture)
+    delete_from_db(lecture)
+    assert get_lecture_job(lecture) is None
+    assert get_lecture_artifact(lecture, "summary") is None
@@ -0,0 +1,104 @@
+import pytest
+import llm_cache
+
+MESSAGES = [{"role": "user", "content": "Summarise lecture 1"}]
+
+
+def completion(content):
+    return {"choices": [{"message": {"content": content}}]}
+
+
+@pytest.fixture
+def cache():
+    """Use an empty in-memory tier."""
+    llm_cache.clear_memory()
+    yield
+    llm_cache.clear_memory()
+
+
+def test_repeated_requests_are_served_from_cache(cache, mocker):
+    """Test that an identical request does not call the API again."""
+    mock_gpt = mocker.patch("openai.ChatCompletion.create", return_value=completion("Summary"))
+    assert llm_cache.cached_chat_completion("gpt-4o", MESSAGES, max_tokens=500) == "Summary"
+    assert llm_cache.cached_chat_completion("gpt-4o", MESSAGES, max_tokens=500) == "Summary"
+    assert mock_gpt.call_count == 1
+
+
+def test_key_includes_request_parameters():
+    """Test that model, messages, max_tokens and temperature all change the key."""
+    base = llm_cache.cache_key("gpt-4o", MESSAGES, 500, None)
+    assert base == llm_cache.cache_key("gpt-4o", MESSAGES, 500, None)
+    assert base != llm_cache.cache_key("gpt-4o-mini", MESSAGES, 500, None)
+    assert base != llm_cache.cache_key("gpt-4o", [{"role": "user", "content": "Other"}], 500, None)
+    assert base != llm_cache.cache_key("gpt-4o", MESSAGES, 600, None)
+    assert base != llm_cache.cache_key("gpt-4o", MESSAGES, 500, 0.2)
+
+
+def test_sqlite_tier_is_shared(cache, mocker):
+    """Test that another process (empty memory tier) reads the SQLite tier."""
+    mock_gpt = mocker.patch("openai.ChatCompletion.create", return_value=completion("Summary"))
+    llm_cache.cached_chat_completion("gpt-4o", MESSAGES)
+    llm_cache.clear_memory()
+    assert llm_cache.cached_chat_completion("gpt-4o", MESSAGES) == "Summary"
+    assert mock_gpt.call_count == 1
+
+
+def test_entries_expire(cache, mocker):
+    """Test that responses older than the TTL are regenerated."""
+    mock_gpt = mocker.patch("openai.ChatCompletion.create", side_effect=[completion("Old"), completion("New")])
+    mock_time = mocker.patch("llm_cache.time.time", return_value=1000.0)
+    llm_cache.cached_chat_completion("gpt-4o", MESSAGES, ttl=60)
+    mock_time.return_value = 1061.0
+    assert llm_cache.cached_chat_completion("gpt-4o", MESSAGES, ttl=60) == "New"
+    assert mock_gpt.call_count == 2
+
+
+def test_memory_tier_is_lru_bounded(cache, mocker):
+    """Test that the in-memory tier evicts the least recently used entry."""
+    mocker.patch("llm_cache.LLM_CACHE_MAX_ENTRIES", 2)
+    for key in ["a", "b"]:
+        llm_cache.put(key, "gpt-4o", key.upper())
+    llm_cache.get("a")
+    llm_cache.put("c", "gpt-4o", "C")
+    assert list(llm_cache._memory) == ["a", "c"]
+
+
+def test_bypass_flag(cache, mocker):
+    """Test that use_cache=False forces a fresh completion and refreshes the cache."""
+    mocker.patch("openai.ChatCompletion.create", side_effect=[completion("First"), completion("Second")])
+    llm_cache.cached_chat_completion("gpt-4o", MESSAGES)
+    assert llm_cache.cached_chat_completion("gpt-4o", MESSAGES, use_cache=False) == "Second"
+    assert llm_cache.cached_chat_completion("gpt-4o", MESSAGES) == "Second"
+
+
+def test_errors_are_not_cached(cache, mocker):
+    """Test that a failed completion is retried on the next request."""
+    mocker.patch("openai.ChatCompletion.create", side_effect=[Exception("API Error"), completion("Summary")])
+    with pytest.raises(Exception):
+        llm_cache.cached_chat_completion("gpt-4o", MESSAGES)
+    assert llm_cache.cached_chat_completion("gpt-4o", MESSAGES) == "Summary"
+
+
+def stream(*pieces):
+    return iter([{"choices": [{"delta": {"role": "assistant"}}]}]
+                + [{"choices": [{"delta": {"content": piece}}]} for piece in pieces]
+                + [{"choices": [{"delta": {}, "finish_reason": "stop"}]}])
+
+
+def test_stream_yields_tokens_and_caches_result(cache, mocker):
+    """Test that tokens are yielded as they arrive and the full text is cached."""
+    mock_gpt = mocker.patch("openai.ChatCompletion.create", return_value=stream("Req", "uire", "ments"))
+    assert list(llm_cache.cached_chat_completion_stream("gpt-4o", MESSAGES)) == ["Req", "uire", "ments"]
+    assert mock_gpt.call_args.kwargs["stream"] is True
+    assert list(llm_cache.cached_chat_completion_stream("gpt-4o", MESSAGES)) == ["Requirements"]
+    assert llm_cache.cached_chat_completion("gpt-4o", MESSAGES) == "Requirements"
+    assert mock_gpt.call_count == 1
+
+
+def test_abandoned_stream_is_not_cached(cache, mocker):
+    """Test that a stream that was not read to the end is not cached."""
+    mocker.patch("openai.ChatCompletion.create", side_effect=[stream("Partial", " answer"), stream("Full")])
+    pieces = llm_cache.cached_chat_completion_stream("gpt-4o", MESSAGES)
+    assert next(pieces) == "Partial"
+    pieces.close()
+    assert list(llm_cache.cached_chat_completion_stream("gpt-4o", MESSAGES)) == ["Full"]
@@ -0,0 +1,95 @@
+import openai
+import pytest
+import llm_client
+
+MESSAGES = [{"role": "user", "content": "Summarise lecture 1"}]
+
+
+def completion(content, total_tokens=None):
+    response = {"choices": [{"message": {"content": content}}]}
+    if total_tokens is not None:
+        response["usage"] = {"total_tokens": total_tokens}
+    return response
+
+
+@pytest.fixture(autouse=True)
+def no_sleep(mocker):
+    """Record backoff and rate-limit waits instead of sleeping, with fresh limiters."""
+    mocker.patch("llm_client.request_limiter", llm_client.TokenBucket(600))
+    mocker.patch("llm_client.token_limiter", llm_client.TokenBucket(100000))
+    return mocker.patch("llm_client.time.sleep")
+
+
+def test_retries_rate_limit_errors(mocker, no_sleep):
+    """Test that 429s are retried with backoff until the call succeeds."""
+    mock_gpt = mocker.patch("openai.ChatCompletion.create", side_effect=[
+        openai.error.RateLimitError("Too many requests"), openai.error.RateLimitError("Too many requests"),
+        completion("Summary")])
+    response = llm_client.chat_completion("gpt-4o", MESSAGES)
+    assert response["choices"][0]["message"]["content"] == "Summary"
+    assert mock_gpt.call_count == 3
+    assert no_sleep.call_count == 2
+
+
+def test_honours_retry_after(mocker, no_sleep):
+    """Test that the Retry-After header sets a lower bound on the backoff."""
+    error = openai.error.RateLimitError("Too many requests", headers={"retry-after": "7"})
+    mocker.patch("openai.ChatCompletion.create", side_effect=[error, completion("Summary")])
+    llm_client.chat_completion("gpt-4o", MESSAGES)
+    assert no_sleep.call_args.args[0] >= 7
+
+
+def test_does_not_retry_client_errors(mocker):
+    """Test that invalid requests fail immediately."""
+    mock_gpt = mocker.patch("openai.ChatCompletion.create",
+                            side_effect=openai.error.InvalidRequestError("Bad request", param=None))
+    with pytest.raises(openai.error.InvalidRequestError):
+        llm_client.chat_completion("gpt-4o", MESSAGES)
+    assert mock_gpt.call_count == 1
+
+
+def test_gives_up_after_max_retries(mocker):
+    """Test that persistent server errors are raised after the retry budget."""
+    mock_gpt = mocker.patch("openai.ChatCompletion.create",
+                            side_effect=openai.error.ServiceUnavailableError("Overloaded"))
+    with pytest.raises(openai.error.ServiceUnavailableError):
+        llm_client.chat_completion("gpt-4o", MESSAGES)
+    assert mock_gpt.call_count == llm_client.LLM_MAX_RETRIES + 1
+
+
+def test_passes_timeout(mocker):
+    """Test that each call carries its timeout."""
+    mock_gpt = mocker.patch("openai.ChatCompletion.create", return_value=completion("Summary"))
+    llm_client.chat_completion("gpt-4o", MESSAGES, timeout=5, max_tokens=100)
+    assert mock_gpt.call_args.kwargs["request_timeout"] == 5
+    assert mock_gpt.call_args.kwargs["max_tokens"] == 100
+
+
+def test_token_bucket_queues_bursts(mocker):
+    """Test that requests beyond the per-minute budget wait for it to refill."""
+    mocker.patch("llm_client.time.monotonic", return_value=100.0)
+    sleep = llm_client.time.sleep
+    bucket = llm_client.TokenBucket(60)  # One unit per second
+    for _ in range(60):
+        bucket.acquire(1)
+    sleep.assert_not_called()
+    bucket.acquire(1)
+    bucket.acquire(1)
+    assert [c.args[0] for c in sleep.call_args_list] == [pytest.approx(1.0), pytest.approx(2.0)]
+    with pytest.raises(TimeoutError):
+        bucket.acquire(30, timeout=10)
+
+
+def test_usage_corrects_token_estimate(mocker):
+    """Test that the token budget is refunded when a response used fewer tokens than estimated."""
+    mocker.patch("llm_client.time.monotonic", return_value=100.0)
+    mocker.patch("llm_client.request_limiter", llm_client.TokenBucket(600))
+    mocker.patch("llm_client.token_limiter", llm_client.TokenBucket(100000))
+    mocker.patch("openai.ChatCompletion.create", return_value=completion("Summary", total_tokens=20))
+    llm_client.chat_completion("gpt-4o", MESSAGES, max_tokens=1000)
+    assert llm_client.token_limiter.tokens == pytest.approx(100000 - 20)
+
+
+def test_shares_http_session():
+    """Test that the OpenAI library uses the pooled session."""
+    assert openai.requestssession is llm_client._session
@@ -0,0 +1,113 @@
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor
+import pytest
+import llm_cache
+import llm_client
+import llm_usage
+import db
+from db import get_llm_usage_report
+
+MESSAGES = [{"role": "user", "content": "Summarise lecture 1"}]
+
+
+def completion(content):
+    return {"choices": [{"message": {"content": content}}],
+            "usage": {"prompt_tokens": 100, "completion_tokens": 50, "total_tokens": 150}}
+
+
+@pytest.fixture
+def empty_cache():
+    """Use an empty response cache."""
+    llm_cache.clear_memory()
+    yield
+    llm_cache.clear_memory()
+
+
+def usage_rows():
+    conn = sqlite3.connect(db.DB_PATH)
+    rows = conn.execute('''
+        SELECT kind, model, caller, page, user_id, lecture_id, prompt_tokens, completion_tokens, cache_hit, cost_usd
+        FROM llm_usage ORDER BY id
+    ''').fetchall()
+    conn.close()
+    return rows
+
+
+def test_calls_are_recorded_with_tags(empty_cache, mocker):
+    """Test that a call is logged with its usage, cost and the active tags."""
+    mocker.patch("openai.ChatCompletion.create", return_value=completion("Summary"))
+    with llm_usage.tagged(page="Quiz", user_id=7, lecture_id=3):
+        with llm_usage.tagged(caller="generate_quiz"):
+            llm_client.chat_completion("gpt-4o", MESSAGES)
+    (row,) = usage_rows()
+    assert row[:9] == ("chat", "gpt-4o", "generate_quiz", "Quiz", "7", "3", 100, 50, 0)
+    assert row[9] == pytest.approx((100 * 2.50 + 50 * 10.00) / 1_000_000)
+
+
+def test_cache_hits_are_recorded(empty_cache, mocker):
+    """Test that responses served from the cache are logged as free cache hits."""
+    mocker.patch("openai.ChatCompletion.create", return_value=completion("Summary"))
+    llm_cache.cached_chat_completion("gpt-4o", MESSAGES)
+    llm_cache.cached_chat_completion("gpt-4o", MESSAGES)
+    rows = usage_rows()
+    assert [row[8] for row in rows] == [0, 1]
+    assert rows[1][6:] == (0, 0, 1, 0.0)
+
+
+def test_track_tags_generators_only_while_running():
+    """Test that a tracked generator's tag does not leak into its consumer."""
+    seen = []
+
+    @llm_usage.track("generate_content")
+    def stream():
+        seen.append(llm_usage.current_tags().get("caller"))
+        yield "a"
+        seen.append(llm_usage.current_tags().get("caller"))
+        yield "b"
+
+    for _ in stream():
+        seen.append(llm_usage.current_tags().get("caller"))
+    assert seen == ["generate_content", None, "generate_content", None]
+
+
+def test_tags_follow_work_into_thread_pools():
+    """Test that submit_in_context carries the submitter's tags to the worker thread."""
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        with llm_usage.tagged(page="Studying lectures"):
+            future = llm_usage.submit_in_context(executor, llm_usage.current_tags)
+        assert future.result() == {"page": "Studying lectures"}
+
+
+def test_usage_log_is_append_only(empty_cache, test_db_path):
+    """Test that logged calls cannot be changed or deleted."""
+    llm_usage.record("chat", "gpt-4o", 10, 5)
+    conn = sqlite3.connect(test_db_path)
+    with pytest.raises(sqlite3.DatabaseError):
+        conn.execute("UPDATE llm_usage SET prompt_tokens = 0")
+    with pytest.raises(sqlite3.DatabaseError):
+        conn.execute("DELETE FROM llm_usage")
+    conn.close()
+
+
+def test_views_roll_up_usage(empty_cache):
+    """Test that the per-caller view sums tokens and counts cache hits."""
+    with llm_usage.tagged(caller="generate_quiz"):
+        llm_usage.record("chat", "gpt-4o", 100, 50)
+        llm_usage.record("chat", "gpt-4o", cache_hit=True)
+    with llm_usage.tagged(caller="calculate_feedback_score"):
+        llm_usage.record("chat", "gpt-4o-mini", 200, 20)
+    columns, rows = get_llm_usage_report("llm_usage_by_caller")
+    report = {row[0]: dict(zip(columns, row)) for row in rows}
+    assert report["generate_quiz"]["calls"] == 2
+    assert report["generate_quiz"]["cache_hits"] == 1
+    assert report["generate_quiz"]["prompt_tokens"] == 100
+    assert report["calculate_feedback_score"]["completion_tokens"] == 20
+    with pytest.raises(ValueError):
+        get_llm_usage_report("users")
+
+
+def test_estimate_cost_handles_model_snapshots():
+    """Test that dated model snapshots use their base model's price and unknown models have no cost."""
+    assert llm_usage.estimate_cost("gpt-4o-2024-08-06", 1_000_000, 0) == pytest.approx(2.50)
+    assert llm_usage.estimate_cost("gpt-4o-mini-2024-07-18", 1_000_000, 0) == pytest.approx(0.15)
+    assert llm_usage.estimate_cost("unknown-model", 100, 100) is None
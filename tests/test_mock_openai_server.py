@@ -0,0 +1,74 @@
+import threading
+import openai
+import pytest
+import llm_client
+import mock_openai_server
+from quiz_handler import generate_quiz
+
+
+@pytest.fixture
+def mock_server(mocker):
+    """Run a fast mock server and point the OpenAI client at it."""
+    settings = mock_openai_server.MockSettings(latency=0.0, latency_dist="fixed", token_delay=0.0, seed=0)
+    server = mock_openai_server.make_server(port=0, settings=settings)
+    thread = threading.Thread(target=server.serve_forever, kwargs={"poll_interval": 0.05}, daemon=True)
+    thread.start()
+    mocker.patch("openai.api_base", f"http://127.0.0.1:{server.server_address[1]}/v1")
+    mocker.patch("openai.api_key", "test-key")
+    yield settings
+    server.shutdown()
+    server.server_close()
+
+
+def test_chat_completion(mock_server):
+    """Test that plain prompts get a completion with usage."""
+    response = llm_client.chat_completion("gpt-4o", [{"role": "user", "content": "Summarise"}], max_tokens=40)
+    assert response["choices"][0]["message"]["content"]
+    assert response["usage"]["total_tokens"] > 0
+
+
+def test_streaming(mock_server):
+    """Test that streamed chunks add up to the full completion."""
+    messages = [{"role": "user", "content": "Summarise"}]
+    full = llm_client.chat_completion("gpt-4o", messages, max_tokens=40)["choices"][0]["message"]["content"]
+    streamed = "".join(chunk["choices"][0]["delta"].get("content", "")
+                       for chunk in llm_client.chat_completion_stream("gpt-4o", messages, max_tokens=40))
+    assert streamed == full
+
+
+def test_quiz_prompts_get_valid_quizzes(mock_server):
+    """Test that generate_quiz parses the canned quiz JSON."""
+    questions, answers = generate_quiz("Requirements elicitation and stakeholder analysis.", "medium")
+    assert len(questions) == mock_openai_server.QUIZ_QUESTIONS
+    assert {q["type"] for q in questions} <= {"mcq_single", "mcq_multiple", "true_false"}
+    assert len(answers) == len(questions)
+
+
+def test_embeddings_are_deterministic(mock_server):
+    """Test that the same text always gets the same unit vector."""
+    response = llm_client.embedding(["alpha", "beta", "alpha"], "text-embedding-ada-002")
+    vectors = [item["embedding"] for item in response["data"]]
+    assert len(vectors[0]) == mock_openai_server.EMBEDDING_DIM
+    assert vectors[0] == vectors[2] != vectors[1]
+
+
+def test_injected_errors(mock_server, mocker):
+    """Test that injected 429s and 500s surface as the matching OpenAI errors."""
+    mocker.patch("llm_client.LLM_MAX_RETRIES", 0)
+    messages = [{"role": "user", "content": "Summarise"}]
+    mock_server.rate_limit_rate = 1.0
+    with pytest.raises(openai.error.RateLimitError):
+        llm_client.chat_completion("gpt-4o", messages)
+    mock_server.rate_limit_rate = 0.0
+    mock_server.server_error_rate = 1.0
+    with pytest.raises(openai.error.APIError):
+        llm_client.chat_completion("gpt-4o", messages)
+
+
+def test_latency_distributions():
+    """Test that sampled latencies are non-negative and centred on the configured value."""
+    for dist in ["fixed", "uniform", "normal", "lognormal"]:
+        settings = mock_openai_server.MockSettings(latency=0.5, latency_spread=0.1, latency_dist=dist, seed=1)
+        samples = [settings.sample_latency() for _ in range(2000)]
+        assert min(samples) >= 0
+        assert sorted(samples)[1000] == pytest.approx(0.5, abs=0.05)
@@ -0,0 +1,65 @@
+import sqlite3
+import pytest
+import model_router
+from quiz_handler import generate_quiz
+
+
+@pytest.fixture
+def router(mocker):
+    """Use the balanced budget and no overrides."""
+    mocker.patch("model_router.MODEL_ROUTER_BUDGET", "balanced")
+    mocker.patch("model_router.MODEL_ROUTER_OVERRIDES", {})
+
+
+def test_short_prompts_use_small_model(router):
+    """Test that prompts under the task's limit go to the small model and longer ones to the large model."""
+    assert model_router.route("summary", 300).model == model_router.SMALL_MODEL
+    assert model_router.route("summary", 5000).model == model_router.LARGE_MODEL
+
+
+def test_budget_changes_threshold(router):
+    """Test that the quality budget always uses the large model and economy the small one."""
+    assert model_router.route("quiz", 100, budget="quality").model == model_router.LARGE_MODEL
+    assert model_router.route("quiz", 50000, budget="economy").model == model_router.SMALL_MODEL
+
+
+def test_small_model_tasks(router):
+    """Test that chatbot and feedback keep using the small model even for long prompts."""
+    assert model_router.route("feedback", 50000, budget="quality").model == model_router.SMALL_MODEL
+
+
+def test_overrides(router, mocker):
+    """Test that task overrides beat the size rule and call overrides beat everything."""
+    mocker.patch("model_router.MODEL_ROUTER_OVERRIDES", model_router.parse_overrides("quiz=gpt-4o, summary=gpt-4o-mini"))
+    assert model_router.route("quiz", 10).model == "gpt-4o"
+    assert model_router.route("summary", 10000).model == "gpt-4o-mini"
+    assert model_router.route("quiz", 10, model="gpt-4.1").model == "gpt-4.1"
+
+
+def test_unknown_task_or_budget(router):
+    with pytest.raises(ValueError):
+        model_router.route("poetry", 10)
+    with pytest.raises(ValueError):
+        model_router.route("quiz", 10, budget="lavish")
+
+
+def test_decisions_are_logged_and_captured(router, test_db_path):
+    """Test that decisions are written to the routing log and collected by capture()."""
+    with model_router.capture() as decisions:
+        model_router.route("summary", 300)
+        model_router.route("quiz", 5000)
+    assert [(d.task, d.model) for d in decisions] == [
+        ("summary", model_router.SMALL_MODEL), ("quiz", model_router.LARGE_MODEL)]
+    conn = sqlite3.connect(test_db_path)
+    rows = conn.execute("SELECT task, model, prompt_tokens, budget FROM model_routing_log ORDER BY id").fetchall()
+    conn.close()
+    assert rows == [("summary", model_router.SMALL_MODEL, 300, "balanced"),
+                    ("quiz", model_router.LARGE_MODEL, 5000, "balanced")]
+
+
+def test_generate_quiz_is_routed(router, mocker):
+    """Test that a short quiz prompt is sent to the small model."""
+    mock_gpt = mocker.patch("openai.ChatCompletion.create",
+                            return_value={"choices": [{"message": {"content": "[]"}}]})
+    generate_quiz("A short slide about stakeholders.", "easy")
+    assert mock_gpt.call_args.kwargs["model"] == model_router.SMALL_MODEL
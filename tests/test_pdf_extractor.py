@@ -0,0 +1,69 @@
+import fitz
+import pytest
+from db import delete_extraction
+from pdf_extractor import extract_text_from_pdf, extract_pages_from_pdf
+
+
+@pytest.fixture
+def sample_pdf(tmp_path):
+    """Create a two-page PDF to extract."""
+    pdf_path = str(tmp_path / "lecture.pdf")
+    with fitz.open() as pdf:
+        for text in ["Requirements elicitation", "Stakeholder analysis"]:
+            page = pdf.new_page()
+            page.insert_text((72, 72), text)
+        pdf.save(pdf_path)
+    return pdf_path
+
+
+def test_extract_text_from_pdf(sample_pdf):
+    """Test extracting text from every page."""
+    text = extract_text_from_pdf(sample_pdf)
+    assert "Requirements elicitation" in text
+    assert "Stakeholder analysis" in text
+    assert len(extract_pages_from_pdf(sample_pdf)) == 2
+
+
+def test_cached_extraction_does_not_open_file(sample_pdf, mocker):
+    """Test that a rerun is served from the cache without opening the PDF."""
+    first = extract_text_from_pdf(sample_pdf)
+    mock_open = mocker.patch("pdf_extractor.fitz.open", side_effect=AssertionError("PDF was re-parsed"))
+    mock_hash = mocker.patch("pdf_extractor.hash_file", side_effect=AssertionError("PDF was re-read"))
+    assert extract_text_from_pdf(sample_pdf) == first
+    mock_open.assert_not_called()
+    mock_hash.assert_not_called()
+
+
+def test_cache_is_keyed_by_content(sample_pdf, tmp_path, mocker):
+    """Test that a copy of the same PDF at another path reuses the cached text."""
+    first = extract_text_from_pdf(sample_pdf)
+    copy_path = str(tmp_path / "copy.pdf")
+    with open(sample_pdf, "rb") as src, open(copy_path, "wb") as dst:
+        dst.write(src.read())
+    mock_open = mocker.patch("pdf_extractor.fitz.open")
+    assert extract_text_from_pdf(copy_path) == first
+    mock_open.assert_not_called()
+
+
+def test_delete_extraction(sample_pdf, mocker):
+    """Test that deleting a lecture drops its cache entry."""
+    extract_text_from_pdf(sample_pdf)
+    delete_extraction(sample_pdf)
+    spy = mocker.spy(fitz, "open")
+    extract_text_from_pdf(sample_pdf)
+    assert spy.call_count == 1
+
+
+def test_delete_extraction_keeps_shared_content(sample_pdf, tmp_path, mocker):
+    """Test that deleting one of two lectures with the same PDF keeps the cache the other still uses."""
+    copy_path = str(tmp_path / "copy.pdf")
+    with open(sample_pdf, "rb") as src, open(copy_path, "wb") as dst:
+        dst.write(src.read())
+    first = extract_text_from_pdf(sample_pdf)
+    extract_text_from_pdf(copy_path)
+    delete_extraction(copy_path)
+    mock_open = mocker.patch("pdf_extractor.fitz.open")
+    mock_hash = mocker.patch("pdf_extractor.hash_file")
+    assert extract_text_from_pdf(sample_pdf) == first
+    mock_open.assert_not_called()
+    mock_hash.assert_not_called()
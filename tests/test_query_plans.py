@@ -0,0 +1,257 @@
+import inspect
+import pytest
+import db
+from db import close_all_connections, get_connection
+
+# Calls exercising every query in db.py, in an order where each finds the rows it needs
+CALLS = {
+    "save_to_db": lambda: db.save_to_db("Lecture", "lecture.pdf"),
+    "get_lectures": lambda: db.get_lectures(),
+    "get_lecture": lambda: db.get_lecture(1),
+    "save_extraction": lambda: db.save_extraction("hash", "v1", "lecture.pdf", 10, 20, ["page"]),
+    "get_cached_extraction_by_stat": lambda: db.get_cached_extraction_by_stat("lecture.pdf", 10, 20, "v1"),
+    "get_cached_extraction": lambda: db.get_cached_extraction("hash", "v1"),
+    "delete_extraction": lambda: db.delete_extraction("lecture.pdf"),
+    "register_vector_store": lambda: db.register_vector_store("course", 3, "model"),
+    "get_vector_store": lambda: db.get_vector_store("course"),
+    "reserve_vector_rows": lambda: db.reserve_vector_rows("course", 1, [{"text": "chunk", "page": 1}]),
+    "activate_vector_rows": lambda: db.activate_vector_rows("course", 0, 1),
+    "get_live_vector_rows": lambda: db.get_live_vector_rows("course", lecture_ids=[1], list_ids=[0]),
+    "get_vector_row_details": lambda: db.get_vector_row_details("course", [0]),
+    "count_live_vector_rows": lambda: db.count_live_vector_rows("course"),
+    "get_ann_index": lambda: db.get_ann_index("course"),
+    "save_ann_index": lambda: db.save_ann_index("course", b"", [(0, 0)], 1),
+    "has_vector_rows": lambda: db.has_vector_rows("course", 1),
+    "delete_vector_rows": lambda: db.delete_vector_rows("course", 1),
+    "delete_vector_store": lambda: db.delete_vector_store("course"),
+    "save_embeddings": lambda: db.save_embeddings("model", [("hash", b"")]),
+    "get_cached_embeddings": lambda: db.get_cached_embeddings("model", ["hash"]),
+    "save_llm_cache_entry": lambda: db.save_llm_cache_entry("key", "model", "response", 2e9),
+    "get_llm_cache_entry": lambda: db.get_llm_cache_entry("key", 1e9),
+    "acquire_inflight_lock": lambda: db.acquire_inflight_lock("key", "owner", 1e9, 2e9),
+    "release_inflight_lock": lambda: db.release_inflight_lock("key", "owner"),
+    "queue_lecture_job": lambda: db.queue_lecture_job(1, 1e9),
+    "claim_lecture_job": lambda: db.claim_lecture_job(1, 1e9, 0),
+    "update_lecture_job": lambda: db.update_lecture_job(1, "done", None, None, 1e9),
+    "get_lecture_job": lambda: db.get_lecture_job(1),
+    "get_incomplete_lecture_jobs": lambda: db.get_incomplete_lecture_jobs(0),
+    "save_lecture_artifact": lambda: db.save_lecture_artifact(1, "summary", "text"),
+    "get_lecture_artifact": lambda: db.get_lecture_artifact(1, "summary"),
+    "add_quiz_questions": lambda: db.add_quiz_questions(1, "easy", "v1", [("hash", "{}")]),
+    "get_quiz_bank_questions": lambda: db.get_quiz_bank_questions(1, "easy", "v1"),
+    "count_quiz_questions": lambda: db.count_quiz_questions(1, "easy", "v1"),
+    "sample_quiz_questions": lambda: db.sample_quiz_questions(1, "easy", "v1", 5),
+    "delete_stale_quiz_questions": lambda: db.delete_stale_quiz_questions(1, "v2"),
+    "delete_from_db": lambda: db.delete_from_db(1),
+    "record_llm_usage": lambda: db.record_llm_usage("chat", "model", "caller", "page", 1, 1, 10, 5, 100.0, False,
+                                                    0.01, "ok"),
+    "get_llm_usage_report": lambda: db.get_llm_usage_report("llm_usage_by_model"),
+    "record_model_routing": lambda: db.record_model_routing("quiz", "model", "reason", 10, "balanced", None, None),
+    "register_user": lambda: db.register_user("student@example.com", "password", "student", "S1"),
+    "authenticate_user": lambda: db.authenticate_user("student@example.com", "password"),
+    "get_user_role": lambda: db.get_user_role(1),
+    "submit_feedback": lambda: db.submit_feedback("Feedback"),
+    "get_all_feedback": lambda: db.get_all_feedback(),
+    "search_feedback": lambda: db.search_feedback("feedback"),
+    "save_quiz_result": lambda: db.save_quiz_result(1, "Lecture", "easy", 4, 5),
+    "get_student_quiz_results": lambda: db.get_student_quiz_results(1),
+    "get_all_quiz_results": lambda: db.get_all_quiz_results(),
+    "get_quiz_results": lambda: (db.get_quiz_results(), db.get_quiz_results(student_id=1, after=(2e9, 10)),
+                                 db.get_quiz_results(lecture="Lecture", after=(2e9, 10))),
+    "save_generated_assignment": lambda: db.save_generated_assignment("Assignment", "Text"),
+    "submit_student_assignment": lambda: db.submit_student_assignment("S1", "Student", "Assignment", "a.pdf"),
+    "get_all_assignments": lambda: db.get_all_assignments(),
+    "get_assignments": lambda: (db.get_assignments(), db.get_assignments(student_id="S1", after=10),
+                                db.get_assignments(email="student", after=10)),
+    "get_student_assignments": lambda: db.get_student_assignments("S1"),
+    "search_assignments": lambda: db.search_assignments("assignment text"),
+}
+
+# Functions that only create or migrate the schema
+SCHEMA_FUNCTIONS = {"migrate", "init_db", "init_database", "init_feedback_table", "init_quiz_results_table",
+                    "init_assignments_table", "get_connection", "transaction", "close_all_connections"}
+
+# EXPLAIN QUERY PLAN details of each statement run by each call, in order (empty for plain INSERTs)
+EXPECTED_PLANS = {
+    "save_to_db": [[]],
+    "get_lectures": [["SCAN lectures"]],
+    "get_lecture": [["SEARCH lectures USING INTEGER PRIMARY KEY (rowid=?)"]],
+    "save_extraction": [[], []],
+    "get_cached_extraction_by_stat": [
+        [
+            "SEARCH extracted_files USING INDEX sqlite_autoindex_extracted_files_1 (file_path=?)",
+            "SEARCH extracted_texts USING INDEX sqlite_autoindex_extracted_texts_1 (content_hash=? AND extractor_version=?)",
+        ],
+    ],
+    "get_cached_extraction": [
+        [
+            "SEARCH extracted_texts USING INDEX sqlite_autoindex_extracted_texts_1 (content_hash=? AND extractor_version=?)",
+        ],
+    ],
+    "delete_extraction": [
+        ["SEARCH extracted_files USING INDEX sqlite_autoindex_extracted_files_1 (file_path=?)"],
+        ["SEARCH extracted_files USING INDEX sqlite_autoindex_extracted_files_1 (file_path=?)"],
+        [
+            "SEARCH extracted_texts USING INDEX sqlite_autoindex_extracted_texts_1 (content_hash=?)",
+            "SCALAR SUBQUERY 1",
+            "SEARCH extracted_files USING COVERING INDEX idx_extracted_files_hash (content_hash=?)",
+        ],
+    ],
+    "register_vector_store": [[]],
+    "get_vector_store": [["SEARCH vector_stores USING INDEX sqlite_autoindex_vector_stores_1 (course_id=?)"]],
+    "reserve_vector_rows": [
+        ["SEARCH vector_rows USING COVERING INDEX sqlite_autoindex_vector_rows_1 (course_id=?)"],
+        [],
+    ],
+    "activate_vector_rows": [
+        ["SEARCH vector_rows USING INDEX sqlite_autoindex_vector_rows_1 (course_id=? AND row>? AND row<?)"],
+    ],
+    "get_live_vector_rows": [["SEARCH vector_rows USING INDEX sqlite_autoindex_vector_rows_1 (course_id=?)"]],
+    "get_vector_row_details": [
+        ["SEARCH vector_rows USING INDEX sqlite_autoindex_vector_rows_1 (course_id=? AND row=?)"],
+    ],
+    "count_live_vector_rows": [["SEARCH vector_rows USING INDEX idx_vector_rows_list (course_id=?)"]],
+    "get_ann_index": [["SEARCH vector_stores USING INDEX sqlite_autoindex_vector_stores_1 (course_id=?)"]],
+    "save_ann_index": [
+        ["SEARCH vector_stores USING INDEX sqlite_autoindex_vector_stores_1 (course_id=?)"],
+        ["SEARCH vector_rows USING INDEX sqlite_autoindex_vector_rows_1 (course_id=? AND row=?)"],
+    ],
+    "has_vector_rows": [["SEARCH vector_rows USING INDEX idx_vector_rows_lecture (course_id=? AND lecture_id=?)"]],
+    "delete_vector_rows": [["SEARCH vector_rows USING INDEX idx_vector_rows_lecture (course_id=? AND lecture_id=?)"]],
+    "delete_vector_store": [
+        ["SEARCH vector_rows USING INDEX idx_vector_rows_list (course_id=?)"],
+        ["SEARCH vector_stores USING INDEX sqlite_autoindex_vector_stores_1 (course_id=?)"],
+    ],
+    "save_embeddings": [[]],
+    "get_cached_embeddings": [
+        ["SEARCH embedding_cache USING INDEX sqlite_autoindex_embedding_cache_1 (model=? AND text_hash=?)"],
+    ],
+    "save_llm_cache_entry": [[], ["SEARCH llm_cache USING INDEX idx_llm_cache_expires (expires_at<?)"]],
+    "get_llm_cache_entry": [["SEARCH llm_cache USING INDEX sqlite_autoindex_llm_cache_1 (cache_key=?)"]],
+    "acquire_inflight_lock": [["SEARCH inflight_locks USING INDEX sqlite_autoindex_inflight_locks_1 (lock_key=?)"], []],
+    "release_inflight_lock": [["SEARCH inflight_locks USING INDEX sqlite_autoindex_inflight_locks_1 (lock_key=?)"]],
+    "queue_lecture_job": [[]],
+    "claim_lecture_job": [["SEARCH lecture_jobs USING INTEGER PRIMARY KEY (rowid=?)"]],
+    "update_lecture_job": [["SEARCH lecture_jobs USING INTEGER PRIMARY KEY (rowid=?)"]],
+    "get_lecture_job": [["SEARCH lecture_jobs USING INTEGER PRIMARY KEY (rowid=?)"]],
+    "get_incomplete_lecture_jobs": [["SCAN lecture_jobs"]],
+    "save_lecture_artifact": [
+        ["SCAN CONSTANT ROW", "SCALAR SUBQUERY 1", "SEARCH lectures USING INTEGER PRIMARY KEY (rowid=?)"],
+    ],
+    "get_lecture_artifact": [
+        ["SEARCH lecture_artifacts USING INDEX sqlite_autoindex_lecture_artifacts_1 (lecture_id=? AND kind=?)"],
+    ],
+    "add_quiz_questions": [[]],
+    "get_quiz_bank_questions": [
+        ["SEARCH quiz_bank USING INDEX sqlite_autoindex_quiz_bank_1 (lecture_id=? AND difficulty=? AND source_hash=?)"],
+    ],
+    "count_quiz_questions": [
+        [
+            "SEARCH quiz_bank USING COVERING INDEX sqlite_autoindex_quiz_bank_1 (lecture_id=? AND difficulty=? AND source_hash=?)",
+        ],
+    ],
+    "sample_quiz_questions": [
+        [
+            "SEARCH quiz_bank USING INDEX sqlite_autoindex_quiz_bank_1 (lecture_id=? AND difficulty=? AND source_hash=?)",
+            "USE TEMP B-TREE FOR ORDER BY",
+        ],
+        ["SEARCH quiz_bank USING INTEGER PRIMARY KEY (rowid=?)"],
+    ],
+    "delete_stale_quiz_questions": [["SEARCH quiz_bank USING INDEX sqlite_autoindex_quiz_bank_1 (lecture_id=?)"]],
+    "delete_from_db": [
+        ["SEARCH lectures USING INTEGER PRIMARY KEY (rowid=?)"],
+        ["SEARCH lecture_jobs USING INTEGER PRIMARY KEY (rowid=?)"],
+        ["SEARCH lecture_artifacts USING INDEX sqlite_autoindex_lecture_artifacts_1 (lecture_id=?)"],
+        ["SEARCH quiz_bank USING INDEX sqlite_autoindex_quiz_bank_1 (lecture_id=?)"],
+    ],
+    "record_llm_usage": [[]],
+    "get_llm_usage_report": [
+        [
+            "CO-ROUTINE llm_usage_by_model",
+            "SCAN llm_usage",
+            "USE TEMP B-TREE FOR GROUP BY",
+            "SCAN llm_usage_by_model",
+            "USE TEMP B-TREE FOR ORDER BY",
+        ],
+    ],
+    "record_model_routing": [[]],
+    "register_user": [[]],
+    "authenticate_user": [["SEARCH users USING INDEX sqlite_autoindex_users_2 (email=?)"]],
+    "get_user_role": [["SEARCH users USING INTEGER PRIMARY KEY (rowid=?)"]],
+    "submit_feedback": [[]],
+    "get_all_feedback": [["SCAN feedback USING INDEX idx_feedback_ts"]],
+    "search_feedback": [
+        ["SCAN feedback_fts VIRTUAL TABLE INDEX 32:M1", "SEARCH feedback USING INTEGER PRIMARY KEY (rowid=?)"],
+    ],
+    "save_quiz_result": [[]],
+    "get_student_quiz_results": [["SEARCH quiz_results USING INDEX idx_quiz_results_student_ts (student_id=?)"]],
+    "get_all_quiz_results": [["SCAN quiz_results USING INDEX idx_quiz_results_ts"]],
+    "get_quiz_results": [
+        ["SCAN quiz_results USING INDEX idx_quiz_results_ts"],
+        ["SEARCH quiz_results USING INDEX idx_quiz_results_student_ts (student_id=? AND submitted_ts<?)"],
+        ["SEARCH quiz_results USING INDEX idx_quiz_results_lecture_ts (lecture_name=? AND submitted_ts<?)"],
+    ],
+    "save_generated_assignment": [[]],
+    "submit_student_assignment": [[]],
+    "get_all_assignments": [["SCAN assignments"]],
+    "get_assignments": [
+        ["SCAN assignments"],
+        ["SEARCH assignments USING INDEX idx_assignments_student (student_id=? AND rowid<?)"],
+        ["SEARCH assignments USING INTEGER PRIMARY KEY (rowid<?)"],
+    ],
+    "get_student_assignments": [["SEARCH assignments USING INDEX idx_assignments_student (student_id=?)"]],
+    "search_assignments": [
+        ["SCAN assignments_fts VIRTUAL TABLE INDEX 32:M2", "SEARCH assignments USING INTEGER PRIMARY KEY (rowid=?)"],
+    ],
+}
+
+
+def query_plans(call):
+    """Run `call` and return the EXPLAIN QUERY PLAN details of every statement it executes."""
+    conn = get_connection()
+    statements = []
+    conn.set_trace_callback(statements.append)
+    try:
+        call()
+    finally:
+        conn.set_trace_callback(None)
+    plans = []
+    seen = set()
+    for statement in statements:
+        # Statements run inside triggers are traced as "-- <statement>", and the statement firing
+        # the trigger is traced again for each one; identical text has an identical plan. FTS5
+        # also reads its config with its own "'main'."-qualified statements when it reconnects
+        if statement.startswith("--") or "'main'." in statement or statement in seen:
+            continue
+        seen.add(statement)
+        if statement.split()[0].upper() in ("BEGIN", "COMMIT", "ROLLBACK", "PRAGMA"):
+            continue
+        plans.append([row[3] for row in conn.execute(f"EXPLAIN QUERY PLAN {statement}")])
+    return plans
+
+
+@pytest.fixture(scope="module")
+def plans_db_path(tmp_path_factory):
+    """One database for all calls, run in order so each finds the rows it needs."""
+    yield str(tmp_path_factory.mktemp("query_plans") / "test_lecture_summaries.db")
+    close_all_connections()
+
+
+@pytest.fixture
+def test_db_path(plans_db_path, monkeypatch):
+    """Use the shared database instead of conftest's empty one per test."""
+    monkeypatch.setattr(db, "DB_PATH", plans_db_path)
+    return plans_db_path
+
+
+def test_every_query_is_covered():
+    """Test that every db.py function running SQL has an entry, so new queries get a plan check."""
+    functions = {name for name, fn in inspect.getmembers(db, inspect.isfunction)
+                 if fn.__module__ == "db" and not name.startswith("_") and "execute" in inspect.getsource(fn)}
+    assert functions - SCHEMA_FUNCTIONS == set(CALLS)
+    assert set(CALLS) == set(EXPECTED_PLANS)
+
+
+@pytest.mark.parametrize("name", list(CALLS))
+def test_query_plan(name):
+    assert query_plans(CALLS[name]) == EXPECTED_PLANS[name]
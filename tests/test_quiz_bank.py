@@ -0,0 +1,79 @@
+import os
+import pytest
+import quiz_bank
+from db import save_to_db, delete_from_db, count_quiz_questions
+
+TEST_PDF_PATH = "test_quiz_bank_lecture.pdf"
+
+
+def make_questions(start, count):
+    return [{"question": f"Question {i}?", "type": "true_false", "options": ["True", "False"], "answer": "True"}
+            for i in range(start, start + count)]
+
+
+@pytest.fixture
+def lecture(mocker):
+    """Create a lecture backed by a small file."""
+    with open(TEST_PDF_PATH, "wb") as f:
+        f.write(b"version 1")
+    mocker.patch("quiz_bank.rag_engine.build_context", return_value="[Page 1]\nLecture text")
+    mocker.patch("quiz_bank.schedule_refill")
+    yield save_to_db("Lecture 1", TEST_PDF_PATH)
+    os.remove(TEST_PDF_PATH)
+
+
+def test_refill_fills_bank_to_target(lecture, mocker):
+    """Test that refill keeps generating until the target is reached, skipping duplicates."""
+    mock_generate = mocker.patch("quiz_bank.generate_quiz", side_effect=[
+        (make_questions(0, 5), {}), (make_questions(3, 5), {}), (make_questions(8, 5), {})])
+    assert quiz_bank.refill(lecture, "easy", target=10) == 13
+    assert mock_generate.call_count == 3
+    # Later batches are asked not to repeat the questions already banked
+    assert "Question 0?" in mock_generate.call_args.kwargs["exclude_questions"]
+
+
+def test_sample_quiz_uses_bank(lecture, mocker):
+    """Test that quizzes are sampled from the bank without calling the API."""
+    quiz_bank.add_questions(lecture, "easy", make_questions(0, 20))
+    mock_generate = mocker.patch("quiz_bank.generate_quiz")
+    questions, answers = quiz_bank.sample_quiz(lecture, "easy", size=5)
+    assert len(questions) == 5
+    assert answers == {idx: "True" for idx in range(5)}
+    mock_generate.assert_not_called()
+    quiz_bank.schedule_refill.assert_not_called()
+
+
+def test_sampling_prefers_least_served_questions(lecture):
+    """Test that consecutive quizzes do not repeat questions while unserved ones remain."""
+    quiz_bank.add_questions(lecture, "easy", make_questions(0, 10))
+    first, _ = quiz_bank.sample_quiz(lecture, "easy", size=5)
+    second, _ = quiz_bank.sample_quiz(lecture, "easy", size=5)
+    assert not {q["question"] for q in first} & {q["question"] for q in second}
+
+
+def test_low_bank_schedules_refill(lecture):
+    """Test that a bank below the watermark is refilled in the background."""
+    quiz_bank.add_questions(lecture, "hard", make_questions(0, 5))
+    questions, _ = quiz_bank.sample_quiz(lecture, "hard", size=5)
+    assert len(questions) == 5
+    quiz_bank.schedule_refill.assert_called_once_with(lecture, "hard")
+
+
+def test_changed_lecture_invalidates_bank(lecture, mocker):
+    """Test that questions generated from an old version of the PDF are not served."""
+    quiz_bank.add_questions(lecture, "easy", make_questions(0, 20))
+    with open(TEST_PDF_PATH, "wb") as f:
+        f.write(b"version 2 with new content")
+    assert quiz_bank.sample_quiz(lecture, "easy", size=5) == ([], {})
+    quiz_bank.schedule_refill.assert_called_once_with(lecture, "easy")
+
+    mocker.patch("quiz_bank.generate_quiz", return_value=(make_questions(100, 5), {}))
+    assert quiz_bank.refill(lecture, "easy", target=5) == 5
+
+
+def test_deleting_lecture_empties_bank(lecture):
+    """Test that a deleted lecture's questions are removed."""
+    quiz_bank.add_questions(lecture, "easy", make_questions(0, 5))
+    version = quiz_bank.lecture_version(lecture)
+    delete_from_db(lecture)
+    assert count_quiz_questions(lecture, "easy", version) == 0
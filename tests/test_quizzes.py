@@ -1,5 +1,12 @@
+import json
 import pytest
-from quiz_handler import generate_quiz, evaluate_quiz
+from quiz_handler import generate_quiz, evaluate_quiz, validate_question
+
+VALID = {"question": "Is a use case a requirement?", "type": "true_false", "options": ["True", "False"],
+         "answer": "True"}
+
+def completion(content):
+    return {"choices": [{"message": {"content": content}}]}
 
 def test_generate_quiz():
     """Test quiz generation based on text."""
@@ -15,3 +22,50 @@ def test_evaluate_quiz():
     score, total, _ = evaluate_quiz(submitted_answers, correct_answers)
     assert score == 2
     assert total == 2
+
+def test_validate_question():
+    """Test the schema checks on generated questions."""
+    assert validate_question(VALID) is None
+    assert validate_question({**VALID, "type": "essay"})
+    assert validate_question({**VALID, "answer": "Maybe"})
+    assert validate_question({**VALID, "type": "mcq_multiple", "answer": "True"})
+    assert validate_question({**VALID, "type": "mcq_multiple", "answer": ["True"]}) is None
+
+def test_generate_quiz_repairs_only_broken_questions(mocker):
+    """Test that valid questions from a malformed response are kept and only the rest are regenerated."""
+    second = {**VALID, "question": "Is a goal a requirement?", "answer": "False"}
+    replacement = {**VALID, "question": "Is a stakeholder a person?"}
+    malformed = "[" + json.dumps(VALID) + ', {"question": "Broken", "type": "essay", "options": [], "answer": "x"}, ' \
+                + json.dumps(second) + ', {"question": "Cut off'
+    chat = mocker.patch("llm_client.chat_completion",
+                        side_effect=[completion(malformed), completion(json.dumps([replacement]))])
+    quiz, answers = generate_quiz("Lecture text", "easy")
+    assert quiz == [VALID, second, replacement]
+    assert answers == {0: "True", 1: "False", 2: "True"}
+    repair_prompt = chat.call_args_list[1].kwargs["messages"][0]["content"]
+    assert "Generate exactly 2 questions" in repair_prompt
+    assert VALID["question"] in repair_prompt
+
+def test_generate_quiz_unwraps_wrapped_array(mocker):
+    """Test that questions inside an object such as {"questions": [...]} are recovered without a repair call."""
+    second = {**VALID, "question": "Is a goal a requirement?", "answer": "False"}
+    chat = mocker.patch("llm_client.chat_completion",
+                        return_value=completion(json.dumps({"questions": [VALID, second]})))
+    quiz, _ = generate_quiz("Lecture text", "easy")
+    assert quiz == [VALID, second]
+    assert chat.call_count == 1
+
+def test_duplicate_and_excluded_questions_are_not_repaired(mocker):
+    """Test that repeated or excluded questions are dropped without a repair call."""
+    second = {**VALID, "question": "Is a goal a requirement?", "answer": "False"}
+    chat = mocker.patch("llm_client.chat_completion",
+                        return_value=completion(json.dumps([VALID, VALID, second])))
+    quiz, _ = generate_quiz("Lecture text", "easy", exclude_questions=[second["question"]])
+    assert quiz == [VALID]
+    assert chat.call_count == 1
+
+def test_generate_quiz_valid_response_makes_one_call(mocker):
+    chat = mocker.patch("llm_client.chat_completion", return_value=completion(json.dumps([VALID])))
+    quiz, _ = generate_quiz("Lecture text", "easy")
+    assert quiz == [VALID]
+    assert chat.call_count == 1
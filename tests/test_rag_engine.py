@@ -0,0 +1,64 @@
+import pytest
+import rag_engine
+import vector_store as store
+from rag_engine import chunk_pages, chunk_text, ingest_pages, retrieve, retrieve_document, build_context
+
+VOCABULARY = ["elicitation", "stakeholder", "interview", "vision", "scope", "validation"]
+
+
+def fake_embeddings(texts, model=None):
+    """Bag-of-words embedding over a tiny vocabulary."""
+    return [[text.lower().count(word) for word in VOCABULARY] for text in texts]
+
+
+@pytest.fixture
+def vector_store(tmp_path, mocker):
+    """Use a temporary vector store with offline embeddings."""
+    mocker.patch("vector_store.VECTOR_STORE_DIR", str(tmp_path))
+    mocker.patch("rag_engine.get_embeddings", side_effect=fake_embeddings)
+    return tmp_path
+
+
+def test_chunk_pages():
+    """Test that chunks hold chunk_size words and remember their start page."""
+    pages = [" ".join(["alpha"] * 7), " ".join(["beta"] * 5)]
+    chunks = chunk_pages(pages, chunk_size=5)
+    assert [len(chunk["text"].split()) for chunk in chunks] == [5, 5, 2]
+    assert [chunk["page"] for chunk in chunks] == [1, 1, 2]
+
+
+def test_chunk_text_empty():
+    """Test chunking empty text."""
+    assert chunk_text("") == []
+
+
+def test_retrieve_ranks_relevant_chunks(vector_store):
+    """Test that the most similar chunk is returned first."""
+    pages = ["Stakeholder interview techniques.", "Vision and scope document.", "Validation of requirements."]
+    ingest_pages("lecture", pages, chunk_size=4)
+    results = retrieve("lecture", "How do I run a stakeholder interview?", top_k=2)
+    assert len(results) == 2
+    assert results[0]["page"] == 1
+    assert results[0]["score"] >= results[1]["score"]
+
+
+def test_ingest_skips_stored_documents(vector_store):
+    """Test that re-ingesting a stored document does not re-embed it."""
+    ingest_pages("lecture", ["Elicitation and validation."])
+    rag_engine.get_embeddings.reset_mock()
+    ingest_pages("lecture", ["Elicitation and validation."])
+    rag_engine.get_embeddings.assert_not_called()
+
+
+def test_build_context_handles_errors(vector_store, mocker):
+    """Test that retrieval failures fall back to None."""
+    mocker.patch("rag_engine.ingest_lecture", side_effect=ValueError("Lecture 99 not found."))
+    assert build_context(99, "scope") is None
+
+
+def test_retrieve_document_does_not_store_it(vector_store):
+    """Test that documents scored in memory are ranked but never added to the vector store."""
+    pages = ["Stakeholder interview techniques.", "Vision and scope document."]
+    results = retrieve_document(pages, "What goes in the scope?", top_k=1, chunk_size=4)
+    assert [result["page"] for result in results] == [2]
+    assert store.search([0, 0, 0, 1, 1, 0], top_k=4) == []
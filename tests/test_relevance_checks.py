@@ -1,15 +1,22 @@
+import time
 import pytest
 from unittest.mock import patch
-from relevance_check import calculate_semantic_similarity, calculate_keyword_overlap, calculate_feedback_score
+import relevance_check
+from relevance_check import calculate_semantic_similarity, calculate_keyword_overlap, calculate_feedback_score, check_relevance
+
+@pytest.fixture(autouse=True)
+def clear_chunk_cache():
+    """Start every test without cached course chunk embeddings."""
+    relevance_check._chunk_cache.clear()
 
 # Test Semantic Similarity
 def test_calculate_semantic_similarity():
     course_material = "Machine learning involves algorithms for data analysis."
     generated_content = "Data analysis is a key part of machine learning."
 
-    with patch("relevance_check.get_embedding", side_effect=[
-        [0.1, 0.2, 0.3],  # Mock embedding for course_material
-        [0.1, 0.2, 0.3]   # Mock embedding for generated_content
+    with patch("relevance_check.embed_texts", side_effect=[
+        [[0.1, 0.2, 0.3]],  # Mock chunk embeddings for course_material
+        [[0.1, 0.2, 0.3]]   # Mock embedding for generated_content
     ]):
         similarity = calculate_semantic_similarity(course_material, generated_content)
         assert similarity == 1.0
@@ -18,13 +25,33 @@ def test_calculate_semantic_similarity_no_match():
     course_material = "Machine learning involves algorithms for data analysis."
     generated_content = "The weather is sunny today."
 
-    with patch("relevance_check.get_embedding", side_effect=[
-        [0.1, 0.2, 0.3],  # Mock embedding for course_material
-        [-0.4, -0.5, -0.6]   # Mock embedding for generated_content
+    with patch("relevance_check.embed_texts", side_effect=[
+        [[0.1, 0.2, 0.3]],  # Mock chunk embeddings for course_material
+        [[-0.4, -0.5, -0.6]]   # Mock embedding for generated_content
     ]):
         similarity = calculate_semantic_similarity(course_material, generated_content)
         assert similarity < 0.3
 
+def test_semantic_similarity_per_chunk():
+    """Test that long material is compared chunk by chunk and its chunk embeddings are reused."""
+    course_material = " ".join(["alpha"] * 500 + ["beta"] * 500 + ["gamma"] * 500)
+    chunk_embeddings = [[1.0, 0.0], [0.0, 1.0], [0.6, 0.8]]
+
+    def embed(texts):
+        if len(texts) == 3:
+            return chunk_embeddings
+        return [[0.0, 1.0]]
+
+    with patch("relevance_check.embed_texts", side_effect=embed) as embed_texts:
+        scores = relevance_check.semantic_similarity_scores(course_material, "answer", top_k=2)
+        relevance_check.semantic_similarity_scores(course_material, "another answer", top_k=2)
+    assert [len(call.args[0]) for call in embed_texts.call_args_list] == [3, 1, 1]
+    assert scores["max"] == 1.0
+    assert scores["mean"] == 0.6
+    assert scores["top_k_mean"] == 0.9
+    assert [match["chunk"] for match in scores["matches"]] == [1, 2]
+    assert scores["matches"][0]["text"].startswith("beta")
+
 # Test Keyword Overlap
 def test_calculate_keyword_overlap():
     course_material = "Machine learning uses data analysis and algorithms."
@@ -40,6 +67,27 @@ def test_calculate_keyword_overlap_no_overlap():
     overlap_score = calculate_keyword_overlap(course_material, generated_content)
     assert overlap_score == 0.0
 
+def test_extract_keywords_cached_by_content():
+    """Test that lecture keywords are computed once per content and one-off text is not cached."""
+    text = "Stakeholders elicit requirements through interviews."
+    relevance_check._keyword_cache.clear()
+    with patch("relevance_check.get_nlp", wraps=relevance_check.get_nlp) as get_nlp:
+        first = relevance_check.extract_keywords(text)
+        assert relevance_check.extract_keywords(text) is first
+        assert get_nlp.call_count == 1
+        relevance_check.extract_keywords("Some generated answer.", use_cache=False)
+        assert get_nlp.call_count == 2
+    assert first == {"stakeholders", "elicit", "requirements", "interviews"}
+    assert len(relevance_check._keyword_cache) == 1
+
+def test_extract_keywords_large_text_in_pieces():
+    """Test that a text split into pieces for nlp.pipe gives the same keywords."""
+    text = "requirements traceability matrix " * 200
+    with patch("relevance_check.SPACY_PIECE_CHARS", 100):
+        pieces = relevance_check._split_text(text)
+        assert len(pieces) > 1 and "".join(pieces) == text
+        assert relevance_check.extract_keywords(text, use_cache=False) == {"requirements", "traceability", "matrix"}
+
 # Test LLM Feedback Score
 def test_calculate_feedback_score():
     course_material = "Machine learning involves data analysis and algorithms."
@@ -66,3 +114,34 @@ def test_calculate_feedback_score_error():
         score, details = calculate_feedback_score(course_material, generated_content)
         assert score is None
         assert "Failed to get feedback" in details
+
+# Test running the metrics concurrently
+def slow(seconds, value):
+    def metric(course_material, generated_content):
+        time.sleep(seconds)
+        return value
+    return metric
+
+def test_check_relevance_runs_metrics_in_parallel():
+    with patch("relevance_check.semantic_similarity_scores", side_effect=slow(0.3, {"top_k_mean": 0.9})), \
+         patch("relevance_check.calculate_keyword_overlap", side_effect=slow(0.3, 0.5)), \
+         patch("relevance_check.calculate_feedback_score", side_effect=slow(0.3, (8, "Relevant."))):
+        started = time.monotonic()
+        scores = check_relevance("material", "content")
+        elapsed = time.monotonic() - started
+    assert elapsed < 0.6
+    assert scores["semantic_similarity"] == 0.9
+    assert scores["keyword_overlap"] == 0.5
+    assert scores["feedback_score"] == 8
+    assert scores["errors"] == {}
+
+def test_check_relevance_returns_partial_results():
+    with patch("relevance_check.semantic_similarity_scores", side_effect=slow(1.0, {"top_k_mean": 0.9})), \
+         patch("relevance_check.calculate_keyword_overlap", side_effect=RuntimeError("spaCy failed")), \
+         patch("relevance_check.calculate_feedback_score", side_effect=slow(0, (7, "Mostly relevant."))):
+        scores = check_relevance("material", "content", timeouts={"semantic_similarity": 0.1})
+    assert scores["semantic_similarity"] is None
+    assert "Timed out" in scores["errors"]["semantic_similarity"]
+    assert scores["keyword_overlap"] is None
+    assert scores["errors"]["keyword_overlap"] == "spaCy failed"
+    assert scores["feedback_score"] == 7
@@ -0,0 +1,83 @@
+import threading
+import time
+import pytest
+import llm_cache
+import singleflight
+from db import acquire_inflight_lock, release_inflight_lock
+
+MESSAGES = [{"role": "user", "content": "Summarise lecture 1"}]
+
+
+@pytest.fixture
+def empty_cache():
+    """Use an empty in-memory cache tier."""
+    llm_cache.clear_memory()
+    yield
+    llm_cache.clear_memory()
+
+
+def run_concurrently(fn, n):
+    results = [None] * n
+    def worker(i):
+        results[i] = fn()
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(n)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+def test_concurrent_identical_requests_share_one_call(empty_cache, mocker):
+    """Test that identical in-flight requests make a single API call."""
+    def slow_completion(**params):
+        time.sleep(0.2)
+        return {"choices": [{"message": {"content": "Summary"}}]}
+    mock_gpt = mocker.patch("openai.ChatCompletion.create", side_effect=slow_completion)
+    results = run_concurrently(lambda: llm_cache.cached_chat_completion("gpt-4o", MESSAGES), 8)
+    assert results == ["Summary"] * 8
+    assert mock_gpt.call_count == 1
+
+
+def test_leader_error_reaches_waiters(empty_cache):
+    """Test that waiters receive the leader's error instead of hanging."""
+    started = threading.Event()
+    def failing():
+        started.set()
+        time.sleep(0.1)
+        raise RuntimeError("API down")
+    errors = []
+    def call():
+        try:
+            singleflight.do("key", failing, check=lambda: None)
+        except RuntimeError as e:
+            errors.append(e)
+    leader = threading.Thread(target=call)
+    leader.start()
+    started.wait()
+    call()
+    leader.join()
+    assert len(errors) == 2
+
+
+def test_waits_for_other_process(empty_cache, mocker):
+    """Test that a request locked by another process is read from the cache instead of regenerated."""
+    mocker.patch("singleflight.POLL_INTERVAL", 0.01)
+    assert acquire_inflight_lock("key", "other-process", time.time(), time.time() + 60)
+    results = {}
+    def finish_other_process():
+        time.sleep(0.1)
+        results["cached"] = "Summary"
+        release_inflight_lock("key", "other-process")
+    threading.Thread(target=finish_other_process).start()
+    fn = mocker.Mock(return_value="Regenerated")
+    assert singleflight.do("key", fn, check=lambda: results.get("cached")) == "Summary"
+    fn.assert_not_called()
+
+
+def test_expired_lock_is_taken_over(empty_cache):
+    """Test that a lock left by a crashed process stops blocking after its TTL."""
+    now = time.time()
+    assert acquire_inflight_lock("key", "crashed", now - 120, now - 60)
+    assert acquire_inflight_lock("key", "live", now, now + 60)
+    assert not acquire_inflight_lock("key", "other", now, now + 60)
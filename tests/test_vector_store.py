@@ -0,0 +1,98 @@
+import os
+import numpy as np
+import pytest
+import vector_store
+
+
+@pytest.fixture
+def store(tmp_path, mocker):
+    """Use a temporary matrix directory."""
+    mocker.patch("vector_store.VECTOR_STORE_DIR", str(tmp_path))
+    mocker.patch.dict(vector_store._matrices, clear=True)
+    mocker.patch.dict(vector_store._centroids, clear=True)
+    return tmp_path
+
+
+def chunks(*pages):
+    return [{"text": f"chunk on page {page}", "page": page} for page in pages]
+
+
+def test_cosine_scores():
+    """Test batched cosine similarity."""
+    scores = vector_store.cosine_scores([[1, 0], [0, 2], [-3, 0]], [2, 0])
+    assert np.allclose(scores, [1.0, 0.0, -1.0])
+
+
+def test_add_writes_contiguous_float32_matrix(store):
+    """Test that embeddings of all lectures share one float32 matrix file."""
+    assert vector_store.add(1, chunks(1, 2), [[1, 0, 0], [0, 1, 0]], "test-model") == [0, 1]
+    assert vector_store.add(2, chunks(1), [[0, 0, 3]], "test-model") == [2]
+    matrix = np.fromfile(os.path.join(store, "default", "embeddings.f32"), dtype=np.float32)
+    assert np.allclose(matrix.reshape(3, 3), np.eye(3))
+
+
+def test_search_filters_by_lecture(store):
+    """Test searching all lectures or a single lecture."""
+    vector_store.add(1, chunks(1, 2), [[1, 0, 0], [0.7, 0.7, 0]], "test-model")
+    vector_store.add(2, chunks(5), [[1, 0.1, 0]], "test-model")
+
+    results = vector_store.search([1, 0, 0], top_k=2)
+    assert [(r["lecture_id"], r["page"]) for r in results] == [("1", 1), ("2", 5)]
+
+    results = vector_store.search([1, 0, 0], top_k=5, lecture_ids=[1])
+    assert [r["row"] for r in results] == [0, 1]
+    assert results[0]["score"] == pytest.approx(1.0)
+
+
+def test_search_uses_memmap(store):
+    """Test that the matrix is memory-mapped and reopened as it grows."""
+    vector_store.add(1, chunks(1), [[1, 0]], "test-model")
+    vector_store.search([1, 0], top_k=1)
+    _, matrix = vector_store._matrices["default"]
+    assert isinstance(matrix, np.memmap)
+    vector_store.add(2, chunks(1), [[0, 1]], "test-model")
+    assert vector_store.search([0, 1], top_k=1)[0]["lecture_id"] == "2"
+
+
+def test_delete_lecture(store):
+    """Test that deleted lectures are no longer returned."""
+    vector_store.add(1, chunks(1), [[1, 0]], "test-model")
+    assert vector_store.has_lecture(1)
+    vector_store.delete_lecture(1)
+    assert not vector_store.has_lecture(1)
+    assert vector_store.search([1, 0], top_k=3) == []
+
+
+def test_dimension_mismatch(store):
+    """Test that embeddings of another dimension are rejected."""
+    vector_store.add(1, chunks(1), [[1, 0]], "test-model")
+    with pytest.raises(ValueError):
+        vector_store.add(2, chunks(1), [[1, 0, 0]], "test-model")
+
+
+def test_check_model_resets_store(store):
+    """Test that switching embedding model clears the stored vectors."""
+    vector_store.add(1, chunks(1), [[1, 0]], "test-model")
+    vector_store.check_model("test-model")
+    assert vector_store.has_lecture(1)
+    vector_store.check_model("other-model")
+    assert not vector_store.has_lecture(1)
+    assert vector_store.add(1, chunks(1), [[1, 0, 0]], "other-model") == [0]
+
+
+def test_reset_by_another_process_reopens_caches(store, mocker):
+    """Test that a memmap and centroids cached before another process reset the store are not reused."""
+    mocker.patch("ann_index.ANN_MIN_ROWS", 2)
+    vector_store.add(1, chunks(1, 2), [[1, 0], [0.9, 0.1]], "test-model")
+    vector_store.search([1, 0], top_k=1)
+    stale = dict(vector_store._matrices), dict(vector_store._centroids)
+    assert stale[1]
+
+    # The other process resets and rebuilds the store; this process keeps its caches
+    vector_store.reset()
+    vector_store.add(2, chunks(3, 4), [[0, 1], [0.1, 0.9]], "test-model")
+    vector_store._matrices.update(stale[0])
+    vector_store._centroids.update(stale[1])
+
+    results = vector_store.search([0, 1], top_k=1)
+    assert [(r["lecture_id"], r["page"]) for r in results] == [("2", 3)]
@@ -0,0 +1,229 @@
+"""
+Memory-mapped vector store for chunk embeddings.
+
+All chunk embeddings of a course live in one contiguous float32 matrix on disk
+(vector_store/<course>/embeddings.f32) that is opened with numpy.memmap, so
+every server process reads the same pages from the OS page cache instead of
+holding its own copy. The sidecar `vector_rows` table maps each matrix row to
+its lecture, chunk and page. Rows are L2-normalised on insert, so cosine
+similarity is a single matrix-vector product.
+
+Once a course grows past ann_index.ANN_MIN_ROWS, an IVF index is trained over
+the matrix and corpus-wide searches only score the rows of the probed lists.
+"""
+import os
+import numpy as np
+import ann_index
+from db import (get_vector_store, register_vector_store, reserve_vector_rows, activate_vector_rows,
+                get_live_vector_rows, get_vector_row_details, has_vector_rows, delete_vector_rows,
+                count_live_vector_rows, get_ann_index, save_ann_index, delete_vector_store)
+
+VECTOR_STORE_DIR = "vector_store"
+COURSE_ID = os.getenv("COURSE_ID", "default")
+
+# Open memory maps in this process, keyed by course: (generation, memmap)
+_matrices = {}
+# Loaded IVF centroids in this process, keyed by course: (generation, ann_version, centroids)
+_centroids = {}
+
+
+def _matrix_path(course_id):
+    return os.path.join(VECTOR_STORE_DIR, course_id, "embeddings.f32")
+
+
+def normalize(vectors):
+    """L2-normalise the rows of a 2-D array (zero rows are left as zeros)."""
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.where(norms == 0, 1, norms)
+
+
+def cosine_scores(matrix, query):
+    """Cosine similarity of every row of `matrix` with `query` in one batched product."""
+    return normalize(matrix) @ normalize(query)
+
+
+def _open_matrix(course_id, store, min_rows):
+    """
+    Return a read-only memmap covering at least `min_rows` rows of the course matrix.
+
+    The map is reopened when the file grew, and when the store was reset since it
+    was opened, possibly by another process, which gives it a new generation.
+    """
+    dim, generation = store[0], store[3]
+    cached = _matrices.get(course_id)
+    if cached is None or cached[0] != generation or cached[1].shape[0] < min_rows or cached[1].shape[1] != dim:
+        path = _matrix_path(course_id)
+        rows = os.path.getsize(path) // (dim * 4)
+        cached = (generation, np.memmap(path, dtype=np.float32, mode="r", shape=(rows, dim)))
+        _matrices[course_id] = cached
+    return cached[1]
+
+
+def _load_centroids(course_id, store):
+    """Return the course's IVF centroids, reloading them when the index was retrained or the store reset."""
+    dim, _, ann_version, generation = store
+    cached = _centroids.get(course_id)
+    if cached is None or cached[:2] != (generation, ann_version):
+        version, blob, _ = get_ann_index(course_id)
+        cached = (generation, version, np.frombuffer(blob, dtype=np.float32).reshape(-1, dim))
+        _centroids[course_id] = cached
+    return cached[2]
+
+
+def train_index(course_id=COURSE_ID, n_lists=None, seed=0):
+    """
+    (Re)build the IVF index of a course from its live rows.
+
+    Args:
+        course_id (str): Course to index.
+        n_lists (int, optional): Number of lists; defaults to about 4 * sqrt(rows).
+        seed (int): Seed for sampling and k-means.
+    """
+    store = get_vector_store(course_id)
+    rows = np.asarray(get_live_vector_rows(course_id), dtype=np.int64)
+    if store is None or rows.size == 0:
+        return
+    matrix = _open_matrix(course_id, store, int(rows[-1]) + 1)
+
+    rng = np.random.default_rng(seed)
+    sample_rows = rows
+    if len(rows) > ann_index.KMEANS_SAMPLE_SIZE:
+        sample_rows = np.sort(rng.choice(rows, ann_index.KMEANS_SAMPLE_SIZE, replace=False))
+    centroids = ann_index.kmeans(matrix[sample_rows], n_lists or ann_index.default_list_count(len(rows)), seed=seed)
+
+    row_lists = []
+    for start in range(0, len(rows), ann_index.ASSIGN_BLOCK_SIZE):
+        block = rows[start:start + ann_index.ASSIGN_BLOCK_SIZE]
+        row_lists.extend(zip(block.tolist(), ann_index.assign(centroids, matrix[block]).tolist()))
+    save_ann_index(course_id, centroids.tobytes(), row_lists, len(rows))
+
+
+def _maybe_train_index(course_id):
+    """Train the IVF index once the course is large enough, and retrain it after it doubles."""
+    live_rows = count_live_vector_rows(course_id)
+    _, _, ann_rows = get_ann_index(course_id)
+    if live_rows >= ann_index.ANN_MIN_ROWS and live_rows > 2 * ann_rows:
+        train_index(course_id)
+
+
+def add(lecture_id, chunks, embeddings, model, course_id=COURSE_ID):
+    """
+    Append a lecture's chunk embeddings to the course matrix.
+
+    Args:
+        lecture_id: Lecture ID or document key.
+        chunks (list[dict]): Chunks as {"text": str, "page": int}.
+        embeddings (list[list[float]]): One embedding per chunk.
+        model (str): Name of the embedding model.
+        course_id (str): Course the lecture belongs to.
+
+    Returns:
+        list[int]: The matrix rows holding the new embeddings.
+    """
+    vectors = normalize(embeddings)
+    if len(chunks) == 0:
+        return []
+    dim = vectors.shape[1]
+    register_vector_store(course_id, dim, model)
+    store = get_vector_store(course_id)
+    stored_dim, _, ann_version, _ = store
+    if stored_dim != dim:
+        raise ValueError(f"Embedding dimension {dim} does not match the store's dimension {stored_dim}.")
+
+    # Insert straight into the IVF lists when the index exists
+    list_ids = None
+    if ann_version:
+        list_ids = ann_index.assign(_load_centroids(course_id, store), vectors).tolist()
+
+    start_row = reserve_vector_rows(course_id, lecture_id, chunks, list_ids)
+    path = _matrix_path(course_id)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    # Create the file if needed but never truncate it: a concurrent writer may already have
+    # written the rows it reserved before ours
+    fd = os.open(path, os.O_RDWR | os.O_CREAT | getattr(os, "O_BINARY", 0))
+    with os.fdopen(fd, "r+b") as f:
+        f.seek(start_row * dim * 4)
+        f.write(vectors.tobytes())
+    activate_vector_rows(course_id, start_row, len(chunks))
+    _maybe_train_index(course_id)
+    return list(range(start_row, start_row + len(chunks)))
+
+
+def check_model(model, course_id=COURSE_ID):
+    """Clear the course's vectors if they were built with a different embedding model."""
+    store = get_vector_store(course_id)
+    if store is not None and store[1] != model:
+        print(f"Embedding model changed from {store[1]} to {model}; rebuilding the vector store.")
+        reset(course_id)
+
+
+def reset(course_id=COURSE_ID):
+    """Delete all vectors of a course; lectures are re-embedded on their next retrieval."""
+    delete_vector_store(course_id)
+    path = _matrix_path(course_id)
+    _matrices.pop(course_id, None)
+    _centroids.pop(course_id, None)
+    if os.path.exists(path):
+        os.remove(path)
+
+
+def has_lecture(lecture_id, course_id=COURSE_ID):
+    """Check whether a lecture is already in the store."""
+    return has_vector_rows(course_id, lecture_id)
+
+
+def delete_lecture(lecture_id, course_id=COURSE_ID):
+    """Remove a lecture's chunks from future searches."""
+    delete_vector_rows(course_id, lecture_id)
+
+
+def search(query_embedding, top_k, lecture_ids=None, nprobe=None, course_id=COURSE_ID):
+    """
+    Find the chunks most similar to a query embedding.
+
+    Searches restricted to lectures are exact. Corpus-wide searches use the IVF
+    index when one is trained.
+
+    Args:
+        query_embedding (list[float]): Embedding of the query.
+        top_k (int): Maximum number of chunks to return.
+        lecture_ids (list, optional): Restrict the search to these lectures.
+        nprobe (int, optional): IVF lists to probe; higher is slower with better
+            recall. Defaults to ann_index.ANN_NPROBE.
+        course_id (str): Course to search.
+
+    Returns:
+        list[dict]: Matches as {"row", "lecture_id", "chunk", "page", "text", "score"},
+        best match first.
+    """
+    store = get_vector_store(course_id)
+    if store is None:
+        return []
+    dim, _, ann_version, _ = store
+    query = normalize(query_embedding)
+
+    list_ids = None
+    if lecture_ids is None and ann_version:
+        centroids = _load_centroids(course_id, store)
+        list_ids = ann_index.probe(centroids, query, nprobe or ann_index.ANN_NPROBE).tolist()
+
+    rows = np.asarray(get_live_vector_rows(course_id, lecture_ids, list_ids), dtype=np.int64)
+    if rows.size == 0:
+        return []
+    matrix = _open_matrix(course_id, store, int(rows[-1]) + 1)
+
+    scores = matrix[rows] @ query
+    if top_k < len(rows):
+        best = np.argpartition(-scores, top_k)[:top_k]
+    else:
+        best = np.arange(len(rows))
+    best = best[np.argsort(-scores[best])]
+
+    details = get_vector_row_details(course_id, rows[best].tolist())
+    results = []
+    for i in best:
+        lecture_id, chunk_index, page, text = details[int(rows[i])]
+        results.append({"row": int(rows[i]), "lecture_id": lecture_id, "chunk": chunk_index,
+                        "page": page, "text": text, "score": float(scores[i])})
+    return results